@@ -0,0 +1,48 @@
+"""Add recipe search_text and full-text index
+
+Revision ID: 4e73d3e31a39
+Revises: 865c73450453
+Create Date: 2026-10-17 09:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e73d3e31a39'
+down_revision: Union[str, None] = '865c73450453'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('search_text', sa.Text(), nullable=True))
+
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite is searched through the in-process index, which backfills itself
+        return
+
+    # Backfill with the same shape as app.core.search.build_search_text
+    op.execute("""
+        UPDATE recipes SET search_text = lower(concat_ws(' ',
+            NULLIF(title, ''),
+            NULLIF(description, ''),
+            (SELECT string_agg(value, ' ') FROM json_array_elements_text(ingredients) AS value),
+            (SELECT string_agg(value, ' ') FROM json_array_elements_text(dietary_tags) AS value)
+        ))
+    """)
+    op.execute(
+        "CREATE INDEX ix_recipes_search_vector ON recipes "
+        "USING gin (to_tsvector('english', search_text))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_recipes_search_vector")
+    op.drop_column('recipes', 'search_text')
@@ -0,0 +1,32 @@
+"""Add updated_at row versions to recipes and users
+
+Revision ID: 5c0e9a7d3f21
+Revises: d2a84f0c5b17
+Create Date: 2026-10-17 12:40:18.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0e9a7d3f21'
+down_revision: Union[str, None] = 'd2a84f0c5b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE recipes SET updated_at = created_at")
+    op.execute("UPDATE users SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'updated_at')
+    op.drop_column('recipes', 'updated_at')
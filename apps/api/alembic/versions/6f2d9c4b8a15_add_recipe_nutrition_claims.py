@@ -0,0 +1,28 @@
+"""Add nutrition estimate claims to recipes
+
+Revision ID: 6f2d9c4b8a15
+Revises: 2d6b8e4f1a37
+Create Date: 2026-10-17 21:04:52.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2d9c4b8a15'
+down_revision: Union[str, None] = '2d6b8e4f1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('nutrition_claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('recipes', 'nutrition_claimed_at')
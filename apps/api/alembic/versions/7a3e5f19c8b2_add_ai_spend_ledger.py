@@ -0,0 +1,37 @@
+"""Add ai_spend ledger
+
+Revision ID: 7a3e5f19c8b2
+Revises: 5c0e9a7d3f21
+Create Date: 2026-10-17 15:02:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3e5f19c8b2'
+down_revision: Union[str, None] = '5c0e9a7d3f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ai_spend',
+        sa.Column('period', sa.String(length=7), nullable=False),
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('spend_usd', sa.Float(), nullable=False),
+        sa.Column('tokens_in', sa.BigInteger(), nullable=False),
+        sa.Column('tokens_out', sa.BigInteger(), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('period', 'scope')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ai_spend')
@@ -0,0 +1,51 @@
+"""Add recipe_dietary_tags association table
+
+Revision ID: 9b1f6c2d7e04
+Revises: 4e73d3e31a39
+Create Date: 2026-10-17 10:03:27.450912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1f6c2d7e04'
+down_revision: Union[str, None] = '4e73d3e31a39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('recipe_dietary_tags',
+        sa.Column('recipe_id', sa.UUID(), nullable=False),
+        sa.Column('tag', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['recipe_id'], ['recipes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('recipe_id', 'tag')
+    )
+    op.create_index('ix_recipe_dietary_tags_tag_recipe', 'recipe_dietary_tags', ['tag', 'recipe_id'], unique=False)
+
+    # Backfill from the JSON column, normalized like app.db.models.recipe_dietary_tag.normalize_tag
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            INSERT INTO recipe_dietary_tags (recipe_id, tag)
+            SELECT DISTINCT r.id, lower(trim(t.value))
+            FROM recipes r, json_array_elements_text(r.dietary_tags) AS t(value)
+            WHERE trim(t.value) <> ''
+        """)
+    else:
+        op.execute("""
+            INSERT INTO recipe_dietary_tags (recipe_id, tag)
+            SELECT DISTINCT r.id, lower(trim(t.value))
+            FROM recipes r, json_each(r.dietary_tags) AS t
+            WHERE trim(t.value) <> ''
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recipe_dietary_tags_tag_recipe', table_name='recipe_dietary_tags')
+    op.drop_table('recipe_dietary_tags')
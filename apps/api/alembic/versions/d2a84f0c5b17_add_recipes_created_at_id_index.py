@@ -0,0 +1,28 @@
+"""Add (created_at, id) index for keyset pagination
+
+Revision ID: d2a84f0c5b17
+Revises: 9b1f6c2d7e04
+Create Date: 2026-10-17 11:26:05.302184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a84f0c5b17'
+down_revision: Union[str, None] = '9b1f6c2d7e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_recipes_created_at_id', 'recipes', [sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recipes_created_at_id', table_name='recipes')
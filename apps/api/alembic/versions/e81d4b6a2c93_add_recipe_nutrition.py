@@ -0,0 +1,36 @@
+"""Add nutrition estimates to recipes
+
+Revision ID: e81d4b6a2c93
+Revises: 7a3e5f19c8b2
+Create Date: 2026-10-17 16:21:07.530982
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81d4b6a2c93'
+down_revision: Union[str, None] = '7a3e5f19c8b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('calories', sa.Integer(), nullable=True))
+    op.add_column('recipes', sa.Column('protein_grams', sa.Integer(), nullable=True))
+    op.add_column('recipes', sa.Column('carbs_grams', sa.Integer(), nullable=True))
+    op.add_column('recipes', sa.Column('fat_grams', sa.Integer(), nullable=True))
+    op.add_column('recipes', sa.Column('nutrition_estimated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('recipes', 'nutrition_estimated_at')
+    op.drop_column('recipes', 'fat_grams')
+    op.drop_column('recipes', 'carbs_grams')
+    op.drop_column('recipes', 'protein_grams')
+    op.drop_column('recipes', 'calories')
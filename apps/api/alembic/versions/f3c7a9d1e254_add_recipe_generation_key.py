@@ -0,0 +1,32 @@
+"""Add generation key to recipes
+
+Revision ID: f3c7a9d1e254
+Revises: e81d4b6a2c93
+Create Date: 2026-10-17 17:08:44.291637
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7a9d1e254'
+down_revision: Union[str, None] = 'e81d4b6a2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('generation_key', sa.String(length=64), nullable=True))
+    op.add_column('recipes', sa.Column('generation_ingredients', sa.JSON(), nullable=True))
+    op.create_index('ix_recipes_generation_key', 'recipes', ['generation_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recipes_generation_key', table_name='recipes')
+    op.drop_column('recipes', 'generation_ingredients')
+    op.drop_column('recipes', 'generation_key')
@@ -1,16 +1,19 @@
+import uuid
 from typing import Annotated
 from fastapi import Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from app.api.deps import get_db
 from app.db.session import AsyncSessionLocal
 from app.db.models.user import User
 from app.core.config import settings
 from app.core.security import verify_token
+from app.services.session_user_cache import session_user_cache
 # We need to create security.py with verify_token first or imports fail.
 # I will create a stub here and then implement security.py properly.
 
 
-async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> User:
+def _session_user_id(request: Request) -> uuid.UUID:
     # 1. Get session_id from strict httpOnly cookie
     token = request.cookies.get("session_id")
     if not token:
@@ -24,15 +27,55 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
     user_id = verify_token(token)
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+    return uuid.UUID(user_id)
+
+async def _load_user(db: AsyncSession, uid: uuid.UUID, version: str | None) -> User | None:
+    # Join the profile image so /auth/me and profile writes never need a second query
+    user = await db.get(User, uid, options=[joinedload(User.profile_image)])
+    if user:
+        # Stored under the version read before the SELECT: if the user changed since,
+        # the invalidation bumped it and this snapshot is never read
+        await session_user_cache.set(user, version)
+    return user
 
-    # 3. Get user from DB
-    import uuid
-    uid = uuid.UUID(user_id)
-    user = await db.get(User, uid)
+def _check_active(user: User | None) -> None:
     if not user:
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
-        
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> User:
+    uid = _session_user_id(request)
+
+    # 3. Get user from the session-user cache, falling back to the DB
+    cached, version = await session_user_cache.get(uid)
+    if cached is not None:
+        # Attach without a SELECT so routes can still modify and commit the user
+        user = await db.merge(cached, load=False)
+    else:
+        user = await _load_user(db, uid, version)
+    _check_active(user)
     return user
+
+async def get_current_user_id(request: Request, db: AsyncSession = Depends(get_db)) -> uuid.UUID:
+    """
+    Lighter dependency for endpoints that only need the caller's id.
+    Same checks as get_current_user, but a cache hit never touches the session
+    (AsyncSession only checks out a connection when it runs a query).
+    """
+    uid = _session_user_id(request)
+    user, version = await session_user_cache.get(uid)
+    if user is None:
+        user = await _load_user(db, uid, version)
+    _check_active(user)
+    return uid
+
+async def get_current_user_optional(request: Request, db: AsyncSession = Depends(get_db)) -> User | None:
+    """The authenticated user, or None for anonymous/invalid sessions (never raises)."""
+    if not request.cookies.get("session_id"):
+        return None
+    try:
+        return await get_current_user(request, db)
+    except HTTPException:
+        return None
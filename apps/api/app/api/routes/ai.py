@@ -1,19 +1,32 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+import structlog
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, UUID4
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.services.ai_service import ai_service
 from app.services.storage_service import storage_service
+from app.services.recipe_cache import recipe_cache
+from app.services.nutrition_service import nutrition_estimator
+from app.services.generation_cache import fingerprint
+from app.services.job_queue import JobFailed, JobQueueFull, job_queue
+from app.core.config import settings
+from app.core.serialization import dumps
 from app.api.deps import get_db
-from app.api.deps_auth import get_current_user
+from app.api.deps_auth import get_current_user, get_current_user_id
 from app.db.models.user import User
 from app.db.models.recipe import Recipe
 from app.db.models.upload import Upload
+from app.db.models.ai_job import ACTIVE_JOB_STATUSES, JOB_FAILED, AIJob
 from app.middleware.security import rate_limit_ai
 
 router = APIRouter()
+logger = structlog.get_logger()
 
 class RecipeGenerationRequest(BaseModel):
     ingredients: List[str] = [] # Optional if upload is present
@@ -21,26 +34,71 @@ class RecipeGenerationRequest(BaseModel):
     uploadId: Optional[UUID4] = None
     user_notes: Optional[str] = None
 
+async def _load_upload(payload: RecipeGenerationRequest, current_user: User, db: AsyncSession) -> Tuple[Optional[Upload], Optional[bytes]]:
+    if not payload.uploadId:
+        return None, None
+    result = await db.execute(select(Upload).where(Upload.id == payload.uploadId, Upload.user_id == current_user.id))
+    upload_record = result.scalars().first()
+    if not upload_record:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    try:
+        image_bytes = storage_service.download_file(upload_record.object_key)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to retrieve uploaded image")
+    return upload_record, image_bytes
+
+def _generation_error(e: Exception) -> HTTPException:
+    error_msg = str(e)
+    if "limit exceeded" in error_msg:
+        return HTTPException(status_code=429, detail="Daily AI limit reached")
+    if "Service unavailable" in error_msg:
+        return HTTPException(status_code=503, detail="AI Service temporarily unavailable")
+    return HTTPException(status_code=500, detail=f"Failed to generate recipe: {str(e)}")
+
+async def _save_generated_recipe(
+    db: AsyncSession,
+    current_user: User,
+    payload: RecipeGenerationRequest,
+    recipe_data: dict,
+    upload_record: Optional[Upload],
+    image_bytes: Optional[bytes],
+) -> Recipe:
+    new_recipe = Recipe(
+        user_id=current_user.id,
+        upload_id=upload_record.id if upload_record else None,
+        title=recipe_data.get("title", "Untitled Recipe"),
+        description=recipe_data.get("description", ""),
+        ingredients=recipe_data.get("ingredients", []),
+        instructions=recipe_data.get("instructions", []),
+        dietary_tags=recipe_data.get("dietary_tags", []),
+        prep_time_minutes=recipe_data.get("prep_time_minutes"),
+        cook_time_minutes=recipe_data.get("cook_time_minutes"),
+        servings=recipe_data.get("servings"),
+        difficulty=recipe_data.get("difficulty")
+    )
+    if not image_bytes:
+        # Lets later requests with the same normalized ingredients/restrictions reuse this recipe
+        fp = fingerprint(payload.ingredients, payload.restrictions)
+        new_recipe.generation_key = fp.restrictions_key
+        new_recipe.generation_ingredients = list(fp.ingredients)
+    
+    db.add(new_recipe)
+    await db.commit()
+    await recipe_cache.invalidate_lists()
+    await db.refresh(new_recipe)
+    # Nutrition is estimated in the background, batched with other new recipes
+    nutrition_estimator.enqueue(new_recipe.id)
+    return new_recipe
+
 @router.post("/recipe", summary="Generate Recipe", dependencies=[Depends(rate_limit_ai)])
 async def generate_recipe_route(
     payload: RecipeGenerationRequest,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    image_bytes = None
-    upload_record = None
-
     # 1. Handle Upload if present
-    if payload.uploadId:
-        result = await db.execute(select(Upload).where(Upload.id == payload.uploadId, Upload.user_id == current_user.id))
-        upload_record = result.scalars().first()
-        if not upload_record:
-            raise HTTPException(status_code=404, detail="Upload not found")
-        
-        try:
-            image_bytes = storage_service.download_file(upload_record.object_key)
-        except Exception:
-            raise HTTPException(status_code=500, detail="Failed to retrieve uploaded image")
+    upload_record, image_bytes = await _load_upload(payload, current_user, db)
 
     if not payload.ingredients and not image_bytes:
         raise HTTPException(status_code=400, detail="Must provide ingredients or an image")
@@ -50,40 +108,172 @@ async def generate_recipe_route(
         recipe_data = await ai_service.generate_recipe(
             ingredients=payload.ingredients,
             restrictions=payload.restrictions,
-            image_bytes=image_bytes
+            image_bytes=image_bytes,
+            user_id=current_user.id
         )
     except Exception as e:
         import traceback
         print(f"CRITICAL AI ERROR: {str(e)}")
         traceback.print_exc()
-        
-        error_msg = str(e)
-        if "limit exceeded" in error_msg:
-            raise HTTPException(status_code=429, detail="Daily AI limit reached")
-        if "Service unavailable" in error_msg:
-             raise HTTPException(status_code=503, detail="AI Service temporarily unavailable")
-        raise HTTPException(status_code=500, detail=f"Failed to generate recipe: {str(e)}")
+        raise _generation_error(e)
 
     # 3. Save to DB
-    new_recipe = Recipe(
-        user_id=current_user.id,
-        upload_id=upload_record.id if upload_record else None,
-        title=recipe_data.get("title", "Untitled Recipe"),
-        description=recipe_data.get("description", ""),
-        ingredients=recipe_data.get("ingredients", []),
-        instructions=recipe_data.get("instructions", []),
-        dietary_tags=recipe_data.get("dietary_tags", []),
-        prep_time_minutes=recipe_data.get("prep_time_minutes"),
-        cook_time_minutes=recipe_data.get("cook_time_minutes"),
-        servings=recipe_data.get("servings"),
-        difficulty=recipe_data.get("difficulty")
+    return await _save_generated_recipe(db, current_user, payload, recipe_data, upload_record, image_bytes)
+
+def _sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+@router.post("/recipe/stream", summary="Generate Recipe (Server-Sent Events)", dependencies=[Depends(rate_limit_ai)])
+async def stream_recipe_route(
+    payload: RecipeGenerationRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Same as POST /recipe, but answers with a text/event-stream as the model writes:
+    `field` ({"name", "value"}) for title, description, tags and times, one
+    `ingredient` and one `step` event per list entry, then `recipe` with the saved
+    recipe. The response starts with the first event, so the cost limit (429) and
+    circuit breaker (503) still answer with an HTTP status; failures after that
+    arrive as an `error` event ({"status", "detail"}).
+    """
+    upload_record, image_bytes = await _load_upload(payload, current_user, db)
+    if not payload.ingredients and not image_bytes:
+        raise HTTPException(status_code=400, detail="Must provide ingredients or an image")
+
+    stream = ai_service.stream_recipe(
+        ingredients=payload.ingredients,
+        restrictions=payload.restrictions,
+        image_bytes=image_bytes,
+        user_id=current_user.id
     )
-    
-    db.add(new_recipe)
-    await db.commit()
-    await db.refresh(new_recipe)
+    try:
+        # Reserves the budget and passes the breaker before any status is sent
+        first = await stream.__anext__()
+    except Exception as e:
+        logger.error("recipe_stream_failed", error=str(e), started=False)
+        raise _generation_error(e)
+
+    async def rest() -> AsyncIterator[Tuple[str, Any]]:
+        yield first
+        async for item in stream:
+            yield item
+
+    async def events() -> AsyncIterator[bytes]:
+        # The get_db dependency has already exited when the body streams; the session is
+        # still usable and is closed here once the recipe is saved
+        try:
+            async for event, data in rest():
+                if event == "done":
+                    new_recipe = await _save_generated_recipe(db, current_user, payload, data, upload_record, image_bytes)
+                    yield _sse("recipe", jsonable_encoder(new_recipe))
+                else:
+                    yield _sse(event, data)
+        except Exception as e:
+            logger.error("recipe_stream_failed", error=str(e), started=True)
+            error = _generation_error(e)
+            yield _sse("error", {"status": error.status_code, "detail": error.detail})
+        finally:
+            await stream.aclose() # Cancels the model call if the client went away
+            await db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # No proxy buffering
+    )
+
+async def _run_recipe_job(job: AIJob, session_factory: Callable[[], AsyncSession]) -> UUID:
+    """
+    JobQueue handler for "recipe" jobs: POST /recipe, run by a queue worker.
+    The model call runs between two short sessions so no pooled connection waits on it.
+    """
+    payload = RecipeGenerationRequest(**job.payload)
+    try:
+        async with session_factory() as db:
+            current_user = await db.get(User, job.user_id)
+            upload_record, image_bytes = await _load_upload(payload, current_user, db)
+        recipe_data = await ai_service.generate_recipe(
+            ingredients=payload.ingredients,
+            restrictions=payload.restrictions,
+            image_bytes=image_bytes,
+            user_id=current_user.id
+        )
+    except HTTPException as e:
+        raise JobFailed(e.status_code, e.detail)
+    except Exception as e:
+        error = _generation_error(e)
+        raise JobFailed(error.status_code, error.detail)
+    async with session_factory() as db:
+        new_recipe = await _save_generated_recipe(db, current_user, payload, recipe_data, upload_record, image_bytes)
+    return new_recipe.id
+
+job_queue.register("recipe", _run_recipe_job)
+
+def _job_response(job: AIJob) -> dict:
+    return {
+        "jobId": job.id,
+        "status": job.status,
+        "recipeId": job.recipe_id,
+        "error": {"status": job.error_status, "detail": job.error} if job.status == JOB_FAILED else None,
+        "createdAt": job.created_at,
+        "finishedAt": job.finished_at,
+    }
+
+@router.post("/jobs", summary="Queue Recipe Generation", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit_ai)])
+async def submit_recipe_job(
+    payload: RecipeGenerationRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Queues POST /recipe and returns {"jobId", "status"} at once.
+    Poll GET /jobs/{jobId} (optionally with ?wait=seconds) for the result.
+    """
+    if not payload.ingredients and not payload.uploadId:
+        raise HTTPException(status_code=400, detail="Must provide ingredients or an image")
+    if payload.uploadId:
+        result = await db.execute(select(Upload.id).where(Upload.id == payload.uploadId, Upload.user_id == current_user.id))
+        if result.scalar() is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+
+    try:
+        job_id = await job_queue.submit(
+            db, current_user.id, "recipe", payload.model_dump(mode="json"),
+            priority=settings.AI_JOB_PRIORITIES.get(current_user.role, 0),
+        )
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many recipe generations in progress, wait for one to finish",
+            headers={"Retry-After": "5"},
+        )
+    return {"jobId": job_id, "status": "queued"}
+
+@router.get("/jobs/{job_id}", summary="Recipe Generation Status")
+async def get_recipe_job(
+    job_id: UUID,
+    wait: float = Query(0, ge=0, le=settings.AI_JOB_MAX_WAIT_SECONDS, description="Seconds to wait for the job to finish"),
+    user_id: UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(AIJob).where(AIJob.id == job_id, AIJob.user_id == user_id))
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    deadline = time.monotonic() + wait
+    while job.status in ACTIVE_JOB_STATUSES and (remaining := deadline - time.monotonic()) > 0:
+        # Give the connection back to the pool while waiting; the job is re-read after
+        await db.close()
+        await job_queue.wait(job_id, min(remaining, 1.0))
+        job = await db.get(AIJob, job_id)
+
+    if job.status in ACTIVE_JOB_STATUSES:
+        # Its worker went away (restart or crash), or it waited too long to start
+        await job_queue.expire(db, job)
+    return _job_response(job)
 
-    return new_recipe
 class IngredientValidationRequest(BaseModel):
     ingredients: List[str]
     restrictions: List[str]
@@ -91,12 +281,13 @@ class IngredientValidationRequest(BaseModel):
 @router.post("/validate", summary="Validate Ingredients", dependencies=[Depends(rate_limit_ai)])
 async def validate_ingredients_route(
     payload: IngredientValidationRequest,
-    current_user: User = Depends(get_current_user)
+    user_id: UUID = Depends(get_current_user_id)
 ):
     try:
         issues = await ai_service.validate_ingredients(
             ingredients=payload.ingredients,
-            restrictions=payload.restrictions
+            restrictions=payload.restrictions,
+            user_id=user_id
         )
         return {"issues": issues}
     except Exception as e:
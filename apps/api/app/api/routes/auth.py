@@ -1,15 +1,20 @@
 from datetime import timedelta
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
 import json
+import uuid
 
 from app.api.deps_auth import get_current_user, get_db
-from app.core.security import create_session_token, verify_password, get_password_hash
+from app.services.session_user_cache import session_user_cache
+from app.core.security import create_session_token, token_cache
+from app.services.password_hasher import verify_password, get_password_hash, password_hasher
 from app.core.config import settings
+from app.core.http_cache import USER_CACHE_CONTROL, USER_REPRESENTATION, etag_matches, not_modified, row_etag, set_validators
 from app.db.models.user import User
 from pydantic import BaseModel, EmailStr, UUID4
 from app.middleware.security import rate_limit_auth
@@ -66,6 +71,11 @@ def to_user_response(user: User) -> UserResponse:
         is_active=user.is_active
     )
 
+async def _ensure_profile_image(db: AsyncSession, user: User):
+    # get_current_user joins the profile image; only users loaded some other way need a query
+    if "profile_image" in inspect(user).unloaded:
+        await db.refresh(user, ["profile_image"])
+
 # --- Endpoints ---
 @router.post("/register", response_model=UserResponse, status_code=201, dependencies=[Depends(rate_limit_auth)])
 async def register(
@@ -79,19 +89,19 @@ async def register(
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # 2. Create User
+    # Everything the response needs is set here, so no reload after the INSERT
     new_user = User(
+        id=uuid.uuid4(),
         email=credentials.username,
-        hashed_password=get_password_hash(credentials.password),
+        hashed_password=await get_password_hash(credentials.password),
         full_name=credentials.username.split("@")[0], # Simple default
-        is_active=True
+        role="user",
+        is_active=True,
+        profile_image=None,
     )
     db.add(new_user)
     await db.commit()
     
-    # Reload with relations
-    result = await db.execute(select(User).options(selectinload(User.profile_image)).where(User.id == new_user.id))
-    new_user = result.scalars().first()
-    
     return to_user_response(new_user)
 
 @router.post("/login", response_model=UserResponse, dependencies=[Depends(rate_limit_auth)])
@@ -102,20 +112,23 @@ async def login(
 ):
     # 1. Find user
     print(f"DEBUG: Login attempt for {credentials.username}")
-    result = await db.execute(select(User).options(selectinload(User.profile_image)).where(User.email == credentials.username))
+    result = await db.execute(select(User).options(joinedload(User.profile_image)).where(User.email == credentials.username))
     user = result.scalars().first()
     
     if not user:
         print(f"DEBUG: User not found: {credentials.username}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
         
-    if not verify_password(credentials.password, user.hashed_password):
+    if not await verify_password(credentials.password, user.hashed_password):
         print(f"DEBUG: Password mismatch for {credentials.username}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
 
+    # Upgrade outdated hashes (scheme or cost changed) now that we have the plaintext
+    password_hasher.schedule_rehash(user.id, credentials.password, user.hashed_password)
+
     # 2. Create session
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     token = create_session_token(
@@ -138,7 +151,9 @@ async def login(
     return to_user_response(user)
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(response: Response, request: Request):
+    if token := request.cookies.get(settings.SESSION_COOKIE_NAME):
+        token_cache.evict(token)
     # Use SameSite=None and Secure=True to match the login cookie attributes
     response.delete_cookie(
         key=settings.SESSION_COOKIE_NAME, 
@@ -150,13 +165,19 @@ async def logout(response: Response):
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
 ):
-    # Reload with relations to ensure image is there
-    result = await db.execute(select(User).options(selectinload(User.profile_image)).where(User.id == current_user.id))
-    user = result.scalars().first()
-    return to_user_response(user)
+    # The user row is already loaded; answer revalidations before touching relations
+    etag = row_etag(USER_REPRESENTATION, current_user.id, current_user.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag, USER_CACHE_CONTROL)
+    set_validators(response, etag, USER_CACHE_CONTROL)
+
+    await _ensure_profile_image(db, current_user)
+    return to_user_response(current_user)
 
 @router.patch("/me", response_model=UserResponse)
 async def update_user_me(
@@ -164,6 +185,8 @@ async def update_user_me(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    await _ensure_profile_image(db, current_user)
+
     # 1. Update basics
     if user_in.full_name is not None:
         current_user.full_name = user_in.full_name
@@ -176,7 +199,7 @@ async def update_user_me(
     if "profileImageId" in user_in.model_dump(exclude_unset=True):
         if user_in.profileImageId is None:
             # Explicitly delete the profile picture
-            current_user.profile_image_id = None
+            current_user.profile_image = None
         else:
             # Set a new profile picture
             from app.db.models.upload import Upload
@@ -184,21 +207,21 @@ async def update_user_me(
             upload = result.scalars().first()
             if not upload:
                 raise HTTPException(status_code=404, detail="Profile image upload not found")
-            current_user.profile_image_id = upload.id
+            current_user.profile_image = upload
     
     db.add(current_user)
     await db.commit()
+    await session_user_cache.invalidate(current_user.id)
     
-    # Reload with relations
-    result = await db.execute(select(User).options(selectinload(User.profile_image)).where(User.id == current_user.id))
-    user = result.scalars().first()
-    return to_user_response(user)
+    # Relations were assigned or already loaded, so the response is built in-process
+    return to_user_response(current_user)
 
 @router.delete("/me", status_code=status.HTTP_200_OK)
 async def delete_user_me(
     response: Response,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
 ):
     """
     Permanently delete the current user's account.
@@ -229,6 +252,9 @@ async def delete_user_me(
         
         db.add(current_user)
         await db.commit()
+        await session_user_cache.invalidate(current_user.id)
+        if token := request.cookies.get(settings.SESSION_COOKIE_NAME):
+            token_cache.evict(token)
 
         print(f"User {current_user.id} soft-deleted successfully")
 
@@ -4,6 +4,7 @@ from app.api.deps import get_db
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
+from app.services.password_hasher import password_hasher
 import boto3
 from botocore.exceptions import ClientError
 
@@ -18,7 +19,8 @@ async def health_check(db: AsyncSession = Depends(get_db)):
             "storage": "unknown",
             "ai": "unknown"
         },
-        "storage_type": settings.STORAGE_BACKEND
+        "storage_type": settings.STORAGE_BACKEND,
+        "password_hasher": password_hasher.stats(),
     }
     
     # 1. Check DB
@@ -1,20 +1,40 @@
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional, Set
 from uuid import UUID
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.orm import joinedload
 from pydantic import BaseModel
 
 from app.api.deps import get_db
 from app.api.deps_auth import get_current_user
 from app.db.models.recipe import Recipe
+from app.db.models.recipe_dietary_tag import RecipeDietaryTag, normalize_tag
+from app.db.models.upload import Upload
 from app.db.models.user import User
 from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.serialization import FastJSONResponse
+from app.core.http_cache import RECIPE_CACHE_CONTROL, RECIPE_REPRESENTATION, etag_matches, not_modified, row_etag, set_validators
+from app.services.search_service import search_service
+from app.services.recipe_count_service import recipe_counter
+from app.services.recipe_cache import recipe_cache
+from app.services.generation_cache import RECIPE_FIELDS
+from app.services.nutrition_service import nutrition_estimator
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 100
+
+def dietary_tag_filter(tags: Set[str], match: str = "all") -> Select:
+    """Subquery of recipe ids carrying all (or any) of the normalized tags."""
+    subquery = select(RecipeDietaryTag.recipe_id).where(RecipeDietaryTag.tag.in_(tags))
+    if match == "all":
+        subquery = subquery.group_by(RecipeDietaryTag.recipe_id).having(func.count() == len(tags))
+    return subquery
+
 # --- Response Model ---
 class RecipeResponse(BaseModel):
     id: UUID
@@ -29,12 +49,29 @@ class RecipeResponse(BaseModel):
     difficulty: Optional[str] = None
     calories: Optional[int] = None
     created_at: datetime
+    updatedAt: Optional[datetime] = None
     imageUrl: Optional[str] = None
     userId: UUID
 
     class Config:
         from_attributes = True
 
+class RecipeSummaryResponse(BaseModel):
+    """List card (view=summary): RecipeResponse without ingredients and instructions."""
+    id: UUID
+    title: str
+    description: Optional[str] = None
+    dietaryTags: List[str] = []
+    prepTimeMinutes: Optional[int] = None
+    cookTimeMinutes: Optional[int] = None
+    servings: Optional[int] = None
+    difficulty: Optional[str] = None
+    calories: Optional[int] = None
+    created_at: datetime
+    updatedAt: Optional[datetime] = None
+    imageUrl: Optional[str] = None
+    userId: UUID
+
 class RecipeCreate(BaseModel):
     title: str
     description: Optional[str] = None
@@ -42,13 +79,14 @@ class RecipeCreate(BaseModel):
     instruction_text: str
     dietary_tags: List[str]
 
+def image_url(object_key: Optional[str]) -> Optional[str]:
+    # Use proxy endpoint logic
+    if not object_key:
+        return None
+    return f"{settings.PUBLIC_API_URL}/uploads/content/{object_key}"
+
 # Helper to map DB model to Response
 def to_recipe_response(recipe: Recipe) -> RecipeResponse:
-    image_url = None
-    if recipe.upload:
-        # Use proxy endpoint logic
-        image_url = f"{settings.PUBLIC_API_URL}/uploads/content/{recipe.upload.object_key}"
-    
     return RecipeResponse(
         id=recipe.id,
         title=recipe.title,
@@ -60,68 +98,185 @@ def to_recipe_response(recipe: Recipe) -> RecipeResponse:
         cookTimeMinutes=recipe.cook_time_minutes,
         servings=getattr(recipe, "servings", None),
         difficulty=getattr(recipe, "difficulty", None),
-        calories=None, # Not in DB yet
+        calories=recipe.calories,
         created_at=recipe.created_at,
-        imageUrl=image_url,
+        updatedAt=recipe.updated_at,
+        imageUrl=image_url(recipe.upload.object_key if recipe.upload else None),
         userId=recipe.user_id
     )
 
-@router.get("", response_model=Any) # Should be List[RecipeResponse]
+# Columns read by the list endpoint. The summary view leaves out the
+# ingredients/instructions JSON, which is most of the row width.
+RECIPE_SUMMARY_COLUMNS = (
+    Recipe.id,
+    Recipe.title,
+    Recipe.description,
+    Recipe.dietary_tags,
+    Recipe.prep_time_minutes,
+    Recipe.cook_time_minutes,
+    Recipe.servings,
+    Recipe.difficulty,
+    Recipe.calories,
+    Recipe.created_at,
+    Recipe.updated_at,
+    Recipe.user_id,
+    Upload.object_key,
+)
+RECIPE_LIST_COLUMNS = RECIPE_SUMMARY_COLUMNS + (Recipe.ingredients, Recipe.instructions)
+
+def recipe_summary_card(row) -> dict:
+    """
+    RecipeSummaryResponse-shaped dict straight from a RECIPE_SUMMARY_COLUMNS row.
+    Skips per-row model construction; keep the keys in step with the response models.
+    """
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "dietaryTags": row.dietary_tags or [],
+        "prepTimeMinutes": row.prep_time_minutes,
+        "cookTimeMinutes": row.cook_time_minutes,
+        "servings": row.servings,
+        "difficulty": row.difficulty,
+        "calories": row.calories,
+        "created_at": row.created_at,
+        "updatedAt": row.updated_at,
+        "imageUrl": image_url(row.object_key),
+        "userId": row.user_id,
+    }
+
+def recipe_card(row) -> dict:
+    """RecipeResponse-shaped dict from a RECIPE_LIST_COLUMNS row."""
+    card = recipe_summary_card(row)
+    card["ingredients"] = row.ingredients or []
+    card["instructions"] = row.instructions or []
+    return card
+
+@router.get("", response_model=Any, response_class=FastJSONResponse) # Should be List[RecipeResponse]
 async def get_recipes(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     q: Optional[str] = None,
-    dietary_tags: Optional[str] = Query(None)
+    dietary_tags: Optional[str] = Query(None),
+    tag_match: Literal["all", "any"] = "all",
+    cursor: Optional[str] = None,
+    includeTotal: bool = False,
+    view: Literal["full", "summary"] = "full",
 ) -> Any:
     """
     List public recipes with search and filtering.
+    dietary_tags is a comma-separated list matched exactly (case-insensitive);
+    tag_match=all requires every tag, tag_match=any requires at least one.
+    The feed is ordered newest first and paged with an opaque cursor (nextCursor);
+    searches (q) are ordered by relevance and paged with skip.
+    includeTotal adds an approximate "total" (see RecipeCounter) without a COUNT(*) per request.
+    view=summary returns RecipeSummaryResponse cards (no ingredients/instructions) and
+    only reads those columns.
+    Rows are read as column tuples and encoded directly (recipe_card + FastJSONResponse).
     """
-    tags_list = dietary_tags.split(",") if dietary_tags else []
-    query = select(Recipe).options(selectinload(Recipe.upload))
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    tags_list = {normalize_tag(t) for t in dietary_tags.split(",") if t.strip()} if dietary_tags else set()
+
+    cache_key = recipe_cache.list_key(
+        skip=skip, limit=limit, q=q, tags=tags_list, tag_match=tag_match, cursor=cursor, total=includeTotal, view=view
+    )
+    cached, generation = await recipe_cache.get_list(cache_key)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    summary = view == "summary"
+    columns = RECIPE_SUMMARY_COLUMNS if summary else RECIPE_LIST_COLUMNS
+    query = select(*columns).outerjoin(Upload, Recipe.upload_id == Upload.id)
     
     if q:
-        from sqlalchemy import cast, String
-        search_filter = or_(
-            Recipe.title.ilike(f"%{q}%"),
-            Recipe.description.ilike(f"%{q}%"),
-            cast(Recipe.ingredients, String).ilike(f"%{q}%"),
-            cast(Recipe.dietary_tags, String).ilike(f"%{q}%")
-        )
-        query = query.where(search_filter)
+        # Full-text search (Postgres tsvector, in-process index on SQLite), ranked by relevance
+        query = await search_service.apply(db, query, q)
     
     if tags_list:
-        from sqlalchemy import cast, String
-        # For JSON columns, we can search for exact matches or use a more complex logic
-        # Overlap is Postgres specific. A more portable way for small sets is multiple ORs or casting.
-        # Since this is a cookbook, let's stick to a robust way.
-        for tag in tags_list:
-             query = query.where(cast(Recipe.dietary_tags, String).ilike(f"%{tag}%"))
-    
-    # Simple pagination
-    query = query.offset(skip).limit(limit)
+        query = query.where(Recipe.id.in_(dietary_tag_filter(tags_list, tag_match)))
     
-    result = await db.execute(query)
-    recipes = result.scalars().all()
-    
-    data = [to_recipe_response(r) for r in recipes]
-    
-    return {"data": data, "hasMore": len(recipes) == limit}
+    total = None
+    total_estimated = False
+    if includeTotal:
+        count_key = None
+        if q or tags_list:
+            count_key = f"q={(q or '').strip().lower()}|tags={','.join(sorted(tags_list))}|match={tag_match}"
+        total, total_estimated = await recipe_counter.total(db, query, count_key)
+
+    # Newest first; id breaks ties so the order (and the cursor) is deterministic.
+    # For searches this is the tie-break after relevance.
+    query = query.order_by(Recipe.created_at.desc(), Recipe.id.desc())
+
+    if cursor and not q:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Keyset seek on (created_at DESC, id DESC), served by ix_recipes_created_at_id
+        query = query.where(tuple_(Recipe.created_at, Recipe.id) < tuple_(cursor_created_at, cursor_id))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and not q:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    to_card = recipe_summary_card if summary else recipe_card
+    data = [to_card(row) for row in rows]
+
+    response = {"data": data, "nextCursor": next_cursor, "hasMore": has_more}
+    if includeTotal:
+        response["total"] = total
+        response["totalEstimated"] = total_estimated
+
+    await recipe_cache.set_list(cache_key, generation, response)
+    return FastJSONResponse(response)
 
 @router.get("/{id}", response_model=RecipeResponse)
 async def read_recipe(
     id: UUID,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     # Public access: No current_user check
 ) -> Any:
     """
     Get recipe by ID. Public.
+    Sends a strong ETag from the row version and answers If-None-Match with 304.
     """
-    result = await db.execute(select(Recipe).options(selectinload(Recipe.upload)).where(Recipe.id == id))
+    cached, version = await recipe_cache.get_recipe(id)
+    if cached is not None:
+        etag = row_etag(RECIPE_REPRESENTATION, id, cached.get("updatedAt"))
+        if etag_matches(request, etag):
+            return not_modified(etag, RECIPE_CACHE_CONTROL)
+        set_validators(response, etag, RECIPE_CACHE_CONTROL)
+        return cached
+
+    if request.headers.get("if-none-match"):
+        # Revalidation: compare versions before loading the full row and its upload
+        result = await db.execute(select(Recipe.updated_at).where(Recipe.id == id))
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Recipe not found")
+        etag = row_etag(RECIPE_REPRESENTATION, id, row.updated_at)
+        if etag_matches(request, etag):
+            return not_modified(etag, RECIPE_CACHE_CONTROL)
+
+    result = await db.execute(select(Recipe).options(joinedload(Recipe.upload)).where(Recipe.id == id))
     recipe = result.scalars().first()
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    return to_recipe_response(recipe)
+
+    recipe_response = to_recipe_response(recipe)
+    await recipe_cache.set_recipe(id, version, jsonable_encoder(recipe_response))
+    set_validators(response, row_etag(RECIPE_REPRESENTATION, id, recipe.updated_at), RECIPE_CACHE_CONTROL)
+    return recipe_response
 
 @router.patch("/{id}", response_model=RecipeResponse)
 async def update_recipe(
@@ -134,7 +289,7 @@ async def update_recipe(
     Update a recipe.
     """
     # Fetch by ID first to check owner vs role
-    result = await db.execute(select(Recipe).options(selectinload(Recipe.upload)).where(Recipe.id == id))
+    result = await db.execute(select(Recipe).options(joinedload(Recipe.upload)).where(Recipe.id == id))
     recipe = result.scalars().first()
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
@@ -150,6 +305,9 @@ async def update_recipe(
             detail="Not enough permissions to edit this recipe"
         )
     
+    ingredients_before = recipe.ingredients
+    content_before = {f: getattr(recipe, f) for f in RECIPE_FIELDS}
+
     # Update fields
     for field in ["title", "description", "prep_time_minutes", "cook_time_minutes", "ingredients", "instructions", "dietary_tags"]:
         if field in recipe_in:
@@ -174,23 +332,27 @@ async def update_recipe(
         upload_record = result.scalars().first()
         if not upload_record:
              raise HTTPException(status_code=404, detail="Upload record not found")
-        recipe.upload_id = upload_record.id
+        # Assigning the relationship (not just upload_id) keeps recipe.upload current in-process
+        recipe.upload = upload_record
         
+    reestimate = recipe.ingredients != ingredients_before
+    if reestimate:
+        # The old estimate describes other ingredients
+        recipe.calories = recipe.protein_grams = recipe.carbs_grams = recipe.fat_grams = None
+        recipe.nutrition_estimated_at = None
+    if recipe.generation_key is not None and any(getattr(recipe, f) != v for f, v in content_before.items()):
+        # No longer the model's output: the generation cache must not serve the edits
+        recipe.generation_key = recipe.generation_ingredients = None
+
     db.add(recipe)
     await db.commit()
-    await db.refresh(recipe)
-    
-    # Refresh upload relation for response
-    # (Though update rarely changes upload currently, but needed for response)
-    # We can just use the existing eager loaded 'recipe.upload' if it wasn't changed
-    # Or reload. simpler to rely on lazy load triggers if not detached? 
-    # But usage of 'to_recipe_response' accesses it.
-    # SA Async requires explicit loading.
-    # Let's re-fetch or assume it's loaded. 'refresh' might clear relationships?
-    # Safe bet: re-fetch.
-    result = await db.execute(select(Recipe).options(selectinload(Recipe.upload)).where(Recipe.id == recipe.id))
-    recipe = result.scalars().first()
+    await recipe_cache.invalidate_recipe(recipe.id)
+    if reestimate:
+        nutrition_estimator.enqueue(recipe.id)
 
+    # No refresh/re-select: the session doesn't expire on commit, every column default
+    # (updated_at, search_text) is computed in Python during the flush, and the upload
+    # relationship was eager loaded above or just assigned.
     return to_recipe_response(recipe)
 
 @router.post("", response_model=RecipeResponse, status_code=status.HTTP_201_CREATED)
@@ -215,16 +377,16 @@ async def create_recipe(
         ingredients=recipe_in.ingredients,
         instructions=[s.strip() for s in recipe_in.instruction_text.split(".") if s.strip()],
         dietary_tags=recipe_in.dietary_tags,
+        upload=None, # Marks the relationship as loaded so the response needs no extra query
     )
     
     db.add(new_recipe)
     await db.commit()
-    await db.refresh(new_recipe)
-    
-    # Reload with upload relationship (none for new manual usually, but for consistency)
-    result = await db.execute(select(Recipe).options(selectinload(Recipe.upload)).where(Recipe.id == new_recipe.id))
-    new_recipe = result.scalars().first()
+    await recipe_cache.invalidate_lists()
+    # Calories are estimated in the background; the response carries none yet
+    nutrition_estimator.enqueue(new_recipe.id)
     
+    # id/created_at/updated_at are Python-side defaults, populated by the INSERT flush
     return to_recipe_response(new_recipe)
 
 @router.delete("/{id}")
@@ -238,7 +400,7 @@ async def delete_recipe(
     """
     # Load recipe with upload relationship to get the image object_key
     result = await db.execute(
-        select(Recipe).options(selectinload(Recipe.upload)).where(Recipe.id == id)
+        select(Recipe).options(joinedload(Recipe.upload)).where(Recipe.id == id)
     )
     recipe = result.scalars().first()
     if not recipe:
@@ -267,4 +429,5 @@ async def delete_recipe(
     
     await db.delete(recipe)
     await db.commit()
+    await recipe_cache.invalidate_recipe(id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
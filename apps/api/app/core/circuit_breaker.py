@@ -1,68 +1,267 @@
+import asyncio
+import sqlite3
+import threading
 import time
-from typing import Callable, Any, TypeVar, Optional
-import functools
+from abc import ABC, abstractmethod
+from typing import Callable, Any, Dict, Optional, Tuple, TypeVar
+
+import structlog
+
 from app.core.config import settings
+from app.core.serialization import dumps, loads
+
+logger = structlog.get_logger()
 
 T = TypeVar("T")
 
+CLOSED, OPEN, HALF_OPEN = "CLOSED", "OPEN", "HALF_OPEN"
+
 class CircuitBreakerOpen(Exception):
     pass
 
+def new_state() -> dict:
+    # buckets: [[bucket_start, calls, failures], ...] covering the rolling window
+    return {"state": CLOSED, "opened_at": 0.0, "probes": 0, "probe_successes": 0, "buckets": []}
+
+class CircuitStoreBase(ABC):
+    """
+    Holds breaker state dicts by name. transact() applies fn to the current state
+    atomically and stores the result, so every worker sharing the store sees the
+    same transitions. fn returns (new_state, result).
+    """
+    blocking = False # True if transact() does I/O and should run off the event loop
+
+    @abstractmethod
+    def transact(self, name: str, fn: Callable[[dict], Tuple[dict, Any]]) -> Any:
+        pass
+
+class MemoryCircuitStore(CircuitStoreBase):
+    """Per-process state: each worker trips and recovers on its own."""
+    def __init__(self):
+        self._states: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def transact(self, name: str, fn: Callable[[dict], Tuple[dict, Any]]) -> Any:
+        with self._lock:
+            state, result = fn(self._states.get(name) or new_state())
+            self._states[name] = state
+            return result
+
+class SQLiteCircuitStore(CircuitStoreBase):
+    """
+    Shared by every worker on one host through a SQLite file. Each transition is a
+    single BEGIN IMMEDIATE transaction, which serializes workers.
+    """
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS circuit_breakers (name TEXT PRIMARY KEY, state TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def transact(self, name: str, fn: Callable[[dict], Tuple[dict, Any]]) -> Any:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM circuit_breakers WHERE name = ?", (name,)).fetchone()
+            state, result = fn(loads(row[0]) if row else new_state())
+            conn.execute(
+                "INSERT OR REPLACE INTO circuit_breakers (name, state) VALUES (?, ?)",
+                (name, dumps(state).decode("utf-8")),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+def get_circuit_store() -> CircuitStoreBase:
+    if settings.CIRCUIT_BREAKER_BACKEND == "sqlite":
+        return SQLiteCircuitStore(settings.CIRCUIT_BREAKER_SQLITE_PATH)
+    return MemoryCircuitStore()
+
 class CircuitBreaker:
-    def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 60):
+    """
+    - CLOSED: calls pass. Outcomes are counted in a rolling window of window_seconds.
+      The breaker opens once the window holds at least failure_threshold failures
+      and failure_rate of its calls failed, so old failures decay away.
+    - OPEN: calls fail fast with CircuitBreakerOpen for recovery_timeout seconds.
+    - HALF_OPEN: at most half_open_max_calls probes run at once; everyone else
+      still fails fast. A successful probe closes the breaker, a failed one reopens it.
+      Probes lost without an outcome (e.g. a killed worker) free up after recovery_timeout.
+
+    State lives in a CircuitStoreBase, private to the breaker by default. Breakers
+    sharing a store under the same name (e.g. SQLiteCircuitStore across workers)
+    share state. Store errors fail open: the call goes through untracked.
+    """
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 60,
+        failure_rate: float = 0.5,
+        window_seconds: float = 60,
+        half_open_max_calls: int = 1,
+        name: str = "default",
+        store: Optional[CircuitStoreBase] = None,
+    ):
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
-        self.failures = 0
-        self.last_failure_time = 0
-        self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.name = name
+        self.store = store if store is not None else MemoryCircuitStore()
+        self.bucket_seconds = window_seconds / 10
 
-    def call(self, func: Callable[..., T], *args, **kwargs) -> T:
-        if self.state == "OPEN":
-            if time.time() - self.last_failure_time > self.recovery_timeout:
-                self.state = "HALF_OPEN"
-            else:
-                raise CircuitBreakerOpen("Circuit is open due to repeated failures")
+    # Transitions. Pure functions of (state, now) so every store applies them the same way.
+
+    def _before(self, state: dict, now: float) -> Tuple[dict, Optional[bool]]:
+        """Returns None to reject, else whether the admitted call is a half-open probe."""
+        if state["state"] == OPEN:
+            if now - state["opened_at"] < self.recovery_timeout:
+                return state, None
+            state.update(state=HALF_OPEN, opened_at=now, probes=0, probe_successes=0)
+        if state["state"] == HALF_OPEN:
+            if state["probes"] >= self.half_open_max_calls:
+                if now - state["opened_at"] < self.recovery_timeout:
+                    return state, None
+                # The probes in flight never reported back; start a new round
+                state.update(opened_at=now, probes=0)
+            state["probes"] += 1
+            return state, True
+        return state, False
+
+    def _after(self, state: dict, now: float, success: bool, probe: bool) -> Tuple[dict, None]:
+        if probe:
+            if state["state"] != HALF_OPEN:
+                # Another probe already decided the outcome
+                return state, None
+            state["probes"] = max(state["probes"] - 1, 0)
+            if not success:
+                state.update(state=OPEN, opened_at=now, probes=0)
+                return state, None
+            state["probe_successes"] += 1
+            if state["probe_successes"] >= self.half_open_max_calls:
+                state = new_state()
+            return state, None
 
+        bucket_start = now - now % self.bucket_seconds
+        buckets = [b for b in state["buckets"] if b[0] > now - self.window_seconds]
+        if buckets and buckets[-1][0] == bucket_start:
+            buckets[-1][1] += 1
+            buckets[-1][2] += 0 if success else 1
+        else:
+            buckets.append([bucket_start, 1, 0 if success else 1])
+        state["buckets"] = buckets
+
+        if not success and state["state"] == CLOSED:
+            calls = sum(b[1] for b in buckets)
+            failures = sum(b[2] for b in buckets)
+            if failures >= self.failure_threshold and failures / calls >= self.failure_rate:
+                state.update(state=OPEN, opened_at=now, probes=0)
+                logger.warning("circuit_breaker_opened", breaker=self.name, failures=failures, calls=calls)
+        return state, None
+
+    def _abandon_probe(self, state: dict) -> Tuple[dict, None]:
+        if state["state"] == HALF_OPEN:
+            state["probes"] = max(state["probes"] - 1, 0)
+        return state, None
+
+    # Store access
+
+    def _transact(self, fn: Callable[[dict], Tuple[dict, Any]], default: Any = None) -> Any:
+        try:
+            return self.store.transact(self.name, fn)
+        except Exception as e:
+            logger.warning("circuit_breaker_store_error", breaker=self.name, error=str(e))
+            return default
+
+    async def _transact_async(self, fn: Callable[[dict], Tuple[dict, Any]], default: Any = None) -> Any:
+        if self.store.blocking:
+            return await asyncio.to_thread(self._transact, fn, default)
+        return self._transact(fn, default)
+
+    def _admit(self, probe: Optional[bool]) -> bool:
+        if probe is None:
+            raise CircuitBreakerOpen("Circuit is open due to repeated failures")
+        return probe
+
+    # Public API
+
+    def call(self, func: Callable[..., T], *args, **kwargs) -> T:
+        probe = self._admit(self._transact(lambda s: self._before(s, time.time()), default=False))
         try:
             result = func(*args, **kwargs)
-            if self.state == "HALF_OPEN":
-                self.reset()
-            return result
         except Exception as e:
-            self.record_failure()
-            if self.state == "HALF_OPEN":
-                 self.state = "OPEN"
+            self._transact(lambda s: self._after(s, time.time(), False, probe))
             raise e
+        self._transact(lambda s: self._after(s, time.time(), True, probe))
+        return result
 
     async def call_async(self, func: Callable[..., Any], *args, **kwargs) -> Any:
-        if self.state == "OPEN":
-            if time.time() - self.last_failure_time > self.recovery_timeout:
-                self.state = "HALF_OPEN"
-            else:
-                raise CircuitBreakerOpen("Circuit is open due to repeated failures")
-
+        probe = self._admit(await self._transact_async(lambda s: self._before(s, time.time()), default=False))
         try:
             # Await the coroutine here to catch the exception
             result = await func(*args, **kwargs)
-            if self.state == "HALF_OPEN":
-                self.reset()
-            return result
         except Exception as e:
-            self.record_failure()
-            if self.state == "HALF_OPEN":
-                 self.state = "OPEN"
+            await self._transact_async(lambda s: self._after(s, time.time(), False, probe))
             raise e
+        except BaseException:
+            # Cancellation says nothing about the upstream, but a probe must free its slot
+            if probe:
+                self._transact(self._abandon_probe)
+            raise
+        await self._transact_async(lambda s: self._after(s, time.time(), True, probe))
+        return result
 
     def record_failure(self):
-        self.failures += 1
-        self.last_failure_time = time.time()
-        if self.failures >= self.failure_threshold:
-            self.state = "OPEN"
+        self._transact(lambda s: self._after(s, time.time(), False, False))
 
     def reset(self):
-        self.failures = 0
-        self.state = "CLOSED"
+        self._transact(lambda s: (new_state(), None))
+
+    @property
+    def state(self) -> str:
+        return self._transact(lambda s: (s, s["state"]), default=CLOSED)
+
+    @state.setter
+    def state(self, value: str):
+        def set_state(s: dict):
+            if value == CLOSED:
+                return new_state(), None
+            s.update(state=value, opened_at=time.time(), probes=0, probe_successes=0)
+            return s, None
+        self._transact(set_state)
+
+    @property
+    def failures(self) -> int:
+        """Failures in the rolling window."""
+        now = time.time()
+        return self._transact(
+            lambda s: (s, sum(b[2] for b in s["buckets"] if b[0] > now - self.window_seconds)), default=0
+        )
 
 # Global instances per feature
-steps_breaker = CircuitBreaker()
-nutrition_breaker = CircuitBreaker()
+circuit_store = get_circuit_store()
+
+def _feature_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_SECONDS,
+        failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+        window_seconds=settings.CIRCUIT_BREAKER_WINDOW_SECONDS,
+        half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+        name=name,
+        store=circuit_store,
+    )
+
+steps_breaker = _feature_breaker("steps")
+nutrition_breaker = _feature_breaker("nutrition")
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
-from typing import List, Union, Any
+from typing import Dict, List, Tuple, Union, Any
 import json
 
 class Settings(BaseSettings):
@@ -21,6 +21,15 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     SESSION_COOKIE_NAME: str = "session_id"
+    TOKEN_CACHE_MAX_ENTRIES: int = 4096 # Verified session tokens kept per process (0 disables)
+    PASSWORD_HASH_SCHEME: str = "bcrypt" # bcrypt | argon2 (argon2id); existing hashes migrate on login
+    BCRYPT_ROUNDS: int = 12 # Each +1 doubles login CPU; hashes below this are upgraded on login
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST_KIB: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_EXECUTOR: str = "process" # process | thread
+    PASSWORD_HASH_WORKERS: int = 2 # Concurrent bcrypt operations per API worker
+    PASSWORD_HASH_MAX_QUEUE: int = 32 # Waiting operations beyond this get a 503
     CORS_ORIGINS: Any = ["http://localhost:3000", "http://localhost:3001", "http://127.0.0.1:3000", "http://127.0.0.1:3001"]
     
     @field_validator("CORS_ORIGINS", mode="before")
@@ -52,6 +61,68 @@ class Settings(BaseSettings):
     PUBLIC_AWS_ENDPOINT_URL: str = "" # Defaults to AWS_ENDPOINT_URL if not set
     # AI
     OPENAI_API_KEY: str = ""
+    AI_MONTHLY_LIMIT_USD: float = 5.0
+    AI_USER_MONTHLY_LIMIT_USD: float = 0.0 # Per-user monthly budget; 0 = no per-user cap
+    # model -> (USD per 1M input tokens, USD per 1M output tokens). Unknown models use the most expensive entry.
+    AI_MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-3.5-turbo": (0.50, 1.50),
+    }
+    COST_LEDGER_ENABLED: bool = True # Persist spend in the ai_spend table, shared by all workers
+    COST_LEDGER_SYNC_SECONDS: float = 5.0 # How often a worker flushes and reloads spend; bounds cross-worker overshoot
+
+    # Circuit breakers (per AI feature)
+    CIRCUIT_BREAKER_BACKEND: str = "memory" # memory (per worker) | sqlite (shared per host)
+    CIRCUIT_BREAKER_SQLITE_PATH: str = "/tmp/cookbook-breakers.sqlite3"
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5 # Minimum failures in the window before the breaker can open
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5 # ...and the share of calls in the window that failed
+    CIRCUIT_BREAKER_WINDOW_SECONDS: float = 60
+    CIRCUIT_BREAKER_RECOVERY_SECONDS: float = 60 # How long the breaker stays open before probing
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 1 # Concurrent probes while half-open; this many successes close it
+
+    # Nutrition estimates (background, batched)
+    NUTRITION_ESTIMATION_ENABLED: bool = True
+    NUTRITION_BATCH_SIZE: int = 8 # Recipes per model call
+    NUTRITION_BATCH_WAIT_SECONDS: float = 2.0 # How long new recipes wait for others to share a call
+
+    # Generated recipes reused for equivalent requests (normalized ingredients/restrictions)
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_TTL_SECONDS: int = 86400
+    GENERATION_CACHE_SIMILARITY: float = 0.8 # Share of the requested ingredients an existing recipe must use
+    VALIDATION_CACHE_ENABLED: bool = True # Per-process memo of (ingredient, restriction) verdicts
+    VALIDATION_CACHE_TTL_SECONDS: int = 604800
+    VALIDATION_CACHE_MAX_ENTRIES: int = 50000
+
+    # Queued AI generations (POST /ai/jobs)
+    AI_JOB_WORKERS: int = 4 # Concurrent generations per process
+    AI_JOB_MAX_PENDING_PER_USER: int = 3 # Queued + running jobs per user, across all processes
+    AI_JOB_PRIORITIES: Dict[str, int] = {"user": 0, "maintainer": 1, "admin": 2} # By role; higher runs first
+    AI_JOB_TIMEOUT_SECONDS: int = 300 # Jobs queued this long, or running this long since they started, fail as interrupted
+    AI_JOB_MAX_WAIT_SECONDS: float = 30.0 # Longest ?wait= a status poll may block for
+
+    # Caching
+    CACHE_BACKEND: str = "memory" # memory | redis
+    CACHE_URL: str = "" # e.g. redis://localhost:6379/0 when CACHE_BACKEND=redis
+    CACHE_MAX_ENTRIES: int = 2048 # Per-process LRU bound for the memory backend
+    RECIPE_CACHE_ENABLED: bool = True
+    RECIPE_CACHE_TTL_SECONDS: int = 30
+    SESSION_USER_CACHE_ENABLED: bool = True
+    SESSION_USER_CACHE_TTL_SECONDS: int = 60 # Bounds staleness for user changes made outside the app
+
+    # Rate limiting
+    RATE_LIMIT_BACKEND: str = "memory" # memory (per worker) | sqlite (shared per host) | redis (shared)
+    RATE_LIMIT_SQLITE_PATH: str = "/tmp/cookbook-ratelimit.sqlite3"
+    RATE_LIMIT_URL: str = "" # Defaults to CACHE_URL when RATE_LIMIT_BACKEND=redis
+    # Per route policy: tier (anonymous | user | maintainer | admin) -> "N/second|minute|hour|day".
+    # Tiers without an entry use "default". Set as JSON in the environment.
+    RATE_LIMITS: Dict[str, Dict[str, str]] = {
+        "auth": {"default": "5/minute"},
+        "ai": {"default": "10/hour", "maintainer": "100/hour", "admin": "1000/hour"},
+    }
+
+    # Listings
+    RECIPE_COUNT_CACHE_TTL_SECONDS: int = 60 # How long a cached filtered count is served before a background recount
 
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -0,0 +1,262 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+from app.core.ingredients import normalize_ingredient, normalize_restriction
+
+# check() result when the rules can't decide and the model should be asked
+UNKNOWN = object()
+
+# Ingredient categories -> terms. Terms go through normalize_ingredient at compile time,
+# so plurals and synonyms match the same way user input does. A term listed under
+# several categories has all of them ("peanut" is nuts and legume).
+TAXONOMY: Dict[str, Tuple[str, ...]] = {
+    "meat": (
+        "beef", "steak", "ground beef", "veal", "lamb", "mutton", "goat", "venison", "chicken", "turkey",
+        "duck", "goose", "quail", "rabbit", "meatball", "burger patty", "hot dog", "corned beef", "brisket",
+        "chicken breast", "chicken thigh", "chicken wing", "chicken broth", "chicken stock", "beef broth",
+        "beef stock", "bone broth", "gelatin", "gelatine", "suet", "tallow", "sausage", "salami",
+        "pepperoni", "chorizo", # May be pork, beef or poultry
+    ),
+    "pork": ("pork", "bacon", "ham", "prosciutto", "pancetta", "lard", "pork belly", "pork chop", "guanciale", "spare rib"),
+    "fish": (
+        "fish", "salmon", "tuna", "cod", "haddock", "halibut", "trout", "tilapia", "sardine", "anchovy",
+        "mackerel", "sea bass", "snapper", "fish sauce", "worcestershire sauce",
+    ),
+    "shellfish": (
+        "shrimp", "crab", "lobster", "clam", "mussel", "oyster", "scallop", "squid", "calamari", "octopus",
+        "crayfish", "oyster sauce",
+    ),
+    "dairy": (
+        "milk", "whole milk", "butter", "cheese", "cream", "heavy cream", "sour cream", "cream cheese",
+        "yogurt", "yoghurt", "ghee", "whey", "casein", "buttermilk", "parmesan", "mozzarella", "cheddar",
+        "feta", "ricotta", "mascarpone", "brie", "gouda", "paneer", "custard", "ice cream", "condensed milk",
+        "nutella",
+    ),
+    # Cheeses usually set with animal rennet
+    "rennet": ("cheese", "parmesan", "mozzarella", "cheddar", "feta", "brie", "gouda", "whey", "casein"),
+    # Dairy with enough lactose to matter for keto
+    "lactose": ("milk", "whole milk", "buttermilk", "yogurt", "yoghurt", "condensed milk"),
+    "egg": ("egg", "egg yolk", "egg white", "mayonnaise", "meringue", "custard"),
+    "honey": ("honey",),
+    "gluten": (
+        "wheat", "flour", "bread", "breadcrumb", "panko", "pasta", "spaghetti", "macaroni", "penne",
+        "lasagna", "couscous", "semolina", "barley", "rye", "spelt", "bulgur", "farro", "seitan",
+        "soy sauce", "tortilla", "pita", "naan", "bagel", "cracker", "crouton", "udon", "ramen",
+        "pizza dough", "pie crust", "beer", "malt",
+    ),
+    "nuts": (
+        "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia", "brazil nut",
+        "pine nut", "peanut", "peanut butter", "almond flour", "nutella",
+    ),
+    "sugar": (
+        "sugar", "brown sugar", "powdered sugar", "icing sugar", "corn syrup", "maple syrup", "agave",
+        "molasses", "caramel", "chocolate", "jam", "ketchup", "nutella", "ice cream", "condensed milk",
+        "custard", "meringue", "mirin", "malt",
+    ),
+    # Often whitened with bone char
+    "refined_sugar": ("sugar", "brown sugar", "powdered sugar", "icing sugar"),
+    "grain": (
+        "rice", "brown rice", "white rice", "corn", "oat", "quinoa", "cornmeal", "polenta", "millet",
+        "rice noodle", "wheat", "flour", "semolina", "couscous", "barley", "rye", "spelt", "bulgur", "farro",
+    ),
+    "starch": (
+        "potato", "sweet potato", "bread", "breadcrumb", "panko", "pasta", "spaghetti", "macaroni", "penne",
+        "lasagna", "tortilla", "pita", "naan", "bagel", "cracker", "crouton", "udon", "ramen", "pizza dough",
+        "pie crust",
+    ),
+    "legume": (
+        "bean", "black bean", "kidney bean", "green pea", "pea", "lentil", "chickpea", "soybean", "tofu",
+        "tempeh", "edamame", "hummus", "miso", "peanut", "peanut butter", "soy sauce",
+    ),
+    "alcohol": ("wine", "red wine", "white wine", "rum", "vodka", "brandy", "whiskey", "bourbon", "sake", "mirin", "sherry", "beer"),
+    # May be fined with gelatin or isinglass, and need kosher certification
+    "wine": ("wine", "red wine", "white wine", "sherry", "sake", "beer"),
+    "high_fodmap": (
+        "garlic", "onion", "green onion", "shallot", "leek", "apple", "pear", "mango", "watermelon",
+        "cauliflower", "mushroom", "asparagus", "artichoke", "agave", "cashew", "pistachio", "rum", "corn syrup",
+    ),
+    # Low-FODMAP only in small servings
+    "fodmap_portion": ("avocado", "almond", "almond flour", "celery", "sweet potato", "squash", "pumpkin", "corn", "beet"),
+    "fruit": (
+        "apple", "pear", "mango", "watermelon", "orange", "kiwi", "strawberry", "blueberry", "raspberry",
+        "grape", "pineapple", "banana", "date", "raisin",
+    ),
+    "sweet_fruit": ("mango", "grape", "pineapple", "banana", "date", "raisin"),
+    # Carb-heavier vegetables and nuts; keto/low-carb depend on the amount
+    "moderate_carb": (
+        "carrot", "beet", "pumpkin", "squash", "corn", "green pea", "onion", "shallot", "leek", "cashew", "pistachio",
+    ),
+    # Tree nuts to some allergen lists, not to others
+    "nut_like": ("coconut", "coconut oil"),
+    "seed_oil": ("canola oil", "vegetable oil"),
+    # Recognized, and restricted by none of the categories above
+    "plant": (
+        "tomato", "carrot", "celery", "cucumber", "lettuce", "spinach", "kale", "cabbage", "broccoli",
+        "zucchini", "eggplant", "bell pepper", "chili pepper", "jalapeno", "radish", "beet", "pumpkin",
+        "squash", "arugula", "bok choy", "green bean", "olive", "avocado", "lemon", "lime", "coconut",
+        "ginger", "coriander", "parsley", "basil", "mint", "thyme", "rosemary", "oregano", "dill", "sage",
+        "bay leaf", "cumin", "paprika", "turmeric", "cinnamon", "nutmeg", "cardamom", "black pepper",
+        "pepper", "chili flake", "salt", "sea salt", "water", "olive oil", "vegetable oil", "canola oil",
+        "sesame oil", "coconut oil", "avocado oil", "vinegar", "lemon juice", "lime juice", "sesame seed",
+        "sunflower seed", "pumpkin seed", "chia seed", "flaxseed", "tahini", "nutritional yeast",
+        "baking soda", "yeast", "cocoa powder", "stevia", "erythritol",
+    ),
+    # Dishes, prepared products and generic names: their other ingredients vary by recipe
+    # or brand (egg in pasta, breadcrumbs in meatballs, onion in stock), so they can be
+    # reported as violations locally but are never declared compatible without the model.
+    "composite": (
+        "meatball", "burger patty", "hot dog", "corned beef", "sausage", "salami", "pepperoni", "chorizo",
+        "chicken broth", "chicken stock", "beef broth", "beef stock", "bone broth", "gelatin", "gelatine",
+        "fish", "fish sauce", "worcestershire sauce", "oyster sauce", "custard", "ice cream",
+        "condensed milk", "nutella", "mayonnaise", "meringue", "bread", "breadcrumb", "panko", "pasta",
+        "spaghetti", "macaroni", "penne", "lasagna", "tortilla", "pita", "naan", "bagel", "cracker",
+        "crouton", "udon", "ramen", "pizza dough", "pie crust", "soy sauce", "miso", "tempeh", "hummus",
+        "caramel", "chocolate", "jam", "ketchup", "rice noodle", "peanut butter", "oat", "cheese",
+    ),
+}
+
+# Which categories each diet rules out. "ambiguous" categories depend on things the
+# ingredient name doesn't say (slaughter, rennet, amounts), so they go to the model.
+DIET_RULES: Dict[str, Dict[str, FrozenSet[str]]] = {
+    "vegetarian": {"forbidden": frozenset({"meat", "pork", "fish", "shellfish"}), "ambiguous": frozenset({"rennet", "wine"})},
+    "vegan": {
+        "forbidden": frozenset({"meat", "pork", "fish", "shellfish", "dairy", "egg", "honey"}),
+        "ambiguous": frozenset({"wine", "refined_sugar"}),
+    },
+    "pescatarian": {"forbidden": frozenset({"meat", "pork"}), "ambiguous": frozenset({"rennet"})},
+    "gluten-free": {"forbidden": frozenset({"gluten"})},
+    "dairy-free": {"forbidden": frozenset({"dairy"})},
+    "nut-free": {"forbidden": frozenset({"nuts"}), "ambiguous": frozenset({"nut_like"})},
+    # Carbs, not gluten or legumes as such: wheat products are also grain or starch, while
+    # soy sauce, tofu and peanuts depend on the amount
+    "keto": {
+        "forbidden": frozenset({"sugar", "grain", "starch", "honey", "sweet_fruit"}),
+        "ambiguous": frozenset({"fruit", "moderate_carb", "lactose", "legume", "gluten"}),
+    },
+    "low-carb": {
+        "forbidden": frozenset({"sugar", "grain", "starch", "honey", "sweet_fruit"}),
+        "ambiguous": frozenset({"fruit", "moderate_carb", "lactose", "legume", "gluten"}),
+    },
+    "paleo": {
+        "forbidden": frozenset({"gluten", "grain", "legume", "dairy", "sugar", "honey"}),
+        "ambiguous": frozenset({"starch", "seed_oil", "alcohol"}),
+    },
+    "sugar-free": {"forbidden": frozenset({"sugar", "honey"}), "ambiguous": frozenset({"sweet_fruit"})},
+    "halal": {"forbidden": frozenset({"pork", "alcohol"}), "ambiguous": frozenset({"meat", "rennet"})},
+    "kosher": {"forbidden": frozenset({"pork", "shellfish"}), "ambiguous": frozenset({"meat", "rennet", "wine"})},
+    "low-fodmap": {
+        "forbidden": frozenset({"high_fodmap", "honey"}),
+        "ambiguous": frozenset({"legume", "dairy", "gluten", "fruit", "fodmap_portion"}),
+    },
+}
+
+SUGGESTIONS = {
+    "meat": "tofu, tempeh or mushrooms",
+    "pork": "chicken, turkey or smoked tofu",
+    "fish": "marinated tofu or hearts of palm",
+    "shellfish": "king oyster mushrooms",
+    "dairy": "a plant-based alternative (oat, soy or coconut)",
+    "egg": "a flax or chia egg",
+    "honey": "maple syrup or agave",
+    "gluten": "a certified gluten-free alternative (e.g. tamari, rice flour)",
+    "nuts": "seeds such as sunflower or pumpkin seeds",
+    "sugar": "a sugar-free sweetener such as stevia or erythritol",
+    "grain": "cauliflower rice or other low-carb vegetables",
+    "starch": "cauliflower rice or other low-carb vegetables",
+    "sweet_fruit": "berries in small amounts",
+    "legume": "extra vegetables or mushrooms",
+    "alcohol": "broth, vinegar or grape juice",
+    "high_fodmap": "garlic-infused oil or the green parts of spring onions",
+}
+
+# A diet that forbids the fallback category too gets its suggestion (no chicken for vegans)
+SUGGESTION_FALLBACK = {"pork": "meat", "shellfish": "fish", "honey": "sugar"}
+
+LABELS = {
+    "meat": "meat", "pork": "pork", "fish": "fish", "shellfish": "shellfish", "dairy": "dairy",
+    "egg": "egg", "honey": "honey", "gluten": "gluten", "nuts": "nuts", "sugar": "sugar",
+    "grain": "grains", "starch": "starchy carbohydrates", "sweet_fruit": "high-sugar fruit",
+    "legume": "legumes", "alcohol": "alcohol",
+    "high_fodmap": "high-FODMAP ingredients",
+}
+
+class TermTrie:
+    """
+    Word-level trie over normalized terms. scan() walks it from every token and keeps the
+    longest match, so one pass over an ingredient finds all of its known terms.
+    """
+    _END = "" # Tokens are never empty, so this key can't collide with a word
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def add(self, tokens: List[str], categories: FrozenSet[str]):
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[self._END] = node.get(self._END, frozenset()) | categories
+
+    def scan(self, tokens: List[str]) -> Tuple[List[Tuple[str, FrozenSet[str]]], List[str]]:
+        """Returns the matched (term, categories) and the tokens that weren't part of any match."""
+        matches, unmatched = [], []
+        i = 0
+        while i < len(tokens):
+            node, j, best = self.root, i, None
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if self._END in node:
+                    best = (j, node[self._END])
+            if best is None:
+                unmatched.append(tokens[i])
+                i += 1
+                continue
+            end, categories = best
+            matches.append((" ".join(tokens[i:end]), categories))
+            i = end
+        return matches, unmatched
+
+class DietaryRules:
+    """
+    Deterministic pre-check for the 13 diets the generation prompt tags.
+
+    check() only answers when the whole ingredient is one known term: a violation if
+    the term belongs to a category the diet forbids, compatible if it is a whole food
+    (not "composite") in no forbidden or ambiguous category. Anything else is UNKNOWN
+    and left to the model: extra words ("oat milk", "butter beans", "gluten-free
+    pasta", "cream of tartar"), composite dishes and products, other restrictions.
+    """
+    def __init__(self, taxonomy: Dict[str, Iterable[str]], diet_rules: Dict[str, Dict[str, FrozenSet[str]]]):
+        self.diet_rules = diet_rules
+        self.trie = TermTrie()
+        for category, terms in taxonomy.items():
+            for term in terms:
+                tokens = normalize_ingredient(term).split()
+                if tokens:
+                    self.trie.add(tokens, frozenset({category}) if category != "plant" else frozenset())
+
+    def check(self, ingredient: str, restriction: str) -> Any:
+        rules = self.diet_rules.get(normalize_restriction(restriction))
+        if rules is None:
+            return UNKNOWN
+        matches, unmatched = self.trie.scan(normalize_ingredient(ingredient).split())
+        # Any other word can change what the ingredient is ("oat milk" isn't milk)
+        if len(matches) != 1 or unmatched:
+            return UNKNOWN
+        term, categories = matches[0]
+
+        violated = sorted(categories & rules["forbidden"])
+        if violated:
+            category = violated[0]
+            label = LABELS[category] if LABELS[category] == term else f"{LABELS[category]} ({term})"
+            fallback = SUGGESTION_FALLBACK.get(category)
+            if fallback in rules["forbidden"]:
+                category = fallback
+            return {
+                "issue": f"Not {restriction}: contains {label}.",
+                "suggestion": f"Use {SUGGESTIONS[category]} instead.",
+            }
+        if "composite" in categories or categories & rules.get("ambiguous", frozenset()):
+            return UNKNOWN
+        return None
+
+dietary_rules = DietaryRules(TAXONOMY, DIET_RULES)
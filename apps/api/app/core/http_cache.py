@@ -0,0 +1,37 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Union
+from fastapi import Request, Response
+
+# Cache-Control per route. "no-cache" lets clients store the body but makes them
+# revalidate with If-None-Match every time, which is cheap thanks to the 304 path.
+RECIPE_CACHE_CONTROL = "public, no-cache"
+USER_CACHE_CONTROL = "private, no-cache"
+
+# Bump when a response model changes shape so clients don't revalidate into an old body
+RECIPE_REPRESENTATION = "recipe.v1"
+USER_REPRESENTATION = "user.v1"
+
+def row_etag(representation: str, row_id: Any, updated_at: Union[datetime, str, None]) -> str:
+    """Strong ETag derived from a row's identity and version (updated_at)."""
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    payload = f"{representation}|{row_id}|{updated_at or ''}"
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return etag in candidates
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def set_validators(response: Response, etag: str, cache_control: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
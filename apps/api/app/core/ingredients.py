@@ -0,0 +1,80 @@
+import re
+from typing import Iterable, List
+
+# Quantities, units and preparation words that don't change what the ingredient is
+_QUANTITY_RE = re.compile(r"^[\d/.,\s½¼¾⅓⅔-]+")
+_NOISE_WORDS = {
+    "a", "an", "of", "some", "fresh", "chopped", "diced", "sliced", "minced", "large", "small", "medium",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon", "teaspoons",
+    "g", "gram", "grams", "kg", "ml", "l", "oz", "ounce", "ounces", "lb", "lbs", "pound", "pounds",
+    "pinch", "handful", "clove", "cloves", "can", "cans",
+}
+_WORD_RE = re.compile(r"[a-z]+")
+
+# Regional and common alternative names -> one canonical name (singular forms)
+INGREDIENT_SYNONYMS = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "garbanzo bean": "chickpea",
+    "garbanzo": "chickpea",
+    "cilantro": "coriander",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "capsicum": "bell pepper",
+    "rocket": "arugula",
+    "prawn": "shrimp",
+    "minced meat": "ground beef",
+    "mince": "ground beef",
+    "caster sugar": "sugar",
+    "plain flour": "flour",
+    "all purpose flour": "flour",
+    "beetroot": "beet",
+    "maize": "corn",
+}
+
+# Words that end in "s" in the singular
+_SINGULAR_S = {"hummus", "asparagus", "couscous", "molasses", "swiss", "citrus", "lemongrass", "grass", "octopus"}
+
+def singularize(word: str) -> str:
+    """Rough English singular for ingredient words ("tomatoes" -> "tomato", "berries" -> "berry")."""
+    if len(word) <= 3 or word in _SINGULAR_S or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes") or word.endswith(("ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+def normalize_ingredient(ingredient: str) -> str:
+    """Canonical ingredient name: "2 cups Chopped Tomatoes" -> "tomato", "Scallions" -> "green onion"."""
+    text = _QUANTITY_RE.sub("", ingredient.strip().lower())
+    words = [singularize(w) for w in _WORD_RE.findall(text) if w not in _NOISE_WORDS]
+    name = " ".join(words)
+    return INGREDIENT_SYNONYMS.get(name, name)
+
+def normalize_ingredients(ingredients: Iterable[str]) -> List[str]:
+    """Sorted, de-duplicated canonical names; order and spelling variants don't matter."""
+    return sorted({name for name in (normalize_ingredient(i) for i in ingredients) if name})
+
+RESTRICTION_SYNONYMS = {
+    "ketogenic": "keto",
+    "no-gluten": "gluten-free",
+    "celiac": "gluten-free",
+    "coeliac": "gluten-free",
+    "no-dairy": "dairy-free",
+    "nut-allergy": "nut-free",
+    "no-sugar": "sugar-free",
+    "low-carbohydrate": "low-carb",
+    "pescetarian": "pescatarian",
+    "fodmap": "low-fodmap",
+}
+
+def normalize_restriction(restriction: str) -> str:
+    """Canonical diet name: "Gluten Free" -> "gluten-free", "Ketogenic" -> "keto"."""
+    name = re.sub(r"[\s_-]+", "-", restriction.strip().lower())
+    return RESTRICTION_SYNONYMS.get(name, name)
+
+def normalize_restrictions(restrictions: Iterable[str]) -> List[str]:
+    return sorted({name for name in (normalize_restriction(r) for r in restrictions) if name})
@@ -0,0 +1,103 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+class JSONObjectStream:
+    """
+    Incremental parser for a JSON object that arrives in chunks (a streamed model reply).
+
+    feed() returns the events completed by the new text, in order:
+    - ("item", key, value) for each element of a top-level array as soon as it closes
+    - ("field", key, value) for each top-level member once its value is complete
+    Only the top level is tracked; nested values are decoded whole with json.loads.
+    """
+    def __init__(self):
+        self._text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._value_is_array = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        start = len(self._text)
+        self._text += chunk
+
+        events: List[Tuple[str, str, Any]] = []
+        for i in range(start, len(self._text)):
+            c = self._text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._string_closed(i, events)
+                continue
+
+            if c in _WHITESPACE:
+                continue
+            if c == '"':
+                self._in_string = True
+                self._mark_start(i)
+            elif c in "{[":
+                self._mark_start(i)
+                if self._depth == 1 and self._value_start == i:
+                    self._value_is_array = c == "["
+                self._depth += 1
+            elif c in "}]":
+                self._end_scalar(i, events)
+                self._depth -= 1
+                if self._depth == 2 and self._value_is_array and self._item_start is not None:
+                    self._emit_item(i + 1, events) # Object or array element closed
+                elif self._depth == 1 and self._value_start is not None:
+                    self._emit_field(i + 1, events)
+            elif c == ":":
+                if self._depth == 1:
+                    self._expect_key = False
+            elif c == ",":
+                self._end_scalar(i, events)
+                if self._depth == 1:
+                    self._expect_key = True
+            else:
+                self._mark_start(i) # Numbers, true, false, null
+        return events
+
+    def _mark_start(self, i: int):
+        if self._depth == 1:
+            if self._expect_key:
+                self._key_start = i
+            elif self._value_start is None:
+                self._value_start = i
+        elif self._depth == 2 and self._value_is_array and self._item_start is None:
+            self._item_start = i
+
+    def _string_closed(self, i: int, events: List[Tuple[str, str, Any]]):
+        if self._depth == 1 and self._expect_key:
+            self._key = json.loads(self._text[self._key_start:i + 1])
+        elif self._depth == 1 and self._value_start is not None:
+            self._emit_field(i + 1, events)
+        elif self._depth == 2 and self._value_is_array and self._item_start is not None:
+            self._emit_item(i + 1, events)
+
+    def _end_scalar(self, i: int, events: List[Tuple[str, str, Any]]):
+        """A ',' or closing bracket ends a pending number/true/false/null."""
+        if self._depth == 1 and self._value_start is not None:
+            self._emit_field(i, events)
+        elif self._depth == 2 and self._value_is_array and self._item_start is not None:
+            self._emit_item(i, events)
+
+    def _emit_field(self, end: int, events: List[Tuple[str, str, Any]]):
+        events.append(("field", self._key, json.loads(self._text[self._value_start:end])))
+        self._value_start = None
+        self._value_is_array = False
+
+    def _emit_item(self, end: int, events: List[Tuple[str, str, Any]]):
+        events.append(("item", self._key, json.loads(self._text[self._item_start:end])))
+        self._item_start = None
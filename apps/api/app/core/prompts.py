@@ -2,7 +2,8 @@ from typing import List
 
 PROMPT_VERSIONS = {
     "recipe_generation": "1.0.0",
-    "nutrition_estimation": "1.0.0"
+    "nutrition_estimation": "1.1.0",
+    "ingredient_validation": "1.1.0"
 }
 
 GENERATE_RECIPE_PROMPT = """
@@ -17,11 +18,13 @@ Output Format: JSON strictly adhering to the schema.
 """
 
 NUTRITION_PROMPT = """
-Estimate the nutritional value for the following recipe text. Return conservative estimates.
+Estimate the nutritional value per serving for each of the following recipes. Return conservative estimates.
+Each recipe is prefixed with its number in square brackets.
 
-Recipe: {recipe_text}
+Recipes:
+{recipe_text}
 
-Output Format: JSON with keys: calories, protein, carbs, fats.
+Output Format: JSON {{"recipes": [{{"recipe": number, "calories": int, "protein": grams, "carbs": grams, "fats": grams}}]}}, one entry per recipe.
 """
 
 # JSON Schemas (Pydantic models will handle validation, this is for reference or strict mode prompts)
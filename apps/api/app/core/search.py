@@ -0,0 +1,137 @@
+import bisect
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+# Field weights for ranking. Title hits matter more than a mention in the description.
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Splits text into lowercase alphanumeric terms."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+def build_search_text(
+    title: Optional[str],
+    description: Optional[str],
+    ingredients: Optional[List[str]],
+    dietary_tags: Optional[List[str]],
+) -> str:
+    """Flattens the searchable recipe fields into one lowercase document."""
+    parts = [title or "", description or "", " ".join(ingredients or []), " ".join(dietary_tags or [])]
+    return " ".join(p for p in parts if p).lower()
+
+def weighted_fields(
+    title: Optional[str],
+    description: Optional[str],
+    ingredients: Optional[List[str]],
+    dietary_tags: Optional[List[str]],
+) -> List[Tuple[str, float]]:
+    """Returns (text, weight) pairs for indexing a recipe."""
+    return [
+        (title or "", TITLE_WEIGHT),
+        (description or "", BODY_WEIGHT),
+        (" ".join(ingredients or []), BODY_WEIGHT),
+        (" ".join(dietary_tags or []), BODY_WEIGHT),
+    ]
+
+def prefix_tsquery(query: str) -> Optional[str]:
+    """
+    Postgres to_tsquery text with the InvertedIndex semantics: every term must match,
+    each as a prefix ("chick" finds "chicken"). Terms come from tokenize(), so they
+    never carry tsquery operators. None when the query has no terms.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+class InvertedIndex:
+    """
+    In-process term -> document index used when the database has no full-text support (SQLite).
+    Every query term must match (AND); each term also matches as a prefix so partial words work.
+    """
+    def __init__(self):
+        self._postings: Dict[str, Dict[UUID, float]] = {}
+        self._doc_terms: Dict[UUID, Set[str]] = {}
+        self._vocabulary: List[str] = []  # Sorted, for prefix lookups
+        self._lock = threading.Lock()
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: UUID, fields: Iterable[Tuple[str, float]]):
+        weights: Dict[str, float] = {}
+        for text, weight in fields:
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + weight
+
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._vocabulary, term)
+                postings[doc_id] = weight
+            self._doc_terms[doc_id] = set(weights)
+
+    def remove(self, doc_id: UUID):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._vocabulary.clear()
+            self.built = False
+
+    def search(self, query: str) -> Dict[UUID, float]:
+        """Returns matching document ids mapped to their relevance score."""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        with self._lock:
+            scores: Optional[Dict[UUID, float]] = None
+            for term in terms:
+                matches: Dict[UUID, float] = {}
+                for vocab_term in self._expand_locked(term):
+                    # Exact hits rank above prefix hits
+                    boost = 1.0 if vocab_term == term else 0.5
+                    for doc_id, weight in self._postings[vocab_term].items():
+                        matches[doc_id] = max(matches.get(doc_id, 0.0), weight * boost)
+
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {d: scores[d] + s for d, s in matches.items() if d in scores}
+                if not scores:
+                    return {}
+            return scores or {}
+
+    def _expand_locked(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = start
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(prefix):
+            end += 1
+        return self._vocabulary[start:end]
+
+    def _remove_locked(self, doc_id: UUID):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                idx = bisect.bisect_left(self._vocabulary, term)
+                if idx < len(self._vocabulary) and self._vocabulary[idx] == term:
+                    self._vocabulary.pop(idx)
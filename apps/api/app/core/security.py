@@ -1,10 +1,32 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def build_pwd_context() -> CryptContext:
+    """
+    The configured scheme hashes new passwords; the other one still verifies, and
+    deprecated="auto" makes needs_update() true for it. bcrypt hashes below
+    BCRYPT_ROUNDS also need an update (the cost is only ever raised on login).
+    """
+    schemes = ["argon2", "bcrypt"] if settings.PASSWORD_HASH_SCHEME == "argon2" else ["bcrypt", "argon2"]
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        argon2__type="ID",
+        argon2__time_cost=settings.ARGON2_TIME_COST,
+        argon2__memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+        argon2__parallelism=settings.ARGON2_PARALLELISM,
+    )
+
+pwd_context = build_pwd_context()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,6 +34,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    try:
+        return pwd_context.needs_update(hashed_password)
+    except (ValueError, TypeError):
+        # Not a hash passlib recognizes (e.g. scrambled on account deletion)
+        return False
+
 def create_session_token(data: dict, expires_delta: Union[timedelta, None] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -22,12 +51,67 @@ def create_session_token(data: dict, expires_delta: Union[timedelta, None] = Non
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+class VerifiedTokenCache:
+    """
+    LRU of tokens that already passed jwt.decode, keyed by SHA-256 digest (raw tokens
+    are never kept). Stores (sub, exp); entries past exp are dropped on lookup, so
+    expiry is enforced exactly as jwt.decode would. Per-process by design: it saves
+    CPU, not a round trip.
+    """
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def set(self, token: str, user_id: str, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, token: str):
+        with self._lock:
+            self._entries.pop(self.digest(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = VerifiedTokenCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
+
 def verify_token(token: str) -> str | None:
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+        # Tokens without exp are valid forever; don't pin them in the cache
+        if isinstance(payload.get("exp"), (int, float)):
+            token_cache.set(token, user_id, payload["exp"])
         return user_id
     except JWTError:
         return None
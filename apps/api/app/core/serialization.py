@@ -0,0 +1,38 @@
+import json
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder
+    orjson = None
+
+def _default(value: Any) -> Any:
+    # Same output as orjson for the types our rows contain
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload: Any) -> bytes:
+    """Encodes plain dicts/lists (UUIDs and datetimes allowed) to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse for payloads that are already plain data.
+    Returning it from a route skips response_model validation and jsonable_encoder.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -2,3 +2,6 @@ from app.db.base_class import Base  # noqa
 from app.db.models.user import User  # noqa
 from app.db.models.upload import Upload  # noqa
 from app.db.models.recipe import Recipe  # noqa
+from app.db.models.recipe_dietary_tag import RecipeDietaryTag  # noqa
+from app.db.models.ai_spend import AISpend  # noqa
+from app.db.models.ai_job import AIJob  # noqa
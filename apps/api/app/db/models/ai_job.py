@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from sqlalchemy import DateTime, ForeignKey, Integer, JSON, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+class AIJob(Base):
+    """
+    A queued AI generation (see JobQueue). The row is what clients poll; the queue
+    itself lives in the submitting worker's memory. On success recipe_id points at
+    the saved recipe; on failure error/error_status hold what the synchronous
+    route would have answered.
+    """
+    __tablename__ = "ai_jobs"
+
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    user_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False) # JobQueue handler name, e.g. "recipe"
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default=JOB_QUEUED)
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False, default=dict)
+    recipe_id: Mapped[Optional[UUID]] = mapped_column(UUID(as_uuid=True), ForeignKey("recipes.id"), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    error_status: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
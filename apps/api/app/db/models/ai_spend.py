@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Float, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+GLOBAL_SCOPE = "global"
+
+class AISpend(Base):
+    """
+    Monthly AI spend ledger. One row per (UTC month, scope), where scope is
+    "global" for the whole deployment or a user id. Rows are only ever
+    incremented (INSERT ... ON CONFLICT DO UPDATE), so every worker can write
+    without read-modify-write races; a new month simply starts new rows.
+    """
+    __tablename__ = "ai_spend"
+
+    period: Mapped[str] = mapped_column(String(7), primary_key=True) # "YYYY-MM"
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    spend_usd: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    tokens_in: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    tokens_out: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    requests: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -2,11 +2,13 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import uuid4
 
-from sqlalchemy import String, ForeignKey, Integer, DateTime, JSON
+from sqlalchemy import String, Text, ForeignKey, Integer, DateTime, JSON, Index, event, func, text, delete, insert, inspect
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
+from app.core.search import build_search_text
+from app.db.models.recipe_dietary_tag import RecipeDietaryTag, normalize_tag
 
 class Recipe(Base):
     __tablename__ = "recipes"
@@ -27,9 +29,65 @@ class Recipe(Base):
     cook_time_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     servings: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     difficulty: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+    # Per-serving estimates filled in after creation by NutritionEstimator.
+    # nutrition_estimated_at is NULL until then (or after the ingredients change).
+    calories: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    protein_grams: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    carbs_grams: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    fat_grams: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    nutrition_estimated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Set while a worker is estimating the recipe, so other workers skip it
+    nutrition_claimed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    # Set on AI-generated recipes (see GenerationCache): hash of the prompt version and
+    # normalized restrictions, plus the normalized ingredients the recipe was generated from
+    generation_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    generation_ingredients: Mapped[Optional[List[str]]] = mapped_column(JSON, nullable=True)
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Row version for ETags; bumped on every UPDATE
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Denormalized, lowercased title/description/ingredients/tags for full-text search.
+    # Maintained by the before_insert/before_update hooks below.
+    search_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # Relationships
     user = relationship("User", back_populates="recipes")
     upload = relationship("Upload")
+
+# Postgres full-text vector over search_text. The 'english' config must stay a literal
+# (not a bound parameter) so queries using this expression match the GIN index below.
+recipe_search_vector = func.to_tsvector(text("'english'"), Recipe.__table__.c.search_text)
+
+Index("ix_recipes_search_vector", recipe_search_vector, postgresql_using="gin").ddl_if(dialect="postgresql")
+
+# Keyset pagination for the feed: ORDER BY created_at DESC, id DESC
+Index("ix_recipes_created_at_id", Recipe.__table__.c.created_at.desc(), Recipe.__table__.c.id.desc())
+
+@event.listens_for(Recipe, "before_insert")
+@event.listens_for(Recipe, "before_update")
+def _sync_search_text(mapper, connection, target: Recipe):
+    target.search_text = build_search_text(target.title, target.description, target.ingredients, target.dietary_tags)
+
+def _write_tag_rows(connection, target: Recipe, replace: bool = True):
+    tags = {normalize_tag(t) for t in (target.dietary_tags or []) if t and t.strip()}
+    if replace:
+        connection.execute(delete(RecipeDietaryTag).where(RecipeDietaryTag.recipe_id == target.id))
+    if tags:
+        connection.execute(insert(RecipeDietaryTag), [{"recipe_id": target.id, "tag": t} for t in tags])
+
+@event.listens_for(Recipe, "after_insert")
+def _insert_tag_rows(mapper, connection, target: Recipe):
+    _write_tag_rows(connection, target, replace=False)
+
+@event.listens_for(Recipe, "after_update")
+def _update_tag_rows(mapper, connection, target: Recipe):
+    if inspect(target).attrs.dietary_tags.history.has_changes():
+        _write_tag_rows(connection, target)
+
+@event.listens_for(Recipe, "before_delete")
+def _delete_tag_rows(mapper, connection, target: Recipe):
+    # SQLite doesn't enforce ON DELETE CASCADE unless foreign keys are switched on
+    connection.execute(delete(RecipeDietaryTag).where(RecipeDietaryTag.recipe_id == target.id))
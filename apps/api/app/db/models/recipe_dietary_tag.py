@@ -0,0 +1,26 @@
+from uuid import UUID
+
+from sqlalchemy import String, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+def normalize_tag(tag: str) -> str:
+    """Canonical form used for tag lookups ("Gluten-Free " -> "gluten-free")."""
+    return tag.strip().lower()
+
+class RecipeDietaryTag(Base):
+    """
+    One row per (recipe, normalized tag). Mirrors Recipe.dietary_tags so tag filters
+    are index lookups instead of scans over the JSON column.
+    """
+    __tablename__ = "recipe_dietary_tags"
+
+    recipe_id: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    tag: Mapped[str] = mapped_column(String, primary_key=True)
+
+    __table_args__ = (
+        # Filters go tag -> recipe ids; the PK covers recipe -> tags for rewrites
+        Index("ix_recipe_dietary_tags_tag_recipe", "tag", "recipe_id"),
+    )
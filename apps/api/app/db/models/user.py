@@ -1,4 +1,5 @@
-from sqlalchemy import Boolean, Column, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Boolean, Column, String, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
@@ -15,6 +16,7 @@ class User(Base):
     dietary_preferences = Column(String, nullable=True) # Will store JSON string for SQLite/Universal compatibility
     role = Column(String, default="user") # user, admin, maintainer
     is_active = Column(Boolean, default=True)
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow) # Row version for ETags
     
     profile_image_id = Column(UUID(as_uuid=True), ForeignKey("item_uploads.id"), nullable=True)
     profile_image = relationship("Upload", foreign_keys=[profile_image_id])
@@ -1,12 +1,17 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.middleware.logging import RequestIDMiddleware
-from app.middleware.security import SecurityHeadersMiddleware
+from app.middleware.security import RateLimitHeadersMiddleware, SecurityHeadersMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.db.base import Base
 from app.db.session import engine
+from app.services.password_hasher import PasswordHasherBusy, password_hasher
+from app.services.cost_guard import cost_guard
+from app.services.nutrition_service import nutrition_estimator
+from app.services.job_queue import job_queue
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,7 +31,7 @@ async def lifespan(app: FastAPI):
     # Create Demo User if not exists
     from sqlalchemy import select
     from app.db.models.user import User
-    from app.core.security import get_password_hash
+    from app.services.password_hasher import get_password_hash
     from app.db.session import AsyncSessionLocal
     
     async with AsyncSessionLocal() as db:
@@ -34,7 +39,7 @@ async def lifespan(app: FastAPI):
         if not result.scalars().first():
             demo_user = User(
                 email="demo@example.com",
-                hashed_password=get_password_hash("password"),
+                hashed_password=await get_password_hash("password"),
                 full_name="Demo User",
                 role="maintainer",
                 is_active=True
@@ -42,16 +47,38 @@ async def lifespan(app: FastAPI):
             db.add(demo_user)
             await db.commit()
             print("Successfully created seed demo user")
+
+    # Recipes left without nutrition by failed batches or a restart
+    try:
+        await nutrition_estimator.backfill()
+    except Exception as e:
+        print(f"Skipping nutrition backfill: {e}")
     
     yield
 
+    password_hasher.shutdown()
+    nutrition_estimator.shutdown()
+    job_queue.shutdown()
+    # Flush AI spend recorded since the last ledger sync
+    await cost_guard.sync(force=True)
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     lifespan=lifespan,
 )
 
-# Middleware order: Security Headers -> Request ID -> Logging -> CORS -> Trusted Host
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Login/register bursts beyond the hashing queue are shed instead of stalling the worker
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts in progress, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+# Middleware order: Rate-limit Headers -> Security Headers -> Request ID -> Logging -> CORS -> Trusted Host
+app.add_middleware(RateLimitHeadersMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RequestIDMiddleware)
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
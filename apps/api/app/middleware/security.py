@@ -1,9 +1,16 @@
-from fastapi import Request, Response, HTTPException
+from fastapi import Depends, Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
+import math
 import time
 import os
-from collections import defaultdict
-import threading
+from typing import Dict, Optional, Tuple
+import structlog
+from app.api.deps_auth import get_current_user_optional
+from app.core.config import settings
+from app.db.models.user import User
+from app.services.rate_limit_service import RateLimitBackendBase, RateLimitResult, rate_limit_backend, to_result
+
+logger = structlog.get_logger()
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -22,37 +29,102 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         
         return response
 
+class RateLimitHeadersMiddleware(BaseHTTPMiddleware):
+    """
+    Adds the X-RateLimit-* headers a RateLimitPolicy recorded on request.state to the
+    response. Headers set on the dependency's Response only reach routes that let FastAPI
+    build the response; this also covers routes returning their own (StreamingResponse).
+    """
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        headers = getattr(request.state, "rate_limit_headers", None)
+        if headers:
+            response.headers.update(headers)
+        return response
+
 class RateLimiter:
-    def __init__(self, requests_limit: int, window_seconds: int):
+    """
+    requests_limit per window_seconds per client, with bursts up to the full limit.
+    State lives in the configured rate-limit backend (GCRA, one timestamp per client),
+    so with a shared backend the limit holds across workers. Backend errors fail open.
+    """
+    def __init__(
+        self,
+        requests_limit: int,
+        window_seconds: int,
+        name: str = "default",
+        backend: Optional[RateLimitBackendBase] = None,
+    ):
         self.requests_limit = requests_limit
         self.window_seconds = window_seconds
-        self.clients = defaultdict(list)
-        self.lock = threading.Lock()
+        self.name = name
+        self.backend = backend if backend is not None else rate_limit_backend
 
-    def is_allowed(self, client_id: str) -> bool:
-        if os.environ.get("TESTING") == "True":
-            return True
+    async def hit(self, client_id: str) -> RateLimitResult:
+        interval = self.window_seconds / self.requests_limit
         now = time.time()
-        with self.lock:
-            # Clean old requests
-            self.clients[client_id] = [req_time for req_time in self.clients[client_id] if now - req_time < self.window_seconds]
-            
-            if len(self.clients[client_id]) >= self.requests_limit:
-                return False
-            
-            self.clients[client_id].append(now)
-            return True
-
-# Simple global instances for specific endpoints
-auth_limiter = RateLimiter(requests_limit=5, window_seconds=60) # 5 per minute
-ai_limiter = RateLimiter(requests_limit=10, window_seconds=3600) # 10 per hour (heavy)
-
-async def rate_limit_auth(request: Request):
-    client_ip = request.client.host
-    if not auth_limiter.is_allowed(client_ip):
-        raise HTTPException(status_code=429, detail="Too many login/register attempts. Try again later.")
-
-async def rate_limit_ai(request: Request):
-    client_ip = request.client.host
-    if not ai_limiter.is_allowed(client_ip):
-        raise HTTPException(status_code=429, detail="AI generation limit reached. Try again later.")
+        if os.environ.get("TESTING") == "True":
+            return RateLimitResult(True, self.requests_limit, self.requests_limit, 0.0, 0.0)
+        try:
+            allowed, tat = await self.backend.hit(f"ratelimit:{self.name}:{client_id}", now, interval, self.window_seconds)
+        except Exception as e:
+            logger.warning("rate_limit_backend_error", limiter=self.name, error=str(e))
+            return RateLimitResult(True, self.requests_limit, self.requests_limit, 0.0, 0.0)
+        return to_result(allowed, tat, now, interval, self.window_seconds, self.requests_limit)
+
+    async def is_allowed(self, client_id: str) -> bool:
+        return (await self.hit(client_id)).allowed
+
+RATE_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """'10/hour' -> (10, 3600)."""
+    count, _, unit = rate.partition("/")
+    return int(count), RATE_UNITS[unit.strip().rstrip("s")]
+
+class RateLimitPolicy:
+    """
+    Route dependency applying settings.RATE_LIMITS[name].
+
+    Authenticated callers are limited per user id at their role's tier; anonymous
+    callers per client IP at the "anonymous" tier. Records X-RateLimit-Limit/Remaining/Reset
+    for RateLimitHeadersMiddleware, and answers 429 with Retry-After once the limit is reached.
+    """
+    def __init__(self, name: str, detail: str):
+        self.name = name
+        self.detail = detail
+        self._limiters: Dict[Tuple[int, int], RateLimiter] = {}
+
+    def limiter_for(self, tier: str) -> RateLimiter:
+        limits = settings.RATE_LIMITS.get(self.name, {})
+        limit, window = parse_rate(limits.get(tier) or limits["default"])
+        # Tiers share the key space, so a role change keeps the caller's current usage
+        limiter = self._limiters.get((limit, window))
+        if limiter is None:
+            limiter = RateLimiter(requests_limit=limit, window_seconds=window, name=self.name)
+            self._limiters[(limit, window)] = limiter
+        return limiter
+
+    async def __call__(
+        self,
+        request: Request,
+        user: Optional[User] = Depends(get_current_user_optional),
+    ):
+        if user is not None:
+            tier, client_id = user.role or "user", f"user:{user.id}"
+        else:
+            tier, client_id = "anonymous", f"ip:{request.client.host}"
+
+        result = await self.limiter_for(tier).hit(client_id)
+        headers = {
+            "X-RateLimit-Limit": str(result.limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+            "X-RateLimit-Reset": str(math.ceil(result.reset_after)),
+        }
+        if not result.allowed:
+            headers["Retry-After"] = str(math.ceil(result.retry_after))
+            raise HTTPException(status_code=429, detail=self.detail, headers=headers)
+        request.state.rate_limit_headers = headers
+
+rate_limit_auth = RateLimitPolicy("auth", "Too many login/register attempts. Try again later.")
+rate_limit_ai = RateLimitPolicy("ai", "AI generation limit reached. Try again later.")
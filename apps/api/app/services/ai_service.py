@@ -3,31 +3,65 @@ import structlog
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from app.core.config import settings
 from app.core.circuit_breaker import steps_breaker, nutrition_breaker, CircuitBreakerOpen
-from app.services.cost_guard import cost_guard
-from typing import Dict, Any, Optional
+from app.core.dietary_rules import UNKNOWN, dietary_rules
+from app.core.ingredients import normalize_ingredient, normalize_restriction
+from app.core.json_stream import JSONObjectStream
+from app.core.prompts import NUTRITION_PROMPT
+from app.services.cost_guard import Reservation, cost_guard
+from app.services.generation_cache import fingerprint, generation_cache
+from app.services.verdict_cache import MISSING, ingredient_verdicts
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
+from uuid import UUID
+import asyncio
 import json
 
 import base64
 
 logger = structlog.get_logger()
 
+# Streamed recipe arrays sent element by element, and the event name for each element
+STREAM_ITEM_EVENTS = {"ingredients": "ingredient", "instructions": "step"}
+
+def _estimate_tokens(text: str) -> int:
+    """~4 characters per token; used when a streamed reply carries no usage."""
+    return max(1, len(text) // 4)
+
+def recipe_events(recipe: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """The stream_recipe events for an already complete recipe (e.g. a cache hit)."""
+    events: List[Tuple[str, Any]] = []
+    for key, value in recipe.items():
+        if key in STREAM_ITEM_EVENTS and isinstance(value, list):
+            events.extend((STREAM_ITEM_EVENTS[key], item) for item in value)
+        else:
+            events.append(("field", {"name": key, "value": value}))
+    return events
+
 class AIService:
     def __init__(self):
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = "gpt-4o" # Capable of Vision
 
-    async def generate_recipe(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+    async def generate_recipe(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes] = None, user_id: Optional[UUID] = None) -> Dict[str, Any]:
         """
         Generates a recipe using AI with circuit breaker protection.
+        Equivalent requests are served from the generation cache (no cost, no call).
         """
-        # 1. Cost Guard Check
-        if not cost_guard.can_proceed(estimated_cost=0.03): # Higher cost for vision
-            logger.warning("cost_guard_blocked", monthly_limit=cost_guard.monthly_limit_usd)
+        fp = fingerprint(ingredients, restrictions, image_bytes)
+        cached = await generation_cache.get(fp)
+        if cached is not None:
+            return cached
+
+        # 1. Cost Guard Check (global and per-user monthly budgets)
+        # The estimate is held until the call finishes, then replaced by the actual cost
+        await cost_guard.sync(user_id)
+        reservation = cost_guard.reserve(estimated_cost=0.03, user_id=user_id) # Higher cost for vision
+        if reservation is None:
+            logger.warning("cost_guard_blocked", monthly_limit=cost_guard.monthly_limit_usd, user_id=str(user_id))
             raise Exception("Monthly cost limit exceeded")
 
         # 2. Circuit Breaker Wrap
         try:
-            return await steps_breaker.call_async(self._generate_recipe_call, ingredients, restrictions, image_bytes)
+            recipe_data = await steps_breaker.call_async(self._generate_recipe_call, ingredients, restrictions, image_bytes, reservation)
         except CircuitBreakerOpen:
             logger.warning("circuit_breaker_open", feature="recipe_generation")
             # In a real app, fallback to cached or template recipe
@@ -35,25 +69,114 @@ class AIService:
         except Exception as e:
             logger.error("recipe_generation_failed", error=str(e))
             raise e
+        finally:
+            # No-op if the call committed its usage
+            cost_guard.release(reservation)
+
+        await generation_cache.set(fp, recipe_data)
+        return recipe_data
+
+    async def stream_recipe(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes] = None, user_id: Optional[UUID] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of generate_recipe, for time to first token.
+
+        Yields (event, data) as the model writes the JSON: ("field", {"name", "value"})
+        for each top-level member, ("ingredient", str) and ("step", str) for each list
+        element, and finally ("done", recipe_data) with the complete recipe. Same cost
+        guard, circuit breaker and generation cache as generate_recipe; errors are raised
+        with the same messages.
+        """
+        fp = fingerprint(ingredients, restrictions, image_bytes)
+        cached = await generation_cache.get(fp)
+        if cached is not None:
+            for event in recipe_events(cached):
+                yield event
+            yield "done", cached
+            return
+
+        await cost_guard.sync(user_id)
+        reservation = cost_guard.reserve(estimated_cost=0.03, user_id=user_id)
+        if reservation is None:
+            logger.warning("cost_guard_blocked", monthly_limit=cost_guard.monthly_limit_usd, user_id=str(user_id))
+            raise Exception("Monthly cost limit exceeded")
+
+        # The call runs as a task under the breaker and hands text over as it arrives;
+        # None marks the end. Closing this generator early cancels the call.
+        chunks: asyncio.Queue = asyncio.Queue()
+        call = asyncio.create_task(steps_breaker.call_async(
+            self._stream_recipe_call, ingredients, restrictions, image_bytes, reservation, chunks.put_nowait,
+        ))
+        call.add_done_callback(lambda _: chunks.put_nowait(None))
+        parser = JSONObjectStream()
+        try:
+            while (chunk := await chunks.get()) is not None:
+                for kind, key, value in parser.feed(chunk):
+                    if kind == "item" and key in STREAM_ITEM_EVENTS:
+                        yield STREAM_ITEM_EVENTS[key], value
+                    elif kind == "field" and key not in STREAM_ITEM_EVENTS:
+                        yield "field", {"name": key, "value": value}
+            try:
+                recipe_data = await call
+            except CircuitBreakerOpen:
+                logger.warning("circuit_breaker_open", feature="recipe_generation")
+                raise Exception("AI Service unavailable (Circuit Open)")
+            except Exception as e:
+                logger.error("recipe_generation_failed", error=str(e), streamed=True)
+                raise e
+        finally:
+            call.cancel()
+            cost_guard.release(reservation)
+
+        await generation_cache.set(fp, recipe_data)
+        yield "done", recipe_data
 
-    async def validate_ingredients(self, ingredients: list[str], restrictions: list[str]) -> list[Dict[str, str]]:
+    async def validate_ingredients(self, ingredients: list[str], restrictions: list[str], user_id: Optional[UUID] = None) -> list[Dict[str, str]]:
         """
         Validates a list of ingredients against dietary restrictions.
-        Returns a list of issues found.
+        Returns a list of issues found, one per violated (ingredient, restriction) pair.
+        Pairs the dietary rules settle are answered locally, then pairs judged before
+        come from ingredient_verdicts; only the remaining pairs are sent to the model.
         """
         if not ingredients or not restrictions:
             return []
 
+        verdicts = {}
+        for ingredient in ingredients:
+            for restriction in restrictions:
+                verdict = dietary_rules.check(ingredient, restriction)
+                if verdict is UNKNOWN:
+                    verdict = ingredient_verdicts.get(ingredient, restriction)
+                verdicts[(ingredient, restriction)] = verdict
+        unseen = [pair for pair, verdict in verdicts.items() if verdict is MISSING]
+        if unseen:
+            model_verdicts = await self._validate_ingredients_call(
+                list(dict.fromkeys(i for i, _ in unseen)), list(dict.fromkeys(r for _, r in unseen)), user_id,
+            )
+            # Local answers win over the model for pairs it was asked about only as a side effect
+            verdicts.update((pair, v) for pair, v in model_verdicts.items() if verdicts.get(pair, MISSING) is MISSING)
+
+        return [
+            {"ingredient": ingredient, "restriction": restriction, **verdict}
+            for (ingredient, restriction), verdict in verdicts.items()
+            if verdict is not None and verdict is not MISSING
+        ]
+
+    async def _validate_ingredients_call(self, ingredients: list[str], restrictions: list[str], user_id: Optional[UUID] = None) -> Dict[Tuple[str, Optional[str]], Optional[Dict[str, str]]]:
+        """Asks the model about every (ingredient, restriction) pair and memoizes the verdicts."""
         # 1. Cost Guard Check
-        if not cost_guard.can_proceed(estimated_cost=0.01):
-            logger.warning("cost_guard_blocked", monthly_limit=cost_guard.monthly_limit_usd)
+        await cost_guard.sync(user_id)
+        reservation = cost_guard.reserve(estimated_cost=0.01, user_id=user_id)
+        if reservation is None:
+            logger.warning("cost_guard_blocked", monthly_limit=cost_guard.monthly_limit_usd, user_id=str(user_id))
             raise Exception("Monthly cost limit exceeded")
 
+        # Bump PROMPT_VERSIONS["ingredient_validation"] when changing this prompt
         system_prompt = (
             "You are a world-class food safety and nutrition expert. "
             "Your task is to identify ingredients that violate the specified dietary restrictions. "
             "Be thorough: check for hidden ingredients (e.g., hidden sugars in sauces, gluten in soy sauce). "
-            "Output valid JSON: { \"issues\": [ { \"ingredient\": string, \"issue\": string, \"suggestion\": string } ] }. "
+            "Output valid JSON: { \"issues\": [ { \"ingredient\": string, \"restriction\": string, \"issue\": string, \"suggestion\": string } ] }. "
+            "Report one entry per violated restriction, using the ingredient and restriction exactly as given. "
             "The 'issue' field should briefly explain the violation. "
             "The 'suggestion' should be a safe, delicious alternative. "
             "If no issues, return an empty list for \"issues\"."
@@ -66,23 +189,89 @@ class AIService:
         prompt = f"Ingredients: {', '.join(ingredients)}\nRestrictions: {', '.join(restrictions)}"
         messages.append({"role": "user", "content": prompt})
 
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-4o-mini", # Use a cheaper model for validation
+                messages=messages,
+                response_format={ "type": "json_object" }
+            )
+            usage = response.usage
+            if usage:
+                cost_guard.commit(reservation, usage.prompt_tokens, usage.completion_tokens, "gpt-4o-mini")
+        finally:
+            cost_guard.release(reservation)
+
+        content = response.choices[0].message.content
+        data = json.loads(content)
+
+        # Everything not reported is compatible
+        verdicts = {(i, r): None for i in ingredients for r in restrictions}
+        by_ingredient = {normalize_ingredient(i): i for i in ingredients}
+        by_restriction = {normalize_restriction(r): r for r in restrictions}
+        unattributed = set()
+        for issue in data.get("issues", []):
+            ingredient = by_ingredient.get(normalize_ingredient(str(issue.get("ingredient", ""))))
+            if ingredient is None:
+                continue
+            # None: the model didn't say which restriction; reported but not memoized
+            restriction = by_restriction.get(normalize_restriction(str(issue.get("restriction", ""))))
+            if restriction is None:
+                unattributed.add(ingredient)
+            verdicts[(ingredient, restriction)] = {"issue": issue.get("issue", ""), "suggestion": issue.get("suggestion", "")}
+
+        for (ingredient, restriction), verdict in verdicts.items():
+            if restriction is not None and ingredient not in unattributed:
+                ingredient_verdicts.set(ingredient, restriction, verdict)
+        return verdicts
+
+    async def estimate_nutrition(self, recipes: List[Dict[str, Any]]) -> Dict[int, Dict[str, int]]:
+        """
+        Estimates per-serving nutrition for several recipes in one call.
+        recipes are dicts with title, ingredients and servings; the result maps
+        their list index to {calories, protein, carbs, fats}. Recipes the model
+        skipped or answered with unusable values are left out.
+        """
+        await cost_guard.sync()
+        reservation = cost_guard.reserve(estimated_cost=0.01)
+        if reservation is None:
+            logger.warning("cost_guard_blocked", monthly_limit=cost_guard.monthly_limit_usd, feature="nutrition")
+            raise Exception("Monthly cost limit exceeded")
+
+        try:
+            return await nutrition_breaker.call_async(self._estimate_nutrition_call, recipes, reservation)
+        except CircuitBreakerOpen:
+            logger.warning("circuit_breaker_open", feature="nutrition_estimation")
+            raise Exception("AI Service unavailable (Circuit Open)")
+        finally:
+            cost_guard.release(reservation)
+
+    async def _estimate_nutrition_call(self, recipes: List[Dict[str, Any]], reservation: Reservation) -> Dict[int, Dict[str, int]]:
+        recipe_text = "\n".join(
+            f"[{i}] {r['title']} (serves {r.get('servings') or 'unknown'}): {', '.join(r.get('ingredients') or [])}"
+            for i, r in enumerate(recipes)
+        )
         response = await self.client.chat.completions.create(
-            model="gpt-4o-mini", # Use a cheaper model for validation
-            messages=messages,
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": NUTRITION_PROMPT.format(recipe_text=recipe_text)}],
+            timeout=30.0,
             response_format={ "type": "json_object" }
         )
+        usage = response.usage
+        if usage:
+            cost_guard.commit(reservation, usage.prompt_tokens, usage.completion_tokens, "gpt-4o-mini")
 
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        return data.get("issues", [])
+        estimates = {}
+        for entry in json.loads(response.choices[0].message.content).get("recipes", []):
+            try:
+                index = int(entry["recipe"])
+                values = {key: round(float(entry[key])) for key in ("calories", "protein", "carbs", "fats")}
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(recipes) and all(v >= 0 for v in values.values()):
+                estimates[index] = values
+        return estimates
 
-    @retry(
-        stop=stop_after_attempt(2), 
-        wait=wait_exponential(multiplier=1, min=1, max=4),
-        retry=retry_if_exception_type(Exception)
-    )
-    async def _generate_recipe_call(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
-        
+    def _recipe_messages(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes] = None) -> List[Dict[str, Any]]:
         system_prompt = (
             "You are a helpful home cook assistant. Generate a practical, delicious recipe. "
             "Be accurate with times and servings:\n"
@@ -128,7 +317,15 @@ class AIService:
             })
 
         messages.append({"role": "user", "content": user_content})
-        
+        return messages
+
+    @retry(
+        stop=stop_after_attempt(2), 
+        wait=wait_exponential(multiplier=1, min=1, max=4),
+        retry=retry_if_exception_type(Exception)
+    )
+    async def _generate_recipe_call(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes] = None, reservation: Optional[Reservation] = None) -> Dict[str, Any]:
+        messages = self._recipe_messages(ingredients, restrictions, image_bytes)
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
@@ -140,7 +337,10 @@ class AIService:
             # Track Usage
             usage = response.usage
             if usage:
-                cost_guard.record_usage(usage.prompt_tokens, usage.completion_tokens, self.model)
+                if reservation is not None:
+                    cost_guard.commit(reservation, usage.prompt_tokens, usage.completion_tokens, self.model)
+                else:
+                    cost_guard.record_usage(usage.prompt_tokens, usage.completion_tokens, self.model)
                 
             content = response.choices[0].message.content
             print(f"DEBUG: AI RAW CONTENT: {content}")
@@ -151,4 +351,33 @@ class AIService:
             traceback.print_exc()
             raise e
 
+    async def _stream_recipe_call(self, ingredients: list[str], restrictions: list[str], image_bytes: Optional[bytes], reservation: Reservation, on_text: Callable[[str], None]) -> Dict[str, Any]:
+        """Streams the recipe completion, passing each text delta to on_text; returns the parsed recipe."""
+        messages = self._recipe_messages(ingredients, restrictions, image_bytes)
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            timeout=45.0,
+            response_format={ "type": "json_object" },
+            stream=True,
+        )
+        parts = []
+        usage = None
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                on_text(parts[-1])
+        content = "".join(parts)
+
+        if usage:
+            cost_guard.commit(reservation, usage.prompt_tokens, usage.completion_tokens, self.model)
+        else:
+            # Streamed replies don't report usage with this SDK; estimate from the text
+            # (plus a typical image cost) so the ledger still moves
+            prompt_text = messages[0]["content"] + " ".join(p["text"] for p in messages[1]["content"] if p["type"] == "text")
+            tokens_in = _estimate_tokens(prompt_text) + (765 if image_bytes else 0)
+            cost_guard.commit(reservation, tokens_in, _estimate_tokens(content), self.model)
+        return json.loads(content)
+
 ai_service = AIService()
@@ -0,0 +1,130 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.core.config import settings
+
+class CacheBackendBase(ABC):
+    """String key/value store with TTLs. Values are serialized by the caller."""
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Atomically increments a counter (created at 0) and returns the new value."""
+        pass
+
+class MemoryCacheBackend(CacheBackendBase):
+    """
+    Per-process LRU with TTL. The default backend, and the local stand-in for a shared one:
+    each worker has its own copy, so cross-worker staleness is bounded by the TTL.
+
+    Counters live outside the LRU: evicting a version counter early would bring back
+    the entries cached under its old values. A counter unused for longer than the
+    longest entry TTL has no live entries left, so it is dropped then, and a counter
+    created later starts above every dropped value so it never reissues a version.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._counters: "OrderedDict[str, Tuple[int, float]]" = OrderedDict() # key -> (value, last used)
+        self._counter_floor = 0
+        self._max_ttl = 0.0
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            now = time.monotonic()
+            self._expire_counters_locked(now)
+            if key in self._counters:
+                value, _ = self._counters[key]
+                self._counters[key] = (value, now)
+                self._counters.move_to_end(key)
+                return str(value)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if now >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        with self._lock:
+            self._max_ttl = max(self._max_ttl, ttl_seconds)
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            now = time.monotonic()
+            self._expire_counters_locked(now)
+            value = self._counters.get(key, (self._counter_floor, now))[0] + 1
+            self._counters[key] = (value, now)
+            self._counters.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+            self._counter_floor = 0
+            self._max_ttl = 0.0
+
+    def _expire_counters_locked(self, now: float):
+        # Least recently used first, so this stops at the first live counter. Nothing
+        # expires before an entry has been stored, since the longest TTL isn't known yet.
+        while self._counters and self._max_ttl:
+            key, (value, last_used) = next(iter(self._counters.items()))
+            if now - last_used <= self._max_ttl:
+                break
+            self._counter_floor = max(self._counter_floor, value)
+            self._counters.popitem(last=False)
+
+class RedisCacheBackend(CacheBackendBase):
+    """
+    Shared backend for multi-worker deployments. Requires the optional `redis` package,
+    or any client exposing the redis.asyncio get/set/delete/incr API.
+    """
+    def __init__(self, url: str = "", client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        await self.client.set(key, value, ex=ttl_seconds)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+def get_cache_backend() -> CacheBackendBase:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_URL)
+    return MemoryCacheBackend(max_entries=settings.CACHE_MAX_ENTRIES)
+
+cache_backend = get_cache_backend()
@@ -1,22 +1,219 @@
+import itertools
+import time
 from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.core.config import settings
+from app.db.models.ai_spend import GLOBAL_SCOPE, AISpend
+from app.db.session import AsyncSessionLocal
+
+logger = structlog.get_logger()
+
+def current_period(now: Optional[datetime] = None) -> str:
+    """Budget period key: the UTC calendar month."""
+    return (now or datetime.utcnow()).strftime("%Y-%m")
+
+def price_usd(model: str, tokens_in: int, tokens_out: int) -> float:
+    prices = settings.AI_MODEL_PRICES.get(model)
+    if prices is None:
+        # Unknown models are billed at the most expensive known rate so the budget errs safe
+        logger.warning("cost_guard_unknown_model", model=model)
+        prices = max(settings.AI_MODEL_PRICES.values(), key=sum)
+    price_in, price_out = prices
+    return (int(tokens_in) * price_in + int(tokens_out) * price_out) / 1_000_000
+
+class Reservation:
+    """Budget held for one in-flight AI call. Settled by CostGuard.commit() or release()."""
+    def __init__(self, id: int, estimated_cost: float, user_id: Optional[UUID] = None):
+        self.id = id
+        self.estimated_cost = estimated_cost
+        self.user_id = user_id
 
 class CostGuard:
-    def __init__(self, monthly_limit_usd: float = 5.0):
+    """
+    Monthly AI budget, global and per user, backed by the ai_spend ledger.
+
+    Usage is priced per model (settings.AI_MODEL_PRICES) and buffered in memory;
+    sync() flushes the buffer with atomic upserts and reloads the month's totals,
+    at most every sync_interval_seconds, so all workers converge on the same spend.
+    can_proceed() stays synchronous and reads this worker's view: the ledger total
+    at the last sync plus usage recorded since. A new UTC month starts from zero.
+
+    reserve() admits a call and holds its estimated cost until commit() replaces it
+    with the actual cost, or release() drops it. Held amounts count against the
+    budgets, so concurrent calls can't all pass the same check and overspend together.
+    """
+    def __init__(
+        self,
+        monthly_limit_usd: float = 5.0,
+        user_monthly_limit_usd: float = 0.0,
+        sync_interval_seconds: float = 5.0,
+        persistent: bool = False,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
         self.monthly_limit_usd = monthly_limit_usd
-        self.current_spend_usd = 0.0 # Persistence to Redis/DB needed for real prod
+        self.user_monthly_limit_usd = user_monthly_limit_usd # 0 disables per-user budgets
+        self.sync_interval_seconds = sync_interval_seconds
+        self.persistent = persistent
+        self.session_factory = session_factory
+        self.period = current_period()
+        self.current_spend_usd = 0.0
         self.tokens_used = 0
+        self._user_spend: Dict[str, float] = {}
+        # (period, scope) -> [spend_usd, tokens_in, tokens_out, requests] not yet in the ledger
+        self._pending: Dict[Tuple[str, str], List[float]] = {}
+        self._last_sync = float("-inf")
+        self._reservations: Dict[int, Reservation] = {}
+        self._reservation_ids = itertools.count(1)
+
+    def _roll_over(self):
+        period = current_period()
+        if period != self.period:
+            # Buffered usage keeps its old period and is still flushed there
+            self.period = period
+            self.current_spend_usd = 0.0
+            self.tokens_used = 0
+            self._user_spend = {scope: 0.0 for scope in self._user_spend}
+
+    def user_spend_usd(self, user_id: UUID) -> float:
+        return self._user_spend.get(str(user_id), 0.0)
 
-    def can_proceed(self, estimated_cost: float = 0.01) -> bool:
-        if self.current_spend_usd + estimated_cost > self.monthly_limit_usd:
+    def reserved_usd(self, user_id: Optional[UUID] = None) -> float:
+        """Cost held by in-flight calls, for one user or (None) in total."""
+        return sum(
+            r.estimated_cost for r in self._reservations.values()
+            if user_id is None or r.user_id == user_id
+        )
+
+    def can_proceed(self, estimated_cost: float = 0.01, user_id: Optional[UUID] = None) -> bool:
+        self._roll_over()
+        if self.current_spend_usd + self.reserved_usd() + estimated_cost > self.monthly_limit_usd:
             return False
+        if user_id is not None and self.user_monthly_limit_usd > 0:
+            if self.user_spend_usd(user_id) + self.reserved_usd(user_id) + estimated_cost > self.user_monthly_limit_usd:
+                return False
         return True
 
-    def record_usage(self, tokens_in: int, tokens_out: int, model: str):
-        # Approximations for gpt-3.5-turbo
-        cost_in = (tokens_in / 1000) * 0.0005
-        cost_out = (tokens_out / 1000) * 0.0015
-        self.current_spend_usd += (cost_in + cost_out)
-        self.tokens_used += (tokens_in + tokens_out)
+    def reserve(self, estimated_cost: float, user_id: Optional[UUID] = None) -> Optional[Reservation]:
+        """
+        Checks the budgets and holds estimated_cost in one step. Returns None if the call
+        doesn't fit. There's no await in between, so it's atomic within a worker.
+        """
+        if not self.can_proceed(estimated_cost, user_id=user_id):
+            return None
+        reservation = Reservation(next(self._reservation_ids), estimated_cost, user_id)
+        self._reservations[reservation.id] = reservation
+        return reservation
+
+    def commit(self, reservation: Reservation, tokens_in: int, tokens_out: int, model: str) -> float:
+        """
+        Replaces the hold with the actual cost from the response's usage. Committing an
+        already settled reservation (e.g. a retried call) only records the new usage.
+        """
+        self.release(reservation)
+        return self.record_usage(tokens_in, tokens_out, model, user_id=reservation.user_id)
+
+    def release(self, reservation: Reservation):
+        """Drops the hold without charging anything. Safe to call more than once."""
+        self._reservations.pop(reservation.id, None)
+
+    def record_usage(self, tokens_in: int, tokens_out: int, model: str, user_id: Optional[UUID] = None) -> float:
+        """Prices a completed call, counts it against the budgets and buffers it for the ledger."""
+        self._roll_over()
+        cost = price_usd(model, tokens_in, tokens_out)
+        self.current_spend_usd += cost
+        self.tokens_used += int(tokens_in) + int(tokens_out)
+
+        scopes = [GLOBAL_SCOPE]
+        if user_id is not None:
+            scopes.append(str(user_id))
+            self._user_spend[str(user_id)] = self.user_spend_usd(user_id) + cost
+        for scope in scopes:
+            entry = self._pending.setdefault((self.period, scope), [0.0, 0, 0, 0])
+            entry[0] += cost
+            entry[1] += int(tokens_in)
+            entry[2] += int(tokens_out)
+            entry[3] += 1
+        return cost
+
+    async def sync(self, user_id: Optional[UUID] = None, force: bool = False):
+        """
+        Flushes buffered usage and reloads the month's totals from the ledger.
+        A user seen for the first time forces a sync so their budget starts from the ledger.
+        """
+        if not self.persistent:
+            return
+        if user_id is not None and str(user_id) not in self._user_spend:
+            self._user_spend[str(user_id)] = 0.0
+            force = True
+        if not force and time.monotonic() - self._last_sync < self.sync_interval_seconds:
+            return
+        self._last_sync = time.monotonic()
+
+        pending, self._pending = self._pending, {}
+        try:
+            async with self.session_factory() as db:
+                dialect = db.get_bind().dialect.name
+                for (period, scope), values in pending.items():
+                    await db.execute(self._upsert(dialect, period, scope, values))
+                await db.commit()
+
+                self._roll_over()
+                scopes = [GLOBAL_SCOPE, *self._user_spend]
+                result = await db.execute(
+                    select(AISpend.scope, AISpend.spend_usd).where(AISpend.period == self.period, AISpend.scope.in_(scopes))
+                )
+                totals = dict(result.all())
+        except Exception as e:
+            # Keep the usage for the next attempt; budgets keep using the local view
+            for key, values in pending.items():
+                entry = self._pending.setdefault(key, [0.0, 0, 0, 0])
+                for i, value in enumerate(values):
+                    entry[i] += value
+            logger.warning("cost_ledger_sync_failed", error=str(e))
+            return
+
+        # Usage recorded while the sync was awaiting isn't in the totals yet
+        unflushed = {scope: values[0] for (period, scope), values in self._pending.items() if period == self.period}
+        self.current_spend_usd = totals.get(GLOBAL_SCOPE, 0.0) + unflushed.get(GLOBAL_SCOPE, 0.0)
+        for scope in self._user_spend:
+            self._user_spend[scope] = totals.get(scope, 0.0) + unflushed.get(scope, 0.0)
+
+    @staticmethod
+    def _upsert(dialect: str, period: str, scope: str, values: List[float]):
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        spend_usd, tokens_in, tokens_out, requests = values
+        stmt = insert(AISpend).values(
+            period=period,
+            scope=scope,
+            spend_usd=spend_usd,
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+            requests=requests,
+            updated_at=datetime.utcnow(),
+        )
+        # Increment in the database, so concurrent workers never overwrite each other
+        return stmt.on_conflict_do_update(
+            index_elements=[AISpend.period, AISpend.scope],
+            set_={
+                "spend_usd": AISpend.spend_usd + stmt.excluded.spend_usd,
+                "tokens_in": AISpend.tokens_in + stmt.excluded.tokens_in,
+                "tokens_out": AISpend.tokens_out + stmt.excluded.tokens_out,
+                "requests": AISpend.requests + stmt.excluded.requests,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
 
-cost_guard = CostGuard()
+cost_guard = CostGuard(
+    monthly_limit_usd=settings.AI_MONTHLY_LIMIT_USD,
+    user_monthly_limit_usd=settings.AI_USER_MONTHLY_LIMIT_USD,
+    sync_interval_seconds=settings.COST_LEDGER_SYNC_SECONDS,
+    persistent=settings.COST_LEDGER_ENABLED,
+)
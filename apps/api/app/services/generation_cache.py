@@ -0,0 +1,141 @@
+import hashlib
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.ingredients import normalize_ingredients, normalize_restrictions
+from app.core.prompts import PROMPT_VERSIONS
+from app.core.serialization import dumps, loads
+from app.db.models.recipe import Recipe
+from app.db.session import AsyncSessionLocal
+from app.services.cache_service import CacheBackendBase, cache_backend
+
+logger = structlog.get_logger()
+
+# Fields of a generated recipe (AIService._generate_recipe_call output)
+RECIPE_FIELDS = (
+    "title", "description", "ingredients", "instructions", "dietary_tags",
+    "prep_time_minutes", "cook_time_minutes", "servings", "difficulty",
+)
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+class GenerationFingerprint(NamedTuple):
+    ingredients: Tuple[str, ...] # Normalized and sorted
+    restrictions: Tuple[str, ...]
+    image_digest: Optional[str]
+
+    @property
+    def restrictions_key(self) -> str:
+        """Prompt version + restrictions; stored as Recipe.generation_key to find near-duplicates."""
+        return _digest(PROMPT_VERSIONS["recipe_generation"], ",".join(self.restrictions))
+
+    @property
+    def key(self) -> str:
+        return _digest(self.restrictions_key, ",".join(self.ingredients), self.image_digest or "")
+
+def fingerprint(ingredients: List[str], restrictions: List[str], image_bytes: Optional[bytes] = None) -> GenerationFingerprint:
+    return GenerationFingerprint(
+        tuple(normalize_ingredients(ingredients)),
+        tuple(normalize_restrictions(restrictions)),
+        hashlib.sha256(image_bytes).hexdigest() if image_bytes else None,
+    )
+
+class GenerationCache:
+    """
+    Reuses AI-generated recipes across users.
+
+    Requests are fingerprinted by their normalized ingredients and restrictions
+    (case, plurals, synonyms and order don't matter), the recipe_generation prompt
+    version and, for photo requests, the image hash.
+
+    - Exact hits come from the cache backend (ttl_seconds).
+    - On a miss, text-only requests look for an existing generated Recipe with the
+      same restrictions and prompt version whose ingredients are all among the
+      requested ones and cover at least `similarity` of them, so a served recipe
+      never needs something the user didn't list.
+      Editing a recipe clears its generation columns (see update_recipe), so only
+      unedited model output is reused.
+    Backend and database errors are logged and treated as misses.
+    """
+    def __init__(
+        self,
+        backend: CacheBackendBase,
+        ttl_seconds: int = 86400,
+        similarity: float = 0.8,
+        max_candidates: int = 50,
+        enabled: bool = True,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.max_candidates = max_candidates
+        self.enabled = enabled
+        self.session_factory = session_factory
+
+    async def get(self, fp: GenerationFingerprint) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.backend.get(f"ai:generation:{fp.key}")
+        except Exception as e:
+            logger.warning("generation_cache_error", op="get", error=str(e))
+            raw = None
+        if raw is not None:
+            logger.info("generation_cache_hit", source="cache")
+            return loads(raw)
+
+        if fp.image_digest is not None or not fp.ingredients:
+            return None
+        try:
+            recipe = await self._find_similar(fp)
+        except Exception as e:
+            logger.warning("generation_cache_error", op="similar", error=str(e))
+            return None
+        if recipe is not None:
+            logger.info("generation_cache_hit", source="recipes")
+            await self.set(fp, recipe)
+        return recipe
+
+    async def set(self, fp: GenerationFingerprint, recipe: dict):
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(f"ai:generation:{fp.key}", dumps(recipe).decode("utf-8"), self.ttl_seconds)
+        except Exception as e:
+            logger.warning("generation_cache_error", op="set", error=str(e))
+
+    async def _find_similar(self, fp: GenerationFingerprint) -> Optional[dict]:
+        requested = set(fp.ingredients)
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Recipe.generation_ingredients, *(getattr(Recipe, f) for f in RECIPE_FIELDS))
+                .where(Recipe.generation_key == fp.restrictions_key)
+                .order_by(Recipe.created_at.desc())
+                .limit(self.max_candidates)
+            )
+            rows = result.all()
+
+        best, best_score = None, 0.0
+        for row in rows:
+            candidate = set(row.generation_ingredients or [])
+            if not candidate or not candidate <= requested:
+                continue
+            score = len(candidate) / len(requested)
+            if score >= self.similarity and score > best_score:
+                best, best_score = row, score
+        if best is None:
+            return None
+        return {f: getattr(best, f) for f in RECIPE_FIELDS}
+
+generation_cache = GenerationCache(
+    cache_backend,
+    ttl_seconds=settings.GENERATION_CACHE_TTL_SECONDS,
+    similarity=settings.GENERATION_CACHE_SIMILARITY,
+    enabled=settings.GENERATION_CACHE_ENABLED,
+)
@@ -0,0 +1,211 @@
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+from uuid import UUID
+
+import structlog
+from sqlalchemy import and_, func, not_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.ai_job import ACTIVE_JOB_STATUSES, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, AIJob
+from app.db.models.user import User
+from app.db.session import AsyncSessionLocal
+
+logger = structlog.get_logger()
+
+class JobQueueFull(Exception):
+    """The user already has max_pending_per_user jobs queued or running."""
+
+class JobFailed(Exception):
+    """Raised by handlers to fail a job with the HTTP status and detail the client should see."""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+# Runs one job (loaded, detached) and returns the id of the recipe it produced. Handlers
+# open short sessions from the factory as needed and never hold one across a model call.
+JobHandler = Callable[[AIJob, Callable[[], AsyncSession]], Awaitable[Optional[UUID]]]
+
+class JobQueue:
+    """
+    In-process queue for slow AI calls, so a request doesn't hold a worker slot and
+    a pooled connection for the whole generation.
+
+    submit() stores an AIJob row and returns its id at once. Up to `workers` tasks run
+    jobs through the handler registered for their kind. Higher priority levels always
+    go first; within a level users take turns (round-robin), so one user's burst
+    can't starve the others. Each user may have max_pending_per_user jobs queued or
+    running across all processes; submit() counts them from the table, holding a
+    lock on the user's row so concurrent submits can't both take the last slot.
+    Status and results are written to the row, which clients poll; wait()
+    lets a poll return as soon as a job in this process finishes.
+
+    A worker claims a job by moving its row from queued to running, and only a
+    running row can be finished, so a job expired in the meantime never runs or
+    is overwritten. Jobs waiting in memory are lost on restart; expire() fails rows
+    still queued timeout_seconds after submission, or running that long after
+    being claimed.
+    """
+    def __init__(
+        self,
+        workers: int = 4,
+        max_pending_per_user: int = 3,
+        timeout_seconds: float = 300,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.workers = workers
+        self.max_pending_per_user = max_pending_per_user
+        self.timeout_seconds = timeout_seconds
+        self.session_factory = session_factory
+        self._handlers: Dict[str, JobHandler] = {}
+        self._levels: Dict[int, "OrderedDict[UUID, Deque[UUID]]"] = {} # priority -> user -> job ids, in turn order
+        self._done: Dict[UUID, asyncio.Event] = {} # job id -> set when it finishes
+        self._tasks: Set[asyncio.Task] = set()
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    async def submit(self, db: AsyncSession, user_id: UUID, kind: str, payload: Dict[str, Any], priority: int = 0) -> UUID:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        await db.execute(select(User.id).where(User.id == user_id).with_for_update())
+        result = await db.execute(
+            select(func.count()).select_from(AIJob)
+            .where(AIJob.user_id == user_id, AIJob.status.in_(ACTIVE_JOB_STATUSES), not_(self._stale()))
+        )
+        if result.scalar() >= self.max_pending_per_user:
+            await db.rollback() # Releases the lock
+            raise JobQueueFull()
+
+        job = AIJob(user_id=user_id, kind=kind, payload=payload, priority=priority, status=JOB_QUEUED)
+        db.add(job)
+        await db.commit()
+
+        self._done[job.id] = asyncio.Event()
+        self._levels.setdefault(priority, OrderedDict()).setdefault(user_id, deque()).append(job.id)
+        if len(self._tasks) < self.workers:
+            task = asyncio.create_task(self._work())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return job.id
+
+    def _next(self) -> Optional[UUID]:
+        """Job to run next: highest priority, then the user whose turn it is."""
+        if not self._levels:
+            return None
+        priority = max(self._levels)
+        users = self._levels[priority]
+        user_id, jobs = users.popitem(last=False)
+        job_id = jobs.popleft()
+        if jobs:
+            users[user_id] = jobs # Back of the line
+        if not users:
+            del self._levels[priority]
+        return job_id
+
+    async def _work(self):
+        while (job_id := self._next()) is not None:
+            try:
+                await self._execute(job_id)
+            finally:
+                self._finished(job_id)
+
+    def _finished(self, job_id: UUID):
+        done = self._done.pop(job_id, None)
+        if done is not None:
+            done.set()
+
+    async def _execute(self, job_id: UUID):
+        if not await self._update(job_id, JOB_QUEUED, status=JOB_RUNNING):
+            return # Expired while it waited
+        try:
+            async with self.session_factory() as db:
+                job = await db.get(AIJob, job_id)
+            recipe_id = await self._handlers[job.kind](job, self.session_factory)
+        except JobFailed as e:
+            await self._update(job_id, JOB_RUNNING, status=JOB_FAILED, error=e.detail, error_status=e.status_code, finished_at=datetime.utcnow())
+        except Exception as e:
+            logger.error("ai_job_failed", job_id=str(job_id), error=str(e))
+            await self._update(job_id, JOB_RUNNING, status=JOB_FAILED, error=str(e), error_status=500, finished_at=datetime.utcnow())
+        else:
+            await self._update(job_id, JOB_RUNNING, status=JOB_SUCCEEDED, recipe_id=recipe_id, finished_at=datetime.utcnow())
+
+    async def _update(self, job_id: UUID, expected_status: str, **values) -> bool:
+        """Updates the row only if it's still in expected_status; returns whether it was."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(AIJob)
+                .where(AIJob.id == job_id, AIJob.status == expected_status)
+                .values(updated_at=datetime.utcnow(), **values)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def expire(self, db: AsyncSession, job: AIJob) -> bool:
+        """
+        Fails the job with a 504 if it's been queued or running longer than
+        timeout_seconds (its worker went away, or the backlog is too long);
+        returns whether it did. The job is also dropped from this process's queue.
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(AIJob)
+            .where(AIJob.id == job.id, self._stale())
+            .values(
+                status=JOB_FAILED, error_status=504, error="Recipe generation was interrupted, please retry",
+                finished_at=now, updated_at=now,
+            )
+        )
+        await db.commit()
+        if result.rowcount != 1:
+            return False
+        self._discard(job.user_id, job.id)
+        await db.refresh(job)
+        return True
+
+    def _stale(self):
+        """Jobs queued, or running, for longer than timeout_seconds."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.timeout_seconds)
+        return or_(
+            and_(AIJob.status == JOB_QUEUED, AIJob.created_at < cutoff),
+            and_(AIJob.status == JOB_RUNNING, AIJob.updated_at < cutoff),
+        )
+
+    def _discard(self, user_id: UUID, job_id: UUID):
+        """Removes a job that hasn't started from the in-memory queue."""
+        for priority, users in list(self._levels.items()):
+            jobs = users.get(user_id)
+            if jobs is None or job_id not in jobs:
+                continue
+            jobs.remove(job_id)
+            if not jobs:
+                del users[user_id]
+            if not users:
+                del self._levels[priority]
+            self._finished(job_id)
+            return
+
+    async def wait(self, job_id: UUID, timeout: float):
+        """Returns when the job finishes in this process, or after timeout (jobs running elsewhere)."""
+        done = self._done.get(job_id)
+        if done is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+
+job_queue = JobQueue(
+    workers=settings.AI_JOB_WORKERS,
+    max_pending_per_user=settings.AI_JOB_MAX_PENDING_PER_USER,
+    timeout_seconds=settings.AI_JOB_TIMEOUT_SECONDS,
+)
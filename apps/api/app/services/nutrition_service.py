@@ -0,0 +1,198 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import structlog
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models.recipe import Recipe
+from app.db.session import AsyncSessionLocal
+from app.services.ai_service import ai_service
+from app.services.recipe_cache import recipe_cache
+
+logger = structlog.get_logger()
+
+class NutritionEstimator:
+    """
+    Fills in recipe calories/macros in the background, off the create path.
+
+    enqueue() queues a recipe id and returns immediately. A single worker task
+    collects ids for up to batch_wait_seconds (or until batch_size are queued),
+    estimates the whole batch in one model call (AIService.estimate_nutrition,
+    behind nutrition_breaker) and writes the results with one UPDATE per recipe.
+    Failed batches are retried after retry_seconds, up to max_attempts per recipe;
+    recipes a batch skipped (edited meanwhile, missing from the answer) are queued again
+    under the same limit. Recipes left without an estimate (failures, restarts) are
+    picked up by backfill().
+
+    Every process runs backfill() at startup, so each recipe is claimed with a
+    conditional UPDATE (nutrition_claimed_at) before it is estimated: a recipe another
+    worker holds is skipped. A claim older than claim_seconds (crashed worker) lapses.
+    """
+    def __init__(
+        self,
+        batch_size: int = 8,
+        batch_wait_seconds: float = 2.0,
+        retry_seconds: float = 30.0,
+        max_attempts: int = 3,
+        claim_seconds: float = 600.0,
+        enabled: bool = True,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self.claim_seconds = claim_seconds
+        self.enabled = enabled
+        self.session_factory = session_factory
+        self._queue: "OrderedDict[UUID, int]" = OrderedDict() # recipe id -> attempts so far
+        self._worker: Optional[asyncio.Task] = None
+
+    def enqueue(self, recipe_id: UUID):
+        if not self.enabled:
+            return
+        self._queue.setdefault(recipe_id, 0)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._queue:
+            if len(self._queue) < self.batch_size:
+                # Give recipes created close together a chance to share a call
+                await asyncio.sleep(self.batch_wait_seconds)
+            batch = {}
+            while self._queue and len(batch) < self.batch_size:
+                recipe_id, attempts = self._queue.popitem(last=False)
+                batch[recipe_id] = attempts
+            try:
+                _, skipped = await self._estimate(list(batch))
+            except Exception as e:
+                logger.warning("nutrition_estimation_failed", recipes=len(batch), error=str(e))
+                self._retry(batch, batch)
+                await asyncio.sleep(self.retry_seconds)
+            else:
+                self._retry(skipped, batch)
+
+    def _retry(self, recipe_ids: Iterable[UUID], attempts: Dict[UUID, int]):
+        for recipe_id in recipe_ids:
+            if attempts[recipe_id] + 1 < self.max_attempts:
+                self._queue.setdefault(recipe_id, attempts[recipe_id] + 1)
+
+    async def estimate_batch(self, recipe_ids: List[UUID]) -> int:
+        """Estimates and stores nutrition for the recipes that still lack it. Returns how many were updated."""
+        stored, _ = await self._estimate(recipe_ids)
+        return stored
+
+    async def _estimate(self, recipe_ids: List[UUID]) -> Tuple[int, List[UUID]]:
+        """Returns how many estimates were stored and the claimed recipes that got none."""
+        async with self.session_factory() as db:
+            claimed = await self._claim(db, recipe_ids)
+            if not claimed:
+                return 0, []
+            result = await db.execute(
+                select(Recipe.id, Recipe.title, Recipe.ingredients, Recipe.servings, Recipe.updated_at)
+                .where(Recipe.id.in_(claimed))
+            )
+            rows = result.all()
+
+        # No connection is held during the model call
+        try:
+            estimates = await ai_service.estimate_nutrition([
+                {"title": row.title, "ingredients": row.ingredients, "servings": row.servings} for row in rows
+            ])
+        except Exception:
+            await self._release(claimed)
+            raise
+
+        stored, skipped = [], []
+        async with self.session_factory() as db:
+            now = datetime.utcnow()
+            for index, row in enumerate(rows):
+                values = estimates.get(index)
+                if values is None:
+                    skipped.append(row.id)
+                    continue
+                # Only store the estimate if the recipe wasn't edited meanwhile (row version)
+                result = await db.execute(
+                    update(Recipe)
+                    .where(Recipe.id == row.id, Recipe.updated_at.is_not_distinct_from(row.updated_at))
+                    .values(
+                        calories=values["calories"],
+                        protein_grams=values["protein"],
+                        carbs_grams=values["carbs"],
+                        fat_grams=values["fats"],
+                        nutrition_estimated_at=now,
+                        nutrition_claimed_at=None,
+                    )
+                )
+                (stored if result.rowcount else skipped).append(row.id)
+            await db.commit()
+        await self._release(skipped)
+
+        for recipe_id in stored:
+            await recipe_cache.invalidate_recipe(recipe_id)
+        logger.info("nutrition_estimated", requested=len(rows), estimated=len(stored), skipped=len(skipped))
+        return len(stored), skipped
+
+    async def _claim(self, db: AsyncSession, recipe_ids: List[UUID]) -> List[UUID]:
+        """Marks the recipes that still need an estimate and aren't held by another worker."""
+        now = datetime.utcnow()
+        claimed = []
+        for recipe_id in recipe_ids:
+            # Keeps updated_at: a claim is not an edit (no new ETag, no lost estimate)
+            result = await db.execute(
+                update(Recipe)
+                .where(Recipe.id == recipe_id, Recipe.nutrition_estimated_at.is_(None), self._unclaimed(now))
+                .values(nutrition_claimed_at=now, updated_at=Recipe.updated_at)
+            )
+            if result.rowcount:
+                claimed.append(recipe_id)
+        await db.commit()
+        return claimed
+
+    def _unclaimed(self, now: datetime):
+        return or_(
+            Recipe.nutrition_claimed_at.is_(None),
+            Recipe.nutrition_claimed_at < now - timedelta(seconds=self.claim_seconds),
+        )
+
+    async def _release(self, recipe_ids: List[UUID]):
+        if not recipe_ids:
+            return
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Recipe)
+                .where(Recipe.id.in_(recipe_ids))
+                .values(nutrition_claimed_at=None, updated_at=Recipe.updated_at)
+            )
+            await db.commit()
+
+    async def backfill(self, limit: int = 100):
+        """Queues the newest recipes that have no estimate yet and no worker is estimating."""
+        if not self.enabled:
+            return
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Recipe.id)
+                .where(Recipe.nutrition_estimated_at.is_(None), self._unclaimed(datetime.utcnow()))
+                .order_by(Recipe.created_at.desc())
+                .limit(limit)
+            )
+            for recipe_id in result.scalars().all():
+                self.enqueue(recipe_id)
+
+    def shutdown(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+nutrition_estimator = NutritionEstimator(
+    batch_size=settings.NUTRITION_BATCH_SIZE,
+    batch_wait_seconds=settings.NUTRITION_BATCH_WAIT_SECONDS,
+    enabled=settings.NUTRITION_ESTIMATION_ENABLED,
+)
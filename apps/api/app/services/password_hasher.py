@@ -0,0 +1,147 @@
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Set
+
+import structlog
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import security
+from app.core.config import settings
+from app.db.models.user import User
+from app.db.session import AsyncSessionLocal
+
+logger = structlog.get_logger()
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+class PasswordHasher:
+    """
+    Runs bcrypt (app.core.security) off the event loop in a bounded worker pool.
+
+    - executor="process" (default) uses spawned worker processes, so hashing never
+      competes with request handling for the GIL; "thread" is a lighter option.
+    - At most max_workers calls run at once; up to max_queue more wait in the pool.
+      Beyond that, calls fail fast with PasswordHasherBusy instead of piling up.
+    - stats() exposes counters and average latency for /health.
+    - schedule_rehash() upgrades a stored hash in the background after a login
+      (see security.build_pwd_context for when a hash needs it).
+    """
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue: int = 32,
+        executor: str = "process",
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor_kind = executor
+        self.session_factory = session_factory
+        self._executor: Optional[Executor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self._busy_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password")
+            else:
+                # spawn, not fork: the parent has an event loop and driver threads running
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            logger.warning("password_hasher_busy", pending=self.pending, rejected=self.rejected)
+            raise PasswordHasherBusy()
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+            self.completed += 1
+            return result
+        except Exception as e:
+            self.failed += 1
+            if isinstance(e, BrokenProcessPool):
+                # A worker died; start a fresh pool for the next call
+                self._executor = None
+            raise
+        finally:
+            self.pending -= 1
+            self._busy_seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(security.get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(security.verify_password, plain_password, hashed_password)
+
+    def schedule_rehash(self, user_id: uuid.UUID, password: str, old_hash: str):
+        """Rehashes with the current policy off the request path if old_hash is outdated."""
+        if not security.password_needs_rehash(old_hash):
+            return
+        task = asyncio.create_task(self._rehash(user_id, password, old_hash))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _rehash(self, user_id: uuid.UUID, password: str, old_hash: str):
+        try:
+            new_hash = await self.hash(password)
+            async with self.session_factory() as db:
+                # Only replace the hash that was verified, never a concurrent password change.
+                # The hash isn't part of any representation, so keep the row version (ETags).
+                await db.execute(
+                    update(User)
+                    .where(User.id == user_id, User.hashed_password == old_hash)
+                    .values(hashed_password=new_hash, updated_at=User.updated_at)
+                )
+                await db.commit()
+            logger.info("password_rehashed", user_id=str(user_id))
+        except Exception as e:
+            # Busy pool or DB error: the next login tries again
+            logger.warning("password_rehash_failed", user_id=str(user_id), error=str(e))
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "avg_ms": round(self._busy_seconds * 1000 / finished, 1) if finished else None,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
+
+# Async counterparts of the app.core.security helpers, for request handlers
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
@@ -0,0 +1,156 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float # Seconds until the next request would be allowed (0 when allowed)
+    reset_after: float # Seconds until the full burst is available again
+
+def gcra(tat: Optional[float], now: float, interval: float, window: float) -> Tuple[bool, float]:
+    """
+    Generic cell rate algorithm. The whole state is one timestamp, the theoretical
+    arrival time (TAT) of the next request. A request is allowed if it doesn't push
+    TAT more than `window` into the future; allowing it advances TAT by `interval`
+    (window / limit). Returns (allowed, tat after the call).
+    """
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    if new_tat - now > window:
+        return False, tat
+    return True, new_tat
+
+def to_result(allowed: bool, tat: float, now: float, interval: float, window: float, limit: int) -> RateLimitResult:
+    ahead = max(tat - now, 0.0)
+    if allowed:
+        # Small epsilon so float error doesn't floor 3.0 down to 2
+        remaining = int((window - ahead) / interval + 1e-9)
+        return RateLimitResult(True, limit, remaining, 0.0, ahead)
+    return RateLimitResult(False, limit, 0, ahead + interval - window, ahead)
+
+class RateLimitBackendBase(ABC):
+    """Stores one TAT per key and applies gcra() to it atomically."""
+    @abstractmethod
+    async def hit(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, float]:
+        pass
+
+class MemoryRateLimitBackend(RateLimitBackendBase):
+    """
+    Per-process state (limits multiply by the number of workers). Keys whose TAT
+    has passed are indistinguishable from new ones, so a periodic sweep drops them.
+    """
+    def __init__(self, sweep_interval_seconds: float = 60.0):
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval_seconds
+
+    async def hit(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, float]:
+        with self._lock:
+            self._maybe_sweep(now)
+            allowed, tat = gcra(self._tats.get(key), now, interval, window)
+            if allowed:
+                self._tats[key] = tat
+            return allowed, tat
+
+    def _maybe_sweep(self, now: float):
+        if time.monotonic() < self._next_sweep:
+            return
+        self._next_sweep = time.monotonic() + self.sweep_interval_seconds
+        for key in [k for k, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+
+class SQLiteRateLimitBackend(RateLimitBackendBase):
+    """
+    Shared by every worker on one host through a SQLite file. Each hit is a single
+    BEGIN IMMEDIATE transaction, which serializes read-modify-write across processes.
+    Runs in a thread so lock waits never block the event loop.
+    """
+    def __init__(self, path: str, sweep_interval_seconds: float = 60.0):
+        self.path = path
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._local = threading.local()
+        self._next_sweep = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    async def hit(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, float]:
+        return await asyncio.to_thread(self._hit, key, now, interval, window)
+
+    def _hit(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, float]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            allowed, tat = gcra(row[0] if row else None, now, interval, window)
+            if allowed:
+                conn.execute("INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)", (key, tat))
+            if time.monotonic() >= self._next_sweep:
+                self._next_sweep = time.monotonic() + self.sweep_interval_seconds
+                conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tat
+
+# gcra() in Lua, so the read-modify-write is atomic on the Redis server.
+# Keys expire when their TAT passes, which is the idle eviction.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then tat = now end
+local new_tat = tat + interval
+if new_tat - now > window then
+  return {0, tostring(tat)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat)}
+"""
+
+class RedisRateLimitBackend(RateLimitBackendBase):
+    """
+    Shared across hosts. Requires the optional `redis` package, or any client
+    exposing the redis.asyncio eval API.
+    """
+    def __init__(self, url: str = "", client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url, decode_responses=True)
+        self.client = client
+
+    async def hit(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, float]:
+        allowed, tat = await self.client.eval(GCRA_SCRIPT, 1, key, now, interval, window)
+        return bool(int(allowed)), float(tat)
+
+def get_rate_limit_backend() -> RateLimitBackendBase:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(settings.RATE_LIMIT_URL or settings.CACHE_URL)
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteRateLimitBackend(settings.RATE_LIMIT_SQLITE_PATH)
+    return MemoryRateLimitBackend()
+
+rate_limit_backend = get_rate_limit_backend()
@@ -0,0 +1,117 @@
+from typing import Any, Optional, Tuple
+from uuid import UUID
+
+import structlog
+
+from app.core.config import settings
+from app.core.serialization import dumps, loads
+from app.services.cache_service import CacheBackendBase, cache_backend
+
+logger = structlog.get_logger()
+
+class RecipeCache:
+    """
+    Cache for public recipe reads (detail by id, list pages by normalized query).
+
+    Entries are keyed by a version counter: the recipe's own for its detail, a
+    shared list generation for list pages. Writes invalidate by bumping the
+    recipe's version and the list generation, which orphans the old entries at
+    once (they age out through TTL/LRU). get_* return the version they read and
+    set_* store under it, so a reader that missed before a write and finishes
+    after it can't cache the old row under the new version.
+    Backend errors are logged and treated as misses.
+    """
+    LIST_GENERATION_KEY = "recipes:list:generation"
+
+    def __init__(self, backend: CacheBackendBase, ttl_seconds: int = 30, enabled: bool = True):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+    @staticmethod
+    def list_key(**params: Any) -> str:
+        """Normalizes list query parameters into a stable key."""
+        parts = []
+        for name in sorted(params):
+            value = params[name]
+            if value is None or value == "":
+                continue
+            if isinstance(value, (set, frozenset, list, tuple)):
+                value = ",".join(sorted(str(v) for v in value))
+            elif isinstance(value, str):
+                value = value.strip().lower()
+            parts.append(f"{name}={value}")
+        return "&".join(parts)
+
+    async def get_recipe(self, recipe_id: UUID) -> Tuple[Optional[dict], Optional[str]]:
+        """Returns (payload or None, version); pass the version to set_recipe on a miss."""
+        version = await self._version(f"recipes:item:{recipe_id}:version")
+        if version is None:
+            return None, None
+        return await self._get(f"recipes:item:{recipe_id}:{version}"), version
+
+    async def set_recipe(self, recipe_id: UUID, version: Optional[str], payload: dict):
+        if version is None:
+            return
+        await self._set(f"recipes:item:{recipe_id}:{version}", payload)
+
+    async def get_list(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Returns (payload or None, list generation); pass the generation to set_list on a miss."""
+        generation = await self._version(self.LIST_GENERATION_KEY)
+        if generation is None:
+            return None, None
+        return await self._get(f"recipes:list:{generation}:{key}"), generation
+
+    async def set_list(self, key: str, generation: Optional[str], payload: dict):
+        if generation is None:
+            return
+        await self._set(f"recipes:list:{generation}:{key}", payload)
+
+    async def invalidate_recipe(self, recipe_id: UUID):
+        """Orphans a recipe's detail entry and every cached list page."""
+        await self._bump(f"recipes:item:{recipe_id}:version")
+        await self.invalidate_lists()
+
+    async def invalidate_lists(self):
+        await self._bump(self.LIST_GENERATION_KEY)
+
+    async def _version(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            return await self.backend.get(key) or "0"
+        except Exception as e:
+            logger.warning("recipe_cache_error", op="get", error=str(e))
+            return None
+
+    async def _bump(self, key: str):
+        if not self.enabled:
+            return
+        try:
+            await self.backend.incr(key)
+        except Exception as e:
+            logger.warning("recipe_cache_error", op="incr", error=str(e))
+
+    async def _get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("recipe_cache_error", op="get", error=str(e))
+            return None
+        return loads(raw) if raw is not None else None
+
+    async def _set(self, key: str, payload: dict):
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(key, dumps(payload).decode("utf-8"), self.ttl_seconds)
+        except Exception as e:
+            logger.warning("recipe_cache_error", op="set", error=str(e))
+
+recipe_cache = RecipeCache(
+    cache_backend,
+    ttl_seconds=settings.RECIPE_CACHE_TTL_SECONDS,
+    enabled=settings.RECIPE_CACHE_ENABLED,
+)
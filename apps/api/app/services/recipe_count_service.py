@@ -0,0 +1,127 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Set, Tuple
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = structlog.get_logger()
+
+class RecipeCounter:
+    """
+    Approximate result counts for recipe listings without a COUNT(*) per request.
+
+    - Unfiltered (Postgres): pg_class.reltuples from planner statistics.
+    - Filtered: exact counts cached per normalized filter key. Expired entries are served
+      stale while a background task recounts. On Postgres a cold key is answered with the
+      EXPLAIN row estimate while the exact count is computed in the background;
+      on SQLite it is counted inline.
+    """
+    def __init__(
+        self,
+        ttl_seconds: int = 60,
+        max_entries: int = 512,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.session_factory = session_factory
+        self._counts: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def uses_planner_stats(self) -> bool:
+        return not settings.DATABASE_URL.startswith("sqlite")
+
+    async def total(self, db: AsyncSession, query: Select, key: Optional[str]) -> Tuple[int, bool]:
+        """
+        Returns (total, estimated) for the rows matched by query.
+        key is None for the unfiltered listing.
+        """
+        if key is None and self.uses_planner_stats:
+            estimate = await self._reltuples(db)
+            if estimate is not None:
+                return estimate, True
+            key = ""  # Table never analyzed; fall back to a cached count
+
+        cache_key = key or ""
+        cached = self._counts.get(cache_key)
+        if cached is not None:
+            count, counted_at = cached
+            self._counts.move_to_end(cache_key)
+            if time.monotonic() - counted_at > self.ttl_seconds:
+                self._schedule_refresh(cache_key, query)
+            return count, False
+
+        if self.uses_planner_stats:
+            estimate = await self._explain_rows(db, query)
+            self._schedule_refresh(cache_key, query)
+            return estimate, True
+
+        count = await self._count(db, query)
+        self._store(cache_key, count)
+        return count, False
+
+    def clear(self):
+        self._counts.clear()
+
+    def _store(self, key: str, count: int):
+        self._counts[key] = (count, time.monotonic())
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+
+    def _schedule_refresh(self, key: str, query: Select):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, query))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: str, query: Select):
+        try:
+            async with self.session_factory() as session:
+                self._store(key, await self._count(session, query))
+        except Exception as e:
+            logger.warning("recipe_count_refresh_failed", key=key, error=str(e))
+        finally:
+            self._refreshing.discard(key)
+
+    @staticmethod
+    async def _count(db: AsyncSession, query: Select) -> int:
+        result = await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))
+        return result.scalar_one()
+
+    @staticmethod
+    async def _reltuples(db: AsyncSession) -> Optional[int]:
+        result = await db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'recipes'"))
+        value = result.scalar()
+        # -1 means the table has never been vacuumed/analyzed
+        if value is None or value < 0:
+            return None
+        return int(value)
+
+    @staticmethod
+    async def _explain_rows(db: AsyncSession, query: Select) -> int:
+        # Named binds (":param") so the statement can be wrapped in text(); the search
+        # terms stay bound parameters and are never rendered into the SQL
+        compiled = query.order_by(None).compile(
+            dialect=postgresql.dialect(paramstyle="named"), compile_kwargs={"render_postcompile": True}
+        )
+        result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params)
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+recipe_counter = RecipeCounter(ttl_seconds=settings.RECIPE_COUNT_CACHE_TTL_SECONDS)
@@ -0,0 +1,94 @@
+from sqlalchemy import Select, event, false, func, text, select, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+import structlog
+
+from app.core.config import settings
+from app.core.search import InvertedIndex, prefix_tsquery, weighted_fields
+from app.db.models.recipe import Recipe, recipe_search_vector
+
+logger = structlog.get_logger()
+
+class SearchService:
+    """
+    Recipe text search.
+    Both backends AND the query terms and match each as a prefix ("chick" finds "chicken").
+    Postgres: prefix tsquery against the GIN-indexed tsvector, ranked with ts_rank.
+    SQLite (dev/tests): in-process inverted index kept in sync by ORM events.
+    """
+    def __init__(self):
+        self.index = InvertedIndex()
+
+    @property
+    def uses_full_text(self) -> bool:
+        return not settings.DATABASE_URL.startswith("sqlite")
+
+    async def apply(self, db: AsyncSession, query: Select, q: str) -> Select:
+        """Restricts a Recipe select to rows matching q, ordered by relevance."""
+        if self.uses_full_text:
+            terms = prefix_tsquery(q)
+            if terms is None:
+                return query.where(false())
+            ts_query = func.to_tsquery(text("'english'"), terms)
+            return query.where(recipe_search_vector.op("@@")(ts_query)).order_by(
+                func.ts_rank(recipe_search_vector, ts_query).desc()
+            )
+
+        await self._ensure_built(db)
+        scores = self.index.search(q)
+        if not scores:
+            return query.where(false())
+
+        ranking = case(scores, value=Recipe.id, else_=0.0)
+        return query.where(Recipe.id.in_(list(scores))).order_by(ranking.desc())
+
+
+    async def _ensure_built(self, db: AsyncSession):
+        # Rows committed by this process are indexed by the session events below;
+        # the initial load only picks up rows that predate the process.
+        if self.index.built:
+            return
+        result = await db.execute(
+            select(Recipe.id, Recipe.title, Recipe.description, Recipe.ingredients, Recipe.dietary_tags)
+        )
+        count = 0
+        for row in result.all():
+            self.index.add(row[0], weighted_fields(row[1], row[2], row[3], row[4]))
+            count += 1
+        self.index.built = True
+        logger.info("search_index_built", documents=count)
+
+search_service = SearchService()
+
+# Flushed changes wait in session.info until the transaction commits, so a rollback
+# never leaves rows in the index that aren't in the database. Fields are captured at
+# flush time; the instances may be expired by the time the commit event runs.
+_PENDING_KEY = "search_index_pending"
+
+def _pending(target: Recipe) -> dict:
+    return object_session(target).info.setdefault(_PENDING_KEY, {})
+
+@event.listens_for(Recipe, "after_insert")
+@event.listens_for(Recipe, "after_update")
+def _index_recipe(mapper, connection, target: Recipe):
+    if not search_service.uses_full_text:
+        _pending(target)[target.id] = weighted_fields(
+            target.title, target.description, target.ingredients, target.dietary_tags
+        )
+
+@event.listens_for(Recipe, "after_delete")
+def _unindex_recipe(mapper, connection, target: Recipe):
+    if not search_service.uses_full_text:
+        _pending(target)[target.id] = None
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session):
+    for recipe_id, fields in session.info.pop(_PENDING_KEY, {}).items():
+        if fields is None:
+            search_service.index.remove(recipe_id)
+        else:
+            search_service.index.add(recipe_id, fields)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING_KEY, None)
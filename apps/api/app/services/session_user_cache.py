@@ -0,0 +1,156 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Any, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import Column, event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.core.serialization import dumps, loads
+from app.db.models.upload import Upload
+from app.db.models.user import User
+from app.services.cache_service import CacheBackendBase, cache_backend
+
+logger = structlog.get_logger()
+
+# Never copied into the cache; left unloaded on cached users
+EXCLUDED_COLUMNS = {"hashed_password"}
+
+def _snapshot(instance: Any) -> dict:
+    return {
+        column.key: getattr(instance, column.key)
+        for column in instance.__table__.columns
+        if column.key not in EXCLUDED_COLUMNS
+    }
+
+def _restore_value(column: Column, value: Any) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return value
+
+def _restore(model: type, data: dict) -> Any:
+    return model(**{
+        column.key: _restore_value(column, data[column.key])
+        for column in model.__table__.columns
+        if column.key in data
+    })
+
+class SessionUserCache:
+    """
+    Short-lived snapshots of authenticated users, keyed by user id, so that
+    get_current_user doesn't load the user row on every request.
+
+    Snapshots hold the user's columns (minus the password hash) and its profile
+    image. get() rebuilds them as detached instances that the caller merges into
+    its session with load=False, so routes can still modify and commit the user.
+
+    Snapshots are keyed by a per-user version counter, like RecipeCache: get() returns
+    the version it read and set() stores under it, and invalidate() bumps the version.
+    A request that loaded the user before a change and caches it after the change's
+    invalidation writes under the old version, where nobody reads it.
+    Routes that change the user invalidate after commit; role and is_active changes
+    made anywhere through the ORM invalidate once their transaction commits. Anything
+    else (raw SQL, other processes on the memory backend) is bounded by the TTL.
+    """
+    def __init__(self, backend: CacheBackendBase, ttl_seconds: int = 60, enabled: bool = True):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def key(user_id: uuid.UUID, version: str) -> str:
+        return f"session_user:{user_id}:{version}"
+
+    @staticmethod
+    def version_key(user_id: uuid.UUID) -> str:
+        return f"session_user:{user_id}:version"
+
+    async def get(self, user_id: uuid.UUID) -> Tuple[Optional[User], Optional[str]]:
+        """Returns (user or None, version); pass the version to set() on a miss."""
+        if not self.enabled:
+            return None, None
+        try:
+            version = await self.backend.get(self.version_key(user_id)) or "0"
+            raw = await self.backend.get(self.key(user_id, version))
+        except Exception as e:
+            logger.warning("session_user_cache_error", op="get", error=str(e))
+            return None, None
+        if raw is None:
+            return None, version
+
+        data = loads(raw)
+        image = None
+        if data["profile_image"] is not None:
+            image = _restore(Upload, data["profile_image"])
+            make_transient_to_detached(image)
+        user = _restore(User, data["user"])
+        user.profile_image = image
+        make_transient_to_detached(user)
+        return user, version
+
+    async def set(self, user: User, version: Optional[str]):
+        if not self.enabled or version is None:
+            return
+        payload = {
+            "user": _snapshot(user),
+            "profile_image": _snapshot(user.profile_image) if user.profile_image else None,
+        }
+        try:
+            await self.backend.set(self.key(user.id, version), dumps(payload).decode("utf-8"), self.ttl_seconds)
+        except Exception as e:
+            logger.warning("session_user_cache_error", op="set", error=str(e))
+
+    async def invalidate(self, user_id: uuid.UUID):
+        """Orphans the user's snapshot; call after the change is committed."""
+        if not self.enabled:
+            return
+        try:
+            await self.backend.incr(self.version_key(user_id))
+        except Exception as e:
+            logger.warning("session_user_cache_error", op="incr", error=str(e))
+
+    def invalidate_soon(self, user_id: uuid.UUID):
+        """Schedules invalidate() from sync code (mapper events). No-op outside an event loop."""
+        if not self.enabled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.invalidate(user_id))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+session_user_cache = SessionUserCache(
+    cache_backend,
+    ttl_seconds=settings.SESSION_USER_CACHE_TTL_SECONDS,
+    enabled=settings.SESSION_USER_CACHE_ENABLED,
+)
+
+# Flushed access changes are invalidated once their transaction commits: invalidating
+# at flush time would let a concurrent request re-cache the old row before the commit.
+_PENDING_KEY = "session_user_cache_pending"
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_access_change(mapper, connection, target: User):
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        state.session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        session_user_cache.invalidate_soon(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.ingredients import normalize_ingredient, normalize_restriction
+from app.core.prompts import PROMPT_VERSIONS
+
+# get() result for pairs the model hasn't judged yet (None means "no issue")
+MISSING = object()
+
+class IngredientVerdictCache:
+    """
+    Per-process memo of the model's verdict for each (ingredient, restriction) pair,
+    so validate_ingredients only sends pairs it hasn't seen before.
+
+    A verdict is None (compatible) or {"issue": ..., "suggestion": ...}. Keys use the
+    normalized ingredient and restriction names and the ingredient_validation prompt
+    version, so a prompt change starts from an empty memo. Entries expire after
+    ttl_seconds; the least recently used are evicted beyond max_entries.
+    """
+    def __init__(self, ttl_seconds: float = 604800, max_entries: int = 50000, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Optional[Dict[str, str]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(ingredient: str, restriction: str) -> Tuple[str, str, str]:
+        return (PROMPT_VERSIONS["ingredient_validation"], normalize_ingredient(ingredient), normalize_restriction(restriction))
+
+    def get(self, ingredient: str, restriction: str) -> Any:
+        if not self.enabled:
+            return MISSING
+        key = self.key(ingredient, restriction)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            verdict, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return verdict
+
+    def set(self, ingredient: str, restriction: str, verdict: Optional[Dict[str, str]]):
+        if not self.enabled:
+            return
+        key = self.key(ingredient, restriction)
+        with self._lock:
+            self._entries[key] = (verdict, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+ingredient_verdicts = IngredientVerdictCache(
+    ttl_seconds=settings.VALIDATION_CACHE_TTL_SECONDS,
+    max_entries=settings.VALIDATION_CACHE_MAX_ENTRIES,
+    enabled=settings.VALIDATION_CACHE_ENABLED,
+)
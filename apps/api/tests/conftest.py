@@ -5,6 +5,14 @@ os.environ["SECRET_KEY"] = "test-secret-key"
 os.environ["OPENAI_API_KEY"] = "sk-test-mock-key"
 os.environ["STORAGE_BACKEND"] = "disk"
 os.environ["UPLOAD_DIR"] = "/tmp/cookbook-tests"
+os.environ["BCRYPT_ROUNDS"] = "4"
+# Tests write rows directly through the session, bypassing route invalidation
+os.environ["RECIPE_CACHE_ENABLED"] = "False"
+os.environ["SESSION_USER_CACHE_ENABLED"] = "False"
+os.environ["COST_LEDGER_ENABLED"] = "False"
+os.environ["NUTRITION_ESTIMATION_ENABLED"] = "False"
+os.environ["GENERATION_CACHE_ENABLED"] = "False"
+os.environ["VALIDATION_CACHE_ENABLED"] = "False"
 
 import pytest
 import pytest_asyncio
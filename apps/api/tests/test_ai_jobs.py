@@ -0,0 +1,207 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.models.ai_job import AIJob
+from app.db.models.user import User
+from app.services.cost_guard import CostGuard
+from app.services.job_queue import JobFailed, JobQueue, JobQueueFull, job_queue
+
+GENERATED = {
+    "title": "Queued Soup", "description": "Slow", "ingredients": ["leek", "stock"], "instructions": ["Simmer."],
+    "dietary_tags": [], "prep_time_minutes": 5, "cook_time_minutes": 30, "servings": 2, "difficulty": "Easy",
+}
+
+class FakeOpenAI:
+    """Stands in for AsyncOpenAI: answers chat completions with `reply` after `gate` opens."""
+    def __init__(self, reply: dict, gate: asyncio.Event = None, on_call=None):
+        self.reply = reply
+        self.gate = gate
+        self.on_call = on_call
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.on_call is not None:
+            self.on_call()
+        if self.gate is not None:
+            await self.gate.wait()
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=300, completion_tokens=200),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(self.reply)))],
+        )
+
+async def add_users(engine, count):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with factory() as db:
+        users = [User(email=f"jobs_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x", full_name="Jobs") for _ in range(count)]
+        db.add_all(users)
+        await db.commit()
+    return factory, [u.id for u in users]
+
+@pytest.mark.asyncio
+async def test_priority_then_round_robin_between_users(engine):
+    factory, (alice, bob, admin) = await add_users(engine, 3)
+    queue = JobQueue(workers=1, max_pending_per_user=5, session_factory=factory)
+    started, gate = asyncio.Event(), asyncio.Event()
+    ran = []
+
+    async def handler(job, session_factory):
+        started.set()
+        await gate.wait()
+        ran.append(job.payload["n"])
+
+    queue.register("test", handler)
+    async with factory() as db:
+        await queue.submit(db, alice, "test", {"n": "a1"})
+        await started.wait() # a1 blocks the only worker
+        for user_id, n in [(alice, "a2"), (alice, "a3"), (bob, "b1"), (bob, "b2")]:
+            await queue.submit(db, user_id, "test", {"n": n})
+        last = await queue.submit(db, admin, "test", {"n": "admin"}, priority=2)
+    gate.set()
+    await queue.wait(last, 1)
+    while queue._tasks:
+        await asyncio.sleep(0.01)
+    assert ran == ["a1", "admin", "a2", "b1", "a3", "b2"]
+
+@pytest.mark.asyncio
+async def test_failures_are_recorded_and_users_are_bounded(engine):
+    factory, (user_id,) = await add_users(engine, 1)
+    queue = JobQueue(workers=2, max_pending_per_user=1, session_factory=factory)
+
+    async def handler(job, session_factory):
+        raise JobFailed(429, "Daily AI limit reached")
+
+    queue.register("test", handler)
+    async with factory() as db:
+        job_id = await queue.submit(db, user_id, "test", {})
+        with pytest.raises(JobQueueFull):
+            await queue.submit(db, user_id, "test", {})
+        await queue.wait(job_id, 1)
+        job = await db.get(AIJob, job_id)
+        await db.refresh(job)
+    assert (job.status, job.error_status, job.error) == ("failed", 429, "Daily AI limit reached")
+    assert job.finished_at is not None
+    # The slot is free again
+    async with factory() as db:
+        job_id = await queue.submit(db, user_id, "test", {})
+    await queue.wait(job_id, 1)
+
+@pytest.mark.asyncio
+async def test_limit_is_shared_between_processes(engine):
+    factory, (user_id,) = await add_users(engine, 1)
+    gate = asyncio.Event()
+    queues = [JobQueue(workers=1, max_pending_per_user=2, session_factory=factory) for _ in range(2)]
+    for queue in queues:
+        queue.register("test", lambda job, session_factory: gate.wait())
+
+    async with factory() as db:
+        jobs = [await queues[0].submit(db, user_id, "test", {}), await queues[1].submit(db, user_id, "test", {})]
+        with pytest.raises(JobQueueFull):
+            await queues[0].submit(db, user_id, "test", {})
+        with pytest.raises(JobQueueFull):
+            await queues[1].submit(db, user_id, "test", {})
+    gate.set()
+    for queue, job_id in zip(queues, jobs):
+        await queue.wait(job_id, 1)
+        while queue._tasks:
+            await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+async def test_stale_jobs_fail_without_running(engine):
+    factory, (user_id,) = await add_users(engine, 1)
+    queue = JobQueue(workers=1, max_pending_per_user=5, timeout_seconds=60, session_factory=factory)
+    started, gate = asyncio.Event(), asyncio.Event()
+    ran = []
+
+    async def handler(job, session_factory):
+        started.set()
+        await gate.wait()
+        ran.append(job.payload["n"])
+
+    queue.register("test", handler)
+    async with factory() as db:
+        first = await queue.submit(db, user_id, "test", {"n": 1})
+        await started.wait() # Holds the only worker
+        stuck = await queue.submit(db, user_id, "test", {"n": 2})
+        elsewhere = await queue.submit(db, user_id, "test", {"n": 3})
+
+        job = await db.get(AIJob, stuck)
+        assert not await queue.expire(db, job) # Only queued for a moment
+        # Queued for longer than the timeout, e.g. behind a long backlog
+        job.created_at = datetime.utcnow() - timedelta(seconds=120)
+        await db.commit()
+        assert await queue.expire(db, job)
+        assert (job.status, job.error_status) == ("failed", 504)
+
+        # Expired by another process: the claim finds it no longer queued
+        await db.execute(update(AIJob).where(AIJob.id == elsewhere).values(status="failed"))
+        await db.commit()
+
+        gate.set()
+        await queue.wait(first, 1)
+        while queue._tasks:
+            await asyncio.sleep(0.01)
+        running = await db.get(AIJob, first)
+        await db.refresh(running)
+        assert running.status == "succeeded"
+        assert not await queue.expire(db, running)
+    assert ran == [1]
+    assert not queue._done
+
+@pytest.mark.asyncio
+async def test_submit_and_poll_recipe_job(client_with_auth: AsyncClient, engine, db):
+    sessions = []
+    base_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    def factory():
+        sessions.append(base_factory())
+        return sessions[-1]
+
+    def worker_holds_no_connection():
+        assert not any(s.in_transaction() for s in sessions)
+
+    gate = asyncio.Event()
+    fake = FakeOpenAI(GENERATED, gate=gate, on_call=worker_holds_no_connection)
+    queue_wait = job_queue.wait
+
+    async def checked_wait(job_id, timeout):
+        assert not db.in_transaction() # The long poll gave its connection back
+        await queue_wait(job_id, timeout)
+
+    with patch("app.api.routes.ai.ai_service.client", fake), \
+         patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=1.0)), \
+         patch.object(job_queue, "session_factory", factory), \
+         patch.object(job_queue, "wait", checked_wait):
+        submitted = await client_with_auth.post("/ai/jobs", json={"ingredients": ["leek", "stock"]})
+        assert submitted.status_code == 202
+        job_id = submitted.json()["jobId"]
+
+        # Answered straight away while the model is still working
+        pending = await client_with_auth.get(f"/ai/jobs/{job_id}")
+        assert pending.json()["status"] in ("queued", "running")
+
+        gate.set()
+        done = (await client_with_auth.get(f"/ai/jobs/{job_id}", params={"wait": 5})).json()
+        while job_queue._tasks:
+            await asyncio.sleep(0.01)
+    assert done["status"] == "succeeded" and done["error"] is None
+    assert len(fake.calls) == 1
+
+    recipe = await client_with_auth.get(f"/recipes/{done['recipeId']}")
+    assert recipe.json()["title"] == "Queued Soup"
+
+@pytest.mark.asyncio
+async def test_job_validation_and_ownership(client_with_auth: AsyncClient):
+    assert (await client_with_auth.post("/ai/jobs", json={})).status_code == 400
+    assert (await client_with_auth.post("/ai/jobs", json={"uploadId": str(uuid.uuid4())})).status_code == 404
+    assert (await client_with_auth.get(f"/ai/jobs/{uuid.uuid4()}")).status_code == 404
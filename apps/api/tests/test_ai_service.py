@@ -41,3 +41,24 @@ async def test_cost_guard_blocks():
         await service.generate_recipe([], [])
     
     assert "limit exceeded" in str(exc.value)
+
+@pytest.mark.asyncio
+async def test_failed_completion_is_retried():
+    from types import SimpleNamespace
+    from tenacity import wait_none
+    from app.core.circuit_breaker import steps_breaker
+    steps_breaker.reset()
+
+    reply = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=300, completion_tokens=200),
+        choices=[SimpleNamespace(message=SimpleNamespace(content='{"title": "Retried Soup"}'))],
+    )
+    service = AIService()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=AsyncMock(side_effect=[TimeoutError("upstream timeout"), reply])
+    )))
+    with patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=1.0)), \
+         patch.object(AIService._generate_recipe_call.retry, "wait", wait_none()):
+        recipe = await service.generate_recipe(["leek"], [])
+    assert recipe == {"title": "Retried Soup"}
+    assert service.client.chat.completions.create.await_count == 2
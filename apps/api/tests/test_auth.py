@@ -3,6 +3,7 @@ from httpx import AsyncClient
 from app.db.models.user import User
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import uuid
 
 @pytest.mark.asyncio
 async def test_register_and_login(client: AsyncClient, db: AsyncSession):
@@ -43,3 +44,108 @@ async def test_logout(client_with_auth: AsyncClient):
     assert response.status_code == 200
     # Cookie should be cleared
     assert "session_id" not in response.cookies or response.cookies["session_id"] == ""
+
+@pytest.mark.asyncio
+async def test_me_etag_revalidation(client_with_auth: AsyncClient):
+    first = await client_with_auth.get("/auth/me")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = await client_with_auth.get("/auth/me", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Any profile write bumps the row version
+    await client_with_auth.patch("/auth/me", json={"bio": "Changed"})
+    changed = await client_with_auth.get("/auth/me", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+@pytest.mark.asyncio
+async def test_session_user_cache(client_with_auth: AsyncClient, db: AsyncSession):
+    import asyncio
+    from unittest.mock import patch
+    from fastapi import HTTPException
+    from starlette.requests import Request
+    from app.api.deps_auth import get_current_user_id
+    from app.core.security import create_session_token
+    from app.services.cache_service import MemoryCacheBackend
+    from app.services.session_user_cache import session_user_cache
+
+    backend = MemoryCacheBackend()
+    with patch.object(session_user_cache, "enabled", True), patch.object(session_user_cache, "backend", backend):
+        me = (await client_with_auth.get("/auth/me")).json()
+        user_id = uuid.UUID(me["id"])
+        cached, version = await session_user_cache.get(user_id)
+        assert cached is not None
+
+        # Profile writes through a cached user are persisted and invalidate the snapshot
+        await client_with_auth.patch("/auth/me", json={"bio": "Cached bio"})
+        assert (await session_user_cache.get(user_id))[0] is None
+        assert (await client_with_auth.get("/auth/me")).json()["bio"] == "Cached bio"
+
+        # Role changes made anywhere through the ORM invalidate too, once committed
+        user = await db.get(User, user_id)
+        user.role = "maintainer"
+        await db.flush()
+        assert not session_user_cache._tasks
+        await db.rollback()
+        assert not session_user_cache._tasks
+        user = await db.get(User, user_id)
+        user.role = "maintainer"
+        await db.commit()
+        await asyncio.gather(*session_user_cache._tasks)
+        assert (await client_with_auth.get("/auth/me")).json()["role"] == "maintainer"
+
+        # A snapshot loaded before an invalidation is stored where nobody reads it
+        _, version = await session_user_cache.get(user_id)
+        await session_user_cache.invalidate(user_id)
+        await session_user_cache.set(cached, version)
+        assert (await session_user_cache.get(user_id))[0] is None
+
+        cookie = f"session_id={create_session_token({'sub': me['id']})}".encode()
+        request = Request({"type": "http", "headers": [(b"cookie", cookie)]})
+        assert str(await get_current_user_id(request, db)) == me["id"]
+
+        await client_with_auth.delete("/auth/me")
+        with pytest.raises(HTTPException) as exc:
+            await get_current_user_id(request, db)
+        assert exc.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client: AsyncClient, db: AsyncSession, engine):
+    import asyncio
+    from unittest.mock import patch
+    from passlib.context import CryptContext
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.core import security
+    from app.services.password_hasher import PasswordHasher, password_hasher
+
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("password123")
+    user = User(id=uuid.uuid4(), email=f"rehash_{uuid.uuid4().hex[:8]}@example.com", hashed_password=old_hash, full_name="R", role="user", is_active=True)
+    db.add(user)
+    await db.commit()
+    version = user.updated_at
+
+    # Login hands the verified plaintext to the background rehash
+    with patch.object(password_hasher, "schedule_rehash") as schedule:
+        res = await client.post("/auth/login", json={"username": user.email, "password": "password123"})
+        assert res.status_code == 200
+        schedule.assert_called_once_with(user.id, "password123", old_hash)
+
+    # Raising the cost marks the stored hash outdated; the rehash swaps it in place
+    stricter = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5, bcrypt__min_rounds=5)
+    hasher = PasswordHasher(executor="thread", session_factory=async_sessionmaker(bind=engine, expire_on_commit=False))
+    with patch.object(security, "pwd_context", stricter):
+        hasher.schedule_rehash(user.id, "password123", old_hash)
+        await asyncio.gather(*hasher._tasks)
+        await db.refresh(user)
+        assert user.hashed_password.startswith("$2b$05$")
+        assert security.verify_password("password123", user.hashed_password)
+        assert user.updated_at == version
+
+        # Current hashes are left alone
+        hasher.schedule_rehash(user.id, "password123", user.hashed_password)
+        assert not hasher._tasks
+    hasher.shutdown()
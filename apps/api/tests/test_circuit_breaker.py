@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerOpen,
+    MemoryCircuitStore,
+    SQLiteCircuitStore,
+)
+
+def fail():
+    raise RuntimeError("upstream down")
+
+def test_rolling_window_decays_old_failures():
+    cb = CircuitBreaker(failure_threshold=3, window_seconds=0.5)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cb.call(fail)
+    time.sleep(0.6)
+    # The earlier failures fell out of the window, so one more doesn't trip it
+    with pytest.raises(RuntimeError):
+        cb.call(fail)
+    assert cb.state == "CLOSED"
+    assert cb.failures == 1
+
+def test_failure_rate_must_be_reached():
+    cb = CircuitBreaker(failure_threshold=3, failure_rate=0.5)
+    for _ in range(4):
+        cb.call(lambda: "ok")
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            cb.call(fail)
+    # 3 of 7 calls failed: below 50%
+    assert cb.state == "CLOSED"
+    with pytest.raises(RuntimeError):
+        cb.call(fail)
+    assert cb.state == "OPEN"
+
+@pytest.mark.asyncio
+async def test_half_open_limits_concurrent_probes():
+    cb = CircuitBreaker(failure_threshold=1, recovery_timeout=0.1, half_open_max_calls=1)
+    cb.record_failure()
+    await asyncio.sleep(0.15)
+
+    gate = asyncio.Event()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await gate.wait()
+        return "ok"
+
+    probe = asyncio.create_task(cb.call_async(upstream))
+    await asyncio.sleep(0)
+    # Everyone else keeps failing fast while the probe is in flight
+    for _ in range(5):
+        with pytest.raises(CircuitBreakerOpen):
+            await cb.call_async(upstream)
+    assert cb.state == "HALF_OPEN"
+
+    gate.set()
+    assert await probe == "ok"
+    assert calls == 1
+    assert cb.state == "CLOSED"
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_frees_its_slot():
+    cb = CircuitBreaker(failure_threshold=1, recovery_timeout=0.1)
+    cb.record_failure()
+    await asyncio.sleep(0.15)
+
+    probe = asyncio.create_task(cb.call_async(asyncio.sleep, 10))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert cb.state == "HALF_OPEN"
+    assert await cb.call_async(asyncio.sleep, 0, "ok") == "ok"
+    assert cb.state == "CLOSED"
+
+def test_workers_share_state_through_sqlite(tmp_path):
+    path = str(tmp_path / "breakers.sqlite3")
+    worker_a = CircuitBreaker(failure_threshold=2, name="steps", store=SQLiteCircuitStore(path))
+    worker_b = CircuitBreaker(failure_threshold=2, name="steps", store=SQLiteCircuitStore(path))
+    other = CircuitBreaker(failure_threshold=2, name="nutrition", store=SQLiteCircuitStore(path))
+
+    with pytest.raises(RuntimeError):
+        worker_a.call(fail)
+    with pytest.raises(RuntimeError):
+        worker_b.call(fail)
+
+    # Failures from both workers add up, and both see the breaker open
+    assert worker_a.state == "OPEN"
+    with pytest.raises(CircuitBreakerOpen):
+        worker_b.call(lambda: "ok")
+    assert other.call(lambda: "ok") == "ok"
+
+def test_store_errors_fail_open():
+    class BrokenStore(MemoryCircuitStore):
+        def transact(self, name, fn):
+            raise OSError("disk full")
+
+    cb = CircuitBreaker(failure_threshold=1, store=BrokenStore())
+    with pytest.raises(RuntimeError):
+        cb.call(fail)
+    assert cb.call(lambda: "ok") == "ok"
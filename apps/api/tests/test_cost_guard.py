@@ -0,0 +1,156 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.models.ai_spend import GLOBAL_SCOPE, AISpend
+from app.services import cost_guard as cost_guard_module
+from app.services.ai_service import AIService
+from app.services.cost_guard import CostGuard, current_period, price_usd
+
+def make_guard(engine, **kwargs) -> CostGuard:
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    kwargs.setdefault("monthly_limit_usd", 1000.0)
+    return CostGuard(persistent=True, session_factory=session_factory, **kwargs)
+
+async def ledger_row(engine, scope: str, period: str = None):
+    async with async_sessionmaker(bind=engine)() as db:
+        result = await db.execute(
+            select(AISpend).where(AISpend.period == (period or current_period()), AISpend.scope == scope)
+        )
+        return result.scalars().first()
+
+def test_price_per_model():
+    assert price_usd("gpt-4o", 1_000_000, 0) == pytest.approx(2.50)
+    assert price_usd("gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    # Unknown models are priced like the most expensive one
+    assert price_usd("some-new-model", 1000, 1000) == price_usd("gpt-4o", 1000, 1000)
+
+@pytest.mark.asyncio
+async def test_workers_share_ledger(engine):
+    user_id = uuid.uuid4()
+    worker_a = make_guard(engine)
+    worker_b = make_guard(engine)
+    await worker_a.sync(user_id)
+    await worker_b.sync(user_id)
+    baseline = worker_a.current_spend_usd
+
+    cost_a = worker_a.record_usage(1000, 500, "gpt-4o", user_id=user_id)
+    cost_b = worker_b.record_usage(2000, 1000, "gpt-4o-mini", user_id=user_id)
+    await worker_a.sync(force=True)
+    await worker_b.sync(force=True)
+
+    # Both increments landed; neither worker overwrote the other
+    row = await ledger_row(engine, str(user_id))
+    assert row.spend_usd == pytest.approx(cost_a + cost_b)
+    assert (row.tokens_in, row.tokens_out, row.requests) == (3000, 1500, 2)
+    assert worker_b.user_spend_usd(user_id) == pytest.approx(cost_a + cost_b)
+    assert worker_b.current_spend_usd == pytest.approx(baseline + cost_a + cost_b)
+
+    # A fresh worker (e.g. after a restart) starts from the persisted totals
+    restarted = make_guard(engine)
+    await restarted.sync(user_id)
+    assert restarted.user_spend_usd(user_id) == pytest.approx(cost_a + cost_b)
+
+@pytest.mark.asyncio
+async def test_per_user_budget(engine):
+    heavy_user, other_user = uuid.uuid4(), uuid.uuid4()
+    guard = make_guard(engine, user_monthly_limit_usd=0.05)
+    await guard.sync(heavy_user)
+    guard.record_usage(10_000, 2_000, "gpt-4o", user_id=heavy_user) # $0.045
+
+    assert guard.can_proceed(0.01, user_id=heavy_user) is False
+    assert guard.can_proceed(0.01, user_id=other_user) is True
+    assert guard.can_proceed(0.01) is True
+
+@pytest.mark.asyncio
+async def test_sync_failure_keeps_usage(engine):
+    guard = make_guard(engine)
+    user_id = uuid.uuid4()
+    await guard.sync(user_id)
+    cost = guard.record_usage(1000, 1000, "gpt-4o", user_id=user_id)
+
+    with patch.object(guard, "session_factory", side_effect=RuntimeError("db down")):
+        await guard.sync(force=True)
+    assert guard.user_spend_usd(user_id) == pytest.approx(cost)
+
+    await guard.sync(force=True)
+    row = await ledger_row(engine, str(user_id))
+    assert row.spend_usd == pytest.approx(cost)
+    assert row.requests == 1
+
+@pytest.mark.asyncio
+async def test_new_month_starts_from_zero(engine):
+    guard = make_guard(engine, monthly_limit_usd=0.01)
+    user_id = uuid.uuid4()
+    with patch.object(cost_guard_module, "current_period", return_value="2001-01"):
+        await guard.sync(user_id)
+        guard.record_usage(10_000, 0, "gpt-4o", user_id=user_id) # $0.025
+        assert guard.can_proceed(0.001) is False
+
+    with patch.object(cost_guard_module, "current_period", return_value="2001-02"):
+        assert guard.can_proceed(0.001) is True
+        await guard.sync(force=True)
+        assert guard.current_spend_usd == 0.0
+
+    # Usage from the old month was still flushed to the old month
+    row = await ledger_row(engine, GLOBAL_SCOPE, period="2001-01")
+    assert row.spend_usd == pytest.approx(0.025)
+
+def test_reservations_hold_budget():
+    guard = CostGuard(monthly_limit_usd=0.05)
+    first = guard.reserve(0.03)
+    assert first is not None
+    # The hold counts against the budget before any usage is known
+    assert guard.reserve(0.03) is None
+
+    # Actual usage replaces the estimate: 4000 gpt-4o input tokens = $0.01
+    assert guard.commit(first, 4000, 0, "gpt-4o") == pytest.approx(0.01)
+    assert guard.reserved_usd() == 0.0
+    second = guard.reserve(0.03)
+    assert second is not None
+
+    guard.release(second)
+    guard.release(second)
+    assert guard.current_spend_usd == pytest.approx(0.01)
+    assert guard.reserved_usd() == 0.0
+
+def test_user_reservations():
+    user_id = uuid.uuid4()
+    guard = CostGuard(monthly_limit_usd=1.0, user_monthly_limit_usd=0.02)
+    assert guard.reserve(0.015, user_id=user_id) is not None
+    assert guard.reserve(0.015, user_id=user_id) is None
+    assert guard.reserve(0.015, user_id=uuid.uuid4()) is not None
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_stay_on_budget():
+    guard = CostGuard(monthly_limit_usd=0.025)
+    gate = asyncio.Event()
+
+    async def slow_completion(**kwargs):
+        await gate.wait()
+        response = MagicMock()
+        response.usage.prompt_tokens = 1000
+        response.usage.completion_tokens = 100
+        response.choices[0].message.content = '{"issues": []}'
+        return response
+
+    service = AIService()
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock(side_effect=slow_completion)
+
+    with patch("app.services.ai_service.cost_guard", guard):
+        calls = [asyncio.create_task(service.validate_ingredients(["quark"], ["Vegan"])) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+    # Two $0.01 estimates fit in the budget; the third call was refused while they were in flight
+    assert results.count([]) == 2
+    assert [str(r) for r in results if isinstance(r, Exception)] == ["Monthly cost limit exceeded"]
+    assert service.client.chat.completions.create.await_count == 2
+    assert guard.reserved_usd() == 0.0
+    assert guard.current_spend_usd == pytest.approx(2 * price_usd("gpt-4o-mini", 1000, 100))
@@ -226,8 +226,10 @@ async def test_read_users_me_success():
     mock_result = MagicMock()
     mock_result.scalars.return_value.first.return_value = current_user
     db.execute.return_value = mock_result
-    resp = await read_users_me(db, current_user)
+    response = Response()
+    resp = await read_users_me(Request({"type": "http", "headers": []}), response, db, current_user)
     assert resp.email == "u@e.com"
+    assert response.headers["ETag"]
 
 @pytest.mark.asyncio
 async def test_health_check_ai_failure():
@@ -0,0 +1,87 @@
+import pytest
+
+from app.core.dietary_rules import UNKNOWN, TermTrie, dietary_rules
+
+@pytest.mark.parametrize("ingredient, restriction, term", [
+    ("Bacon", "Vegan", "pork (bacon)"),
+    ("2 cups plain flour", "Gluten Free", "gluten (flour)"),
+    ("soy sauce", "celiac", "gluten (soy sauce)"),
+    ("chicken stock", "vegetarian", "meat (chicken stock)"),
+    ("Shrimp", "Kosher", "shellfish (shrimp)"),
+    ("almonds", "nut-free", "nuts (almond)"),
+    ("white rice", "Ketogenic", "grains (white rice)"),
+    ("garlic cloves", "Low FODMAP", "high-FODMAP ingredients (garlic)"),
+    ("red wine", "Halal", "alcohol (red wine)"),
+    ("nutella", "Vegan", "dairy (nutella)"),
+    ("nutella", "Keto", "sugar (nutella)"),
+    ("ice cream", "Keto", "sugar (ice cream)"),
+    ("condensed milk", "Sugar-free", "sugar (condensed milk)"),
+    ("pineapple", "Keto", "high-sugar fruit (pineapple)"),
+    ("peanut butter", "Paleo", "legumes (peanut butter)"),
+    ("2 cups plain flour", "Keto", "grains (flour)"),
+    ("spaghetti", "Low-carb", "starchy carbohydrates (spaghetti)"),
+    # Paleo rules out honey along with the other sugars (maple syrup)
+    ("honey", "Paleo", "honey"),
+    ("maple syrup", "Paleo", "sugar (maple syrup)"),
+])
+def test_known_violations(ingredient, restriction, term):
+    verdict = dietary_rules.check(ingredient, restriction)
+    assert verdict["issue"] == f"Not {restriction}: contains {term}."
+    assert verdict["suggestion"]
+
+@pytest.mark.parametrize("ingredient, restriction", [
+    ("Tomatoes", "Keto"),
+    ("eggplant", "vegan"), # Whole words only: no "egg"
+    ("salmon", "Pescatarian"),
+    ("quinoa", "Gluten-free"),
+])
+def test_known_compatible(ingredient, restriction):
+    assert dietary_rules.check(ingredient, restriction) is None
+
+@pytest.mark.parametrize("ingredient, restriction", [
+    ("gluten-free flour", "Gluten-free"), # Substitutes
+    ("vegan cheese", "Vegan"),
+    ("pasta sauce", "Gluten-free"), # Prepared product with an unknown name
+    ("chicken", "Halal"), # Depends on slaughter
+    ("quark", "Vegan"), # Not in the taxonomy
+    ("smoked tomatoes", "Keto"),
+    ("bacon", "Low-sodium"), # Not one of the 13 diets
+    # Another word changes what the food is
+    ("oat milk", "Vegan"),
+    ("soy milk", "Dairy-free"),
+    ("rice milk", "Vegan"),
+    ("butter beans", "Vegan"),
+    ("cocoa butter", "Vegan"),
+    ("cream of tartar", "Vegan"),
+    # Dishes and prepared products are never declared compatible locally
+    ("lasagna", "Vegetarian"),
+    ("meatball", "Gluten-free"),
+    ("naan", "Vegan"),
+    ("caramel", "Dairy-free"),
+    ("vegetable broth", "Vegan"),
+    ("sugar", "Vegan"), # Bone char
+    ("lentils", "Low-carb"),
+    # Legumes and gluten are fine for keto in small amounts; the carbs decide
+    ("tofu", "Keto"),
+    ("peanuts", "Keto"),
+    ("peanut butter", "Keto"),
+    ("edamame", "Keto"),
+    ("soy sauce", "Keto"),
+    ("seitan", "Low-carb"),
+])
+def test_ambiguous_cases_escalate(ingredient, restriction):
+    assert dietary_rules.check(ingredient, restriction) is UNKNOWN
+
+def test_suggestions_respect_the_diet():
+    assert "tofu" in dietary_rules.check("ham", "Vegetarian")["suggestion"]
+    assert "chicken" in dietary_rules.check("ham", "Halal")["suggestion"]
+    assert "maple syrup" in dietary_rules.check("honey", "Vegan")["suggestion"]
+    assert "maple syrup" not in dietary_rules.check("honey", "Paleo")["suggestion"]
+
+def test_trie_prefers_longest_match():
+    trie = TermTrie()
+    trie.add(["cream"], frozenset({"dairy"}))
+    trie.add(["cream", "cheese"], frozenset({"dairy", "spread"}))
+    matches, unmatched = trie.scan(["light", "cream", "cheese", "cream"])
+    assert matches == [("cream cheese", frozenset({"dairy", "spread"})), ("cream", frozenset({"dairy"}))]
+    assert unmatched == ["light"]
@@ -0,0 +1,109 @@
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.ingredients import normalize_ingredients, normalize_restrictions
+from app.db.models.recipe import Recipe
+from app.db.models.user import User
+from app.services.ai_service import AIService
+from app.services.cache_service import MemoryCacheBackend
+from app.services.generation_cache import GenerationCache, fingerprint
+
+GENERATED = {
+    "title": "Chickpea Stew", "description": "Warm", "ingredients": ["chickpeas", "tomatoes"],
+    "instructions": ["Simmer."], "dietary_tags": ["Vegan"], "prep_time_minutes": 10,
+    "cook_time_minutes": 20, "servings": 2, "difficulty": "Easy",
+}
+
+def test_normalization():
+    assert normalize_ingredients(["2 cups Chopped Tomatoes", "garbanzo beans", "Scallions", "tomato"]) == [
+        "chickpea", "green onion", "tomato",
+    ]
+    assert normalize_ingredients(["Berries", "potatoes", "peaches", "hummus"]) == ["berry", "hummus", "peach", "potato"]
+    assert normalize_restrictions(["Gluten Free", "vegan ", "Ketogenic", "VEGAN"]) == ["gluten-free", "keto", "vegan"]
+
+def test_fingerprint_ignores_order_case_and_synonyms():
+    key = fingerprint(["Tomatoes", "Garbanzo beans"], ["Vegan", "Gluten-free"]).key
+    assert key == fingerprint(["chickpea", "tomato"], ["gluten free", "vegan"]).key
+    assert key != fingerprint(["chickpea", "tomato"], ["vegan"]).key
+    assert key != fingerprint(["chickpea", "tomato"], ["gluten free", "vegan"], image_bytes=b"jpeg").key
+
+    with patch.dict("app.services.generation_cache.PROMPT_VERSIONS", {"recipe_generation": "9.9.9"}):
+        # A new prompt version never reuses old generations
+        assert fingerprint(["chickpea", "tomato"], ["gluten free", "vegan"]).key != key
+
+@pytest.mark.asyncio
+async def test_equivalent_requests_call_the_model_once():
+    cache = GenerationCache(MemoryCacheBackend())
+    service = AIService()
+    with patch("app.services.ai_service.generation_cache", cache), \
+         patch("app.services.ai_service.cost_guard.can_proceed", return_value=True), \
+         patch.object(AIService, "_generate_recipe_call", AsyncMock(return_value=GENERATED)) as call, \
+         patch.object(GenerationCache, "_find_similar", AsyncMock(return_value=None)):
+        first = await service.generate_recipe(["Chickpeas", "Tomatoes"], ["Vegan"])
+        second = await service.generate_recipe(["tomato", "chickpea"], ["vegan"], user_id=uuid.uuid4())
+    assert first == second == GENERATED
+    assert call.await_count == 1
+
+async def add_generated_recipe(engine, ingredients, restrictions, title="Stew"):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    fp = fingerprint(ingredients, restrictions)
+    async with factory() as db:
+        user = User(email=f"gen_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x", full_name="Gen")
+        db.add(user)
+        await db.flush()
+        db.add(Recipe(
+            user_id=user.id, title=title, description="", ingredients=ingredients, instructions=["Cook."],
+            dietary_tags=[], generation_key=fp.restrictions_key, generation_ingredients=list(fp.ingredients),
+        ))
+        await db.commit()
+    return factory
+
+@pytest.mark.asyncio
+async def test_near_duplicate_served_from_recipes(engine):
+    restriction = f"diet-{uuid.uuid4().hex[:6]}" # Keeps candidates to this test's rows
+    factory = await add_generated_recipe(engine, ["lentils", "carrots", "onion", "cumin"], [restriction], title="Lentil Soup")
+    cache = GenerationCache(MemoryCacheBackend(), similarity=0.8, session_factory=factory)
+
+    # Uses 4 of the 5 listed ingredients
+    hit = await cache.get(fingerprint(["Lentil", "carrot", "onions", "cumin", "rice"], [restriction]))
+    assert hit["title"] == "Lentil Soup"
+    # Now an exact hit from the backend
+    assert await cache.backend.get(f"ai:generation:{fingerprint(['lentil', 'carrot', 'onion', 'cumin', 'rice'], [restriction]).key}")
+
+    # Too far from what was asked for
+    assert await cache.get(fingerprint(["lentil", "carrot", "onion", "cumin", "rice", "kale"], [restriction])) is None
+    # Would need an ingredient the user didn't list
+    assert await cache.get(fingerprint(["lentil", "carrot", "onion"], [restriction])) is None
+    # Different restrictions
+    assert await cache.get(fingerprint(["lentil", "carrot", "onion", "cumin"], [restriction, "keto"])) is None
+    # Photo requests only reuse exact matches
+    assert await cache.get(fingerprint(["lentil", "carrot", "onion", "cumin"], [restriction], image_bytes=b"jpeg")) is None
+
+@pytest.mark.asyncio
+async def test_database_errors_are_misses():
+    def broken_session():
+        raise RuntimeError("db down")
+    cache = GenerationCache(MemoryCacheBackend(), session_factory=broken_session)
+    assert await cache.get(fingerprint(["rice"], [])) is None
+
+@pytest.mark.asyncio
+async def test_edited_recipes_are_not_served(client_with_auth, db, engine):
+    restriction = f"diet-{uuid.uuid4().hex[:6]}"
+    fp = fingerprint(["tofu", "rice"], [restriction])
+    created = await client_with_auth.post("/recipes", json={
+        "title": "Tofu Rice", "ingredients": ["tofu", "rice"], "instruction_text": "Fry.", "dietary_tags": [],
+    })
+    recipe = await db.get(Recipe, uuid.UUID(created.json()["id"]))
+    recipe.generation_key, recipe.generation_ingredients = fp.restrictions_key, list(fp.ingredients)
+    await db.commit()
+    cache = GenerationCache(MemoryCacheBackend(), session_factory=async_sessionmaker(bind=engine, expire_on_commit=False))
+    assert (await cache.get(fp))["title"] == "Tofu Rice"
+
+    # The owner's private changes (here: fish sauce in a once-vegan dish) never reach other users
+    await client_with_auth.patch(f"/recipes/{recipe.id}", json={"ingredients": ["tofu", "rice", "fish sauce"]})
+    await db.refresh(recipe)
+    assert recipe.generation_key is None and recipe.generation_ingredients is None
+    assert await GenerationCache(MemoryCacheBackend(), session_factory=cache.session_factory).get(fp) is None
@@ -0,0 +1,96 @@
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.cost_guard import CostGuard
+from app.services.verdict_cache import MISSING, IngredientVerdictCache
+
+def completion(issues: list):
+    response = MagicMock()
+    response.usage.prompt_tokens = 200
+    response.usage.completion_tokens = 50
+    response.choices[0].message.content = json.dumps({"issues": issues})
+    return response
+
+TERIYAKI_GLUTEN = {"ingredient": "teriyaki sauce", "restriction": "Gluten-free", "issue": "Contains wheat", "suggestion": "Tamari"}
+
+@pytest.fixture
+def verdicts():
+    cache = IngredientVerdictCache()
+    with patch("app.services.ai_service.ingredient_verdicts", cache), \
+         patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=1.0)):
+        yield cache
+
+@pytest.fixture
+def service():
+    service = AIService()
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock()
+    return service
+
+@pytest.mark.asyncio
+async def test_only_unseen_pairs_reach_the_model(verdicts, service):
+    create = service.client.chat.completions.create
+    create.return_value = completion([TERIYAKI_GLUTEN])
+
+    issues = await service.validate_ingredients(["Teriyaki Sauce", "quinoa"], ["Gluten-free"])
+    assert issues == [{"ingredient": "Teriyaki Sauce", "restriction": "Gluten-free", "issue": "Contains wheat", "suggestion": "Tamari"}]
+    assert create.await_count == 1
+    # quinoa is settled by the dietary rules and never sent
+    assert "Ingredients: Teriyaki Sauce\n" in create.await_args.kwargs["messages"][1]["content"]
+
+    # Same pairs, different spelling: answered locally
+    issues = await service.validate_ingredients(["quinoa", "teriyaki sauces"], ["gluten free"])
+    assert [i["ingredient"] for i in issues] == ["teriyaki sauces"]
+    assert create.await_count == 1
+
+    # A new ingredient goes to the model on its own
+    create.return_value = completion([])
+    await service.validate_ingredients(["teriyaki sauce", "quinoa", "tamarind"], ["Gluten-free"])
+    assert create.await_count == 2
+    assert "Ingredients: tamarind\n" in create.await_args.kwargs["messages"][1]["content"]
+
+@pytest.mark.asyncio
+async def test_unattributed_issues_are_not_memoized(verdicts, service):
+    service.client.chat.completions.create.return_value = completion([
+        {"ingredient": "agar", "issue": "Processed", "suggestion": "Gelatin"},
+    ])
+    issues = await service.validate_ingredients(["agar"], ["Paleo", "Whole30"])
+    assert issues == [{"ingredient": "agar", "restriction": None, "issue": "Processed", "suggestion": "Gelatin"}]
+    assert verdicts.get("agar", "Paleo") is MISSING
+
+def test_verdicts_expire_and_follow_prompt_version():
+    cache = IngredientVerdictCache(ttl_seconds=0.05)
+    cache.set("Tomatoes", "Keto", None)
+    assert cache.get("tomato", "keto") is None
+    with patch.dict("app.services.verdict_cache.PROMPT_VERSIONS", {"ingredient_validation": "9.9.9"}):
+        assert cache.get("tomato", "keto") is MISSING
+    time.sleep(0.06)
+    assert cache.get("tomato", "keto") is MISSING
+
+def test_verdict_cache_is_bounded():
+    cache = IngredientVerdictCache(max_entries=2)
+    cache.set("a", "vegan", None)
+    cache.set("b", "vegan", None)
+    cache.get("a", "vegan")
+    cache.set("c", "vegan", None)
+    assert len(cache) == 2
+    assert cache.get("b", "vegan") is MISSING
+    assert cache.get("a", "vegan") is None
+
+@pytest.mark.asyncio
+async def test_obvious_cases_never_reach_the_model(verdicts, service):
+    create = service.client.chat.completions.create
+    issues = await service.validate_ingredients(["Bacon", "2 cups flour", "tomatoes"], ["Vegan", "Gluten Free"])
+    assert create.await_count == 0
+    assert {(i["ingredient"], i["restriction"]) for i in issues} == {("Bacon", "Vegan"), ("2 cups flour", "Gluten Free")}
+
+    # Only the pair the rules can't settle is asked about
+    create.return_value = completion([{"ingredient": "chicken", "restriction": "Halal", "issue": "x", "suggestion": "y"}])
+    issues = await service.validate_ingredients(["chicken"], ["Vegan", "Halal"])
+    assert create.await_count == 1
+    assert "Restrictions: Halal" in create.await_args.kwargs["messages"][1]["content"]
+    assert [i["issue"] for i in issues] == ["Not Vegan: contains meat (chicken).", "x"]
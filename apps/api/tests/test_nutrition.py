@@ -0,0 +1,200 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.routes.recipes import RECIPE_SUMMARY_COLUMNS, recipe_summary_card
+from app.core.circuit_breaker import nutrition_breaker
+from app.db.models.recipe import Recipe
+from app.db.models.upload import Upload
+from app.db.models.user import User
+from app.services.ai_service import ai_service
+from app.services.cost_guard import CostGuard
+from app.services.nutrition_service import NutritionEstimator
+
+def completion(content: dict):
+    response = MagicMock()
+    response.usage.prompt_tokens = 400
+    response.usage.completion_tokens = 120
+    response.choices[0].message.content = json.dumps(content)
+    return response
+
+def nutrition_reply(**kwargs):
+    # One estimate per recipe in the prompt, numbered like the prompt
+    prompt = kwargs["messages"][0]["content"]
+    count = prompt.count("\n[") + prompt.startswith("[")
+    return completion({"recipes": [
+        {"recipe": i, "calories": 400 + i, "protein": 20, "carbs": 50, "fats": 12.4} for i in range(count)
+    ]})
+
+async def make_recipes(engine, count: int):
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with factory() as db:
+        user = User(email=f"nutrition_{uuid.uuid4().hex[:8]}@example.com", hashed_password="x", full_name="Nutrition")
+        db.add(user)
+        await db.flush()
+        recipes = [
+            Recipe(user_id=user.id, title=f"Dish {i}", description="", ingredients=["rice", "beans"], servings=2)
+            for i in range(count)
+        ]
+        db.add_all(recipes)
+        await db.commit()
+    return factory, [r.id for r in recipes]
+
+@pytest.fixture
+def fake_openai():
+    nutrition_breaker.reset()
+    create = AsyncMock(side_effect=nutrition_reply)
+    with patch.object(ai_service, "client") as client, \
+         patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=1.0)):
+        client.chat.completions.create = create
+        yield create
+
+@pytest.mark.asyncio
+async def test_batch_estimates_in_one_call(engine, fake_openai):
+    factory, recipe_ids = await make_recipes(engine, 3)
+    estimator = NutritionEstimator(session_factory=factory)
+
+    assert await estimator.estimate_batch(recipe_ids) == 3
+    assert fake_openai.await_count == 1
+
+    async with factory() as db:
+        result = await db.execute(
+            select(*RECIPE_SUMMARY_COLUMNS).outerjoin(Upload, Recipe.upload_id == Upload.id).where(Recipe.id.in_(recipe_ids))
+        )
+        cards = [recipe_summary_card(row) for row in result.all()]
+        recipes = (await db.execute(select(Recipe).where(Recipe.id.in_(recipe_ids)))).scalars().all()
+    assert sorted(card["calories"] for card in cards) == [400, 401, 402]
+    assert all((r.protein_grams, r.carbs_grams, r.fat_grams) == (20, 50, 12) for r in recipes)
+    assert all(r.nutrition_estimated_at is not None for r in recipes)
+
+    # Already estimated: nothing to ask the model
+    assert await estimator.estimate_batch(recipe_ids) == 0
+    assert fake_openai.await_count == 1
+
+@pytest.mark.asyncio
+async def test_enqueue_batches_in_background(engine, fake_openai):
+    factory, recipe_ids = await make_recipes(engine, 5)
+    estimator = NutritionEstimator(batch_size=4, batch_wait_seconds=0.05, session_factory=factory)
+
+    for recipe_id in recipe_ids:
+        estimator.enqueue(recipe_id)
+    await asyncio.wait_for(estimator._worker, timeout=5)
+
+    # A full batch of 4, then the remaining one
+    assert fake_openai.await_count == 2
+    async with factory() as db:
+        result = await db.execute(select(Recipe.calories).where(Recipe.id.in_(recipe_ids)))
+        assert None not in result.scalars().all()
+
+@pytest.mark.asyncio
+async def test_edit_during_estimate_keeps_estimate_out(engine, fake_openai):
+    factory, (recipe_id,) = await make_recipes(engine, 1)
+    estimator = NutritionEstimator(session_factory=factory)
+
+    async def edited_meanwhile(**kwargs):
+        async with factory() as db:
+            await db.execute(update(Recipe).where(Recipe.id == recipe_id).values(ingredients=["tofu"]))
+            await db.commit()
+        return nutrition_reply(**kwargs)
+    fake_openai.side_effect = edited_meanwhile
+
+    assert await estimator.estimate_batch([recipe_id]) == 0
+    async with factory() as db:
+        recipe = await db.get(Recipe, recipe_id)
+    assert recipe.calories is None and recipe.nutrition_estimated_at is None
+    assert recipe.nutrition_claimed_at is None # Free for the next attempt
+
+@pytest.mark.asyncio
+async def test_skipped_recipes_are_queued_again(engine, fake_openai):
+    factory, (recipe_id,) = await make_recipes(engine, 1)
+    estimator = NutritionEstimator(batch_wait_seconds=0, session_factory=factory)
+
+    async def edited_once(**kwargs):
+        if fake_openai.await_count == 1:
+            async with factory() as db:
+                await db.execute(update(Recipe).where(Recipe.id == recipe_id).values(ingredients=["tofu"]))
+                await db.commit()
+        return nutrition_reply(**kwargs)
+    fake_openai.side_effect = edited_once
+
+    estimator.enqueue(recipe_id)
+    await asyncio.wait_for(estimator._worker, timeout=5)
+
+    assert fake_openai.await_count == 2
+    async with factory() as db:
+        assert (await db.get(Recipe, recipe_id)).calories == 400
+
+@pytest.mark.asyncio
+async def test_workers_do_not_estimate_the_same_recipe(engine, fake_openai):
+    factory, recipe_ids = await make_recipes(engine, 2)
+    first, second = NutritionEstimator(session_factory=factory), NutritionEstimator(session_factory=factory)
+    started, gate = asyncio.Event(), asyncio.Event()
+
+    async def slow_reply(**kwargs):
+        started.set()
+        await gate.wait()
+        return nutrition_reply(**kwargs)
+    fake_openai.side_effect = slow_reply
+
+    # Both processes backfill the same recipes at startup
+    running = asyncio.create_task(first.estimate_batch(recipe_ids))
+    await started.wait()
+    assert await second.estimate_batch(recipe_ids) == 0
+    gate.set()
+    assert await running == 2
+    assert fake_openai.await_count == 1
+
+    # A claim left by a crashed worker lapses
+    factory, (recipe_id,) = await make_recipes(engine, 1)
+    async with factory() as db:
+        await db.execute(
+            update(Recipe).where(Recipe.id == recipe_id).values(nutrition_claimed_at=datetime.utcnow() - timedelta(hours=1))
+        )
+        await db.commit()
+    assert await second.estimate_batch([recipe_id]) == 1
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried(engine, fake_openai):
+    factory, (recipe_id,) = await make_recipes(engine, 1)
+    estimator = NutritionEstimator(batch_wait_seconds=0, retry_seconds=0, max_attempts=2, session_factory=factory)
+    def reply(**kwargs):
+        if fake_openai.await_count == 1:
+            raise Exception("upstream 500")
+        return nutrition_reply(**kwargs)
+    fake_openai.side_effect = reply
+
+    estimator.enqueue(recipe_id)
+    await asyncio.wait_for(estimator._worker, timeout=5)
+
+    assert fake_openai.await_count == 2
+    async with factory() as db:
+        assert (await db.get(Recipe, recipe_id)).calories == 400
+
+@pytest.mark.asyncio
+async def test_estimates_are_validated(fake_openai):
+    fake_openai.side_effect = None
+    fake_openai.return_value = completion({"recipes": [
+        {"recipe": 0, "calories": 350, "protein": 10, "carbs": 40, "fats": 9},
+        {"recipe": 1, "calories": "lots"},
+        {"recipe": 7, "calories": 1, "protein": 1, "carbs": 1, "fats": 1},
+        {"recipe": 2, "calories": -5, "protein": 1, "carbs": 1, "fats": 1},
+    ]})
+    recipes = [{"title": f"R{i}", "ingredients": ["x"], "servings": 1} for i in range(3)]
+    assert await ai_service.estimate_nutrition(recipes) == {0: {"calories": 350, "protein": 10, "carbs": 40, "fats": 9}}
+
+@pytest.mark.asyncio
+async def test_budget_is_synced_before_reserving(fake_openai):
+    guard = MagicMock()
+    guard.sync = AsyncMock()
+    guard.reserve.return_value = None # Another worker already spent the budget
+    with patch("app.services.ai_service.cost_guard", guard):
+        with pytest.raises(Exception, match="limit exceeded"):
+            await ai_service.estimate_nutrition([{"title": "R", "ingredients": ["x"], "servings": 1}])
+    assert [c[0] for c in guard.mock_calls][:2] == ["sync", "reserve"]
+    fake_openai.assert_not_called()
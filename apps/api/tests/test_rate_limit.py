@@ -0,0 +1,147 @@
+import time
+
+import pytest
+from app.middleware.security import RateLimiter
+from app.services.rate_limit_service import (
+    GCRA_SCRIPT,
+    MemoryRateLimitBackend,
+    RedisRateLimitBackend,
+    SQLiteRateLimitBackend,
+    to_result,
+)
+
+def lua_redis():
+    """In-process Redis that runs GCRA_SCRIPT itself (fakeredis with the lupa Lua runtime)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+class RecordingRedis:
+    """Records eval() calls and answers with the script's reply shape: {allowed, tostring(tat)}."""
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    async def eval(self, *args):
+        self.calls.append(args)
+        return self.reply
+
+async def _burst(backend, key, now, count, limit=5, window=60.0):
+    interval = window / limit
+    results = []
+    for _ in range(count):
+        allowed, tat = await backend.hit(key, now, interval, window)
+        results.append(to_result(allowed, tat, now, interval, window, limit))
+    return results
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("make_backend", [
+    lambda tmp_path: MemoryRateLimitBackend(),
+    lambda tmp_path: SQLiteRateLimitBackend(str(tmp_path / "limits.sqlite3")),
+    lambda tmp_path: RedisRateLimitBackend(client=lua_redis()),
+])
+async def test_gcra_burst_and_refill(make_backend, tmp_path):
+    backend = make_backend(tmp_path)
+    results = await _burst(backend, "k", now=1000.0, count=6)
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+    assert results[-1].retry_after == pytest.approx(12.0)
+
+    # One emission interval later exactly one more request fits
+    later = await _burst(backend, "k", now=1012.0, count=2)
+    assert [r.allowed for r in later] == [True, False]
+    # Other keys are independent
+    assert (await _burst(backend, "other", now=1012.0, count=1))[0].allowed
+
+@pytest.mark.asyncio
+async def test_redis_script_expires_idle_keys():
+    client = lua_redis()
+    backend = RedisRateLimitBackend(client=client)
+    now = time.time()
+    assert await backend.hit("k", now, 12.0, 60.0) == (True, pytest.approx(now + 12.0))
+    # Kept until the TAT passes, then indistinguishable from a new key
+    assert 11_000 < await client.pttl("k") <= 12_000
+
+@pytest.mark.asyncio
+async def test_redis_backend_script_call_and_reply():
+    client = RecordingRedis([0, "1012.5"])
+    backend = RedisRateLimitBackend(client=client)
+    assert await backend.hit("ratelimit:ai:ip", 1000.0, 12.0, 60.0) == (False, 1012.5)
+    # One key, then ARGV now, interval, window in the order the script reads them
+    assert client.calls == [(GCRA_SCRIPT, 1, "ratelimit:ai:ip", 1000.0, 12.0, 60.0)]
+
+    client.reply = [1, "1024"] # tostring() of a whole number has no decimal point
+    assert await backend.hit("ratelimit:ai:ip", 1000.0, 12.0, 60.0) == (True, 1024.0)
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    worker_a, worker_b = SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)
+    await _burst(worker_a, "ip", now=1000.0, count=3)
+    results = await _burst(worker_b, "ip", now=1000.0, count=3)
+    assert [r.allowed for r in results] == [True, True, False]
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_idle_keys():
+    backend = MemoryRateLimitBackend(sweep_interval_seconds=0)
+    for i in range(100):
+        await backend.hit(f"ip-{i}", 1000.0, 12.0, 60.0)
+    assert len(backend) == 100
+    # Once every TAT has passed, the next call sweeps them
+    await backend.hit("late", 2000.0, 12.0, 60.0)
+    assert len(backend) == 1
+
+@pytest.mark.asyncio
+async def test_rate_limiter_fails_open(monkeypatch):
+    monkeypatch.setenv("TESTING", "False")
+
+    class BrokenBackend(MemoryRateLimitBackend):
+        async def hit(self, *args):
+            raise ConnectionError("down")
+
+    limiter = RateLimiter(requests_limit=1, window_seconds=60, name="broken", backend=BrokenBackend())
+    assert await limiter.is_allowed("ip")
+    assert await limiter.is_allowed("ip")
+
+@pytest.mark.asyncio
+async def test_rate_limit_policy_tiers_and_headers(monkeypatch):
+    import uuid
+    from unittest.mock import patch
+    from fastapi import HTTPException
+    from starlette.requests import Request
+    from app.core.config import settings
+    from app.db.models.user import User
+    from app.middleware.security import RateLimitPolicy
+
+    monkeypatch.setenv("TESTING", "False")
+    policy = RateLimitPolicy("ai", "AI generation limit reached.")
+    request = Request({"type": "http", "headers": [], "client": ("10.0.0.1", 1234)})
+    limits = {"ai": {"default": "2/hour", "anonymous": "1/hour", "maintainer": "4/hour"}}
+    backend = MemoryRateLimitBackend()
+
+    async def hits(user, count):
+        allowed = 0
+        for _ in range(count):
+            try:
+                await policy(request, user)
+                allowed += 1
+            except HTTPException as e:
+                assert e.status_code == 429
+                return allowed, e.headers
+        return allowed, request.state.rate_limit_headers
+
+    with patch.object(settings, "RATE_LIMITS", limits), \
+         patch("app.middleware.security.rate_limit_backend", backend):
+        # Users behind the same IP are limited separately, per their role's tier
+        user = User(id=uuid.uuid4(), role="user")
+        maintainer = User(id=uuid.uuid4(), role="maintainer")
+        assert (await hits(None, 5))[0] == 1
+        allowed, headers = await hits(user, 5)
+        assert allowed == 2
+        assert headers["Retry-After"] == "1800"
+        assert headers["X-RateLimit-Limit"] == "2" and headers["X-RateLimit-Remaining"] == "0"
+        assert (await hits(maintainer, 5))[0] == 4
+
+        allowed, headers = await hits(User(id=uuid.uuid4(), role="admin"), 1)
+        assert headers["X-RateLimit-Remaining"] == "1"
+        assert headers["X-RateLimit-Reset"] == "1800"
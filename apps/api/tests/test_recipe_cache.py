@@ -0,0 +1,131 @@
+import pytest
+import uuid
+from unittest.mock import patch
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.cache_service import MemoryCacheBackend, RedisCacheBackend
+from app.services.recipe_cache import RecipeCache, recipe_cache
+from app.db.models.recipe import Recipe
+
+class FakeRedis:
+    """Local stand-in for a redis.asyncio client."""
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+@pytest.mark.asyncio
+async def test_memory_backend_ttl_lru_and_counters():
+    backend = MemoryCacheBackend(max_entries=2)
+    await backend.set("a", "1", ttl_seconds=60)
+    await backend.set("b", "2", ttl_seconds=60)
+    await backend.get("a")  # Touch a so b is least recently used
+    await backend.set("c", "3", ttl_seconds=60)
+    assert await backend.get("b") is None
+    assert await backend.get("a") == "1"
+
+    await backend.set("expired", "x", ttl_seconds=0)
+    assert await backend.get("expired") is None
+
+    assert await backend.incr("gen") == 1
+    assert await backend.incr("gen") == 2
+    assert await backend.get("gen") == "2"
+
+@pytest.mark.asyncio
+async def test_memory_backend_counters_expire_with_their_entries():
+    backend = MemoryCacheBackend()
+    clock = [1000.0]
+    with patch("app.services.cache_service.time.monotonic", lambda: clock[0]):
+        await backend.incr("recipes:item:1:version")
+        await backend.set("recipes:item:1:1", "old", ttl_seconds=30)
+        clock[0] += 20
+        assert await backend.get("recipes:item:1:version") == "1" # Reading keeps it alive
+        clock[0] += 20
+        assert await backend.get("recipes:item:1:1") is None
+        assert await backend.get("recipes:item:1:version") == "1"
+
+        for i in range(100):
+            await backend.incr(f"recipes:item:{i + 2}:version")
+        clock[0] += 31
+        await backend.incr("other")
+        assert len(backend._counters) == 1
+        # Recreated above every dropped value: no old version comes back
+        assert await backend.incr("recipes:item:1:version") == 2
+
+@pytest.mark.asyncio
+async def test_recipe_cache_list_generation_with_shared_backend():
+    cache = RecipeCache(RedisCacheBackend(client=FakeRedis()), ttl_seconds=30)
+    key = RecipeCache.list_key(q=" Chicken ", tags={"vegan", "keto"}, cursor=None)
+    assert key == RecipeCache.list_key(tags=["keto", "vegan"], q="chicken")
+
+    _, generation = await cache.get_list(key)
+    await cache.set_list(key, generation, {"data": [1]})
+    assert (await cache.get_list(key))[0] == {"data": [1]}
+    await cache.invalidate_lists()
+    assert (await cache.get_list(key))[0] is None
+
+    rid = uuid.uuid4()
+    _, version = await cache.get_recipe(rid)
+    await cache.set_recipe(rid, version, {"id": str(rid)})
+    assert (await cache.get_recipe(rid))[0] == {"id": str(rid)}
+    await cache.invalidate_recipe(rid)
+    assert (await cache.get_recipe(rid))[0] is None
+
+@pytest.mark.asyncio
+async def test_recipe_cache_misses_started_before_a_write_are_not_stored():
+    cache = RecipeCache(MemoryCacheBackend(), ttl_seconds=30)
+    rid = uuid.uuid4()
+    key = RecipeCache.list_key(q="soup")
+    # Both readers miss, then a write lands while they query the database
+    _, generation = await cache.get_list(key)
+    _, version = await cache.get_recipe(rid)
+    await cache.invalidate_recipe(rid)
+    await cache.set_list(key, generation, {"data": ["old"]})
+    await cache.set_recipe(rid, version, {"title": "old"})
+
+    assert await cache.get_list(key) == (None, "1")
+    assert await cache.get_recipe(rid) == (None, "1")
+
+@pytest.mark.asyncio
+async def test_recipe_cache_errors_are_misses():
+    class BrokenBackend(MemoryCacheBackend):
+        async def get(self, key):
+            raise ConnectionError("down")
+
+    cache = RecipeCache(BrokenBackend())
+    assert await cache.get_recipe(uuid.uuid4()) == (None, None)
+    assert await cache.get_list("k") == (None, None)
+
+@pytest.mark.asyncio
+async def test_recipe_routes_serve_and_invalidate_cache(client_with_auth: AsyncClient, db: AsyncSession):
+    with patch.object(recipe_cache, "enabled", True), patch.object(recipe_cache, "backend", MemoryCacheBackend()):
+        res = await client_with_auth.post("/recipes", json={"title": "Cached", "ingredients": ["a"], "instruction_text": "Do it.", "dietary_tags": []})
+        recipe_id = res.json()["id"]
+        assert (await client_with_auth.get(f"/recipes/{recipe_id}")).json()["title"] == "Cached"
+        list_before = (await client_with_auth.get("/recipes?limit=5")).json()
+
+        # A write that bypasses the routes is not visible while the entry is cached
+        recipe = await db.get(Recipe, uuid.UUID(recipe_id))
+        recipe.title = "Changed behind the cache"
+        await db.commit()
+        assert (await client_with_auth.get(f"/recipes/{recipe_id}")).json()["title"] == "Cached"
+        assert (await client_with_auth.get("/recipes?limit=5")).json() == list_before
+
+        # Route writes invalidate the detail entry and all list pages
+        await client_with_auth.patch(f"/recipes/{recipe_id}", json={"title": "Patched"})
+        assert (await client_with_auth.get(f"/recipes/{recipe_id}")).json()["title"] == "Patched"
+        assert any(r["title"] == "Patched" for r in (await client_with_auth.get("/recipes?limit=5")).json()["data"])
+
+        await client_with_auth.delete(f"/recipes/{recipe_id}")
+        assert (await client_with_auth.get(f"/recipes/{recipe_id}")).status_code == 404
@@ -0,0 +1,133 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.json_stream import JSONObjectStream
+from app.services.ai_service import AIService
+from app.services.cost_guard import CostGuard
+
+RECIPE = {
+    "title": "Tomato \"Rice\"", "description": "Quick, warm", "ingredients": ["1 cup rice", "2 tomatoes"],
+    "instructions": ["Rinse the rice.", "Simmer {covered} for 15 min."], "dietary_tags": [],
+    "prep_time_minutes": 5, "cook_time_minutes": 15, "servings": 2, "difficulty": "Easy",
+}
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+async def fake_stream(text, size=7, stall_after=None):
+    for i in range(0, len(text), size):
+        if stall_after is not None and i >= stall_after:
+            await asyncio.Event().wait() # The model stops sending
+        await asyncio.sleep(0)
+        yield chunk(text[i:i + size])
+
+def streaming_client(text, stall_after=None):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=lambda **kwargs: fake_stream(text, stall_after=stall_after))
+    return client
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_json_stream_emits_members_and_elements_as_they_close():
+    parser = JSONObjectStream()
+    text = json.dumps(RECIPE, indent=2)
+    events = []
+    for i in range(0, len(text), 3):
+        events.extend(parser.feed(text[i:i + 3]))
+    assert events[:3] == [("field", "title", 'Tomato "Rice"'), ("field", "description", "Quick, warm"), ("item", "ingredients", "1 cup rice")]
+    assert {k: v for kind, k, v in events if kind == "field"} == RECIPE
+    assert [v for kind, k, v in events if kind == "item" and k == "instructions"] == RECIPE["instructions"]
+
+@pytest.mark.asyncio
+async def test_stream_recipe_emits_fields_then_items_then_done():
+    service = AIService()
+    service.client = streaming_client(json.dumps(RECIPE))
+    guard = CostGuard(monthly_limit_usd=1.0)
+    with patch("app.services.ai_service.cost_guard", guard):
+        events = service.stream_recipe(["rice", "tomato"], ["Vegan"])
+        first = await events.__anext__()
+        assert first == ("field", {"name": "title", "value": 'Tomato "Rice"'})
+        rest = [e async for e in events]
+    assert [d for e, d in rest if e == "ingredient"] == RECIPE["ingredients"]
+    assert [d for e, d in rest if e == "step"] == RECIPE["instructions"]
+    assert rest[-1] == ("done", RECIPE)
+    # No usage in the stream: the estimate is charged and the reservation released
+    assert guard.current_spend_usd > 0
+    assert guard.reserved_usd() == 0
+
+@pytest.mark.asyncio
+async def test_closing_the_stream_cancels_the_call():
+    service = AIService()
+    service.client = streaming_client(json.dumps(RECIPE), stall_after=60)
+    guard = CostGuard(monthly_limit_usd=1.0)
+    with patch("app.services.ai_service.cost_guard", guard):
+        events = service.stream_recipe(["rice"], [])
+        assert (await events.__anext__())[0] == "field"
+        await events.aclose() # The client goes away while the model stalls
+    assert guard.reserved_usd() == 0
+    assert guard.current_spend_usd == 0
+
+@pytest.mark.asyncio
+async def test_stream_route_persists_the_recipe(client_with_auth: AsyncClient):
+    with patch("app.api.routes.ai.ai_service.client", streaming_client(json.dumps(RECIPE))), \
+         patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=1.0)):
+        response = await client_with_auth.post("/ai/recipe/stream", json={"ingredients": ["rice", "tomato"], "restrictions": ["Vegan"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    # Set by the rate-limit dependency, which doesn't own the StreamingResponse
+    assert "x-ratelimit-remaining" in response.headers
+
+    events = parse_sse(response.text)
+    assert events[0] == ("field", {"name": "title", "value": 'Tomato "Rice"'})
+    assert [d for e, d in events if e == "step"] == RECIPE["instructions"]
+    name, saved = events[-1]
+    assert name == "recipe" and saved["title"] == RECIPE["title"] and saved["id"]
+
+    fetched = await client_with_auth.get(f"/recipes/{saved['id']}")
+    assert fetched.json()["instructions"] == RECIPE["instructions"]
+
+@pytest.mark.asyncio
+async def test_stream_route_failures_before_the_first_event_keep_their_status(client_with_auth: AsyncClient):
+    with patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=0.0)):
+        response = await client_with_auth.post("/ai/recipe/stream", json={"ingredients": ["rice"]})
+    assert response.status_code == 429
+    assert response.json()["detail"] == "Daily AI limit reached"
+
+    breaker = CircuitBreaker(name="stream-test")
+    breaker.state = "OPEN"
+    guard = CostGuard(monthly_limit_usd=1.0)
+    with patch("app.services.ai_service.cost_guard", guard), patch("app.services.ai_service.steps_breaker", breaker):
+        response = await client_with_auth.post("/ai/recipe/stream", json={"ingredients": ["rice"]})
+    assert response.status_code == 503
+    assert guard.reserved_usd() == 0
+
+    response = await client_with_auth.post("/ai/recipe/stream", json={})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_stream_route_reports_later_errors_as_events(client_with_auth: AsyncClient):
+    async def broken_stream(**kwargs):
+        yield chunk('{"title": "Half", ')
+        raise ConnectionError("upstream reset")
+
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=broken_stream)
+    with patch("app.api.routes.ai.ai_service.client", client), \
+         patch("app.services.ai_service.cost_guard", CostGuard(monthly_limit_usd=1.0)), \
+         patch("app.services.ai_service.steps_breaker", CircuitBreaker(name="stream-test")):
+        response = await client_with_auth.post("/ai/recipe/stream", json={"ingredients": ["rice"]})
+    assert response.status_code == 200
+    events = parse_sse(response.text)
+    assert events[0] == ("field", {"name": "title", "value": "Half"})
+    assert events[-1] == ("error", {"status": 500, "detail": "Failed to generate recipe: upstream reset"})
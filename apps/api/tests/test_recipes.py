@@ -5,6 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.user import User
 from app.db.models.recipe import Recipe
 import uuid
+import asyncio
+from unittest.mock import patch
 
 @pytest.mark.asyncio
 async def test_list_recipes_public(client: AsyncClient, db: AsyncSession):
@@ -203,3 +205,146 @@ async def test_recipe_deletion_deletes_image(client_with_auth: AsyncClient, db:
     # Verify recipe is deleted
     verify_res = await client_with_auth.get(f"/recipes/{recipe_id}")
     assert verify_res.status_code == 404
+
+@pytest.mark.asyncio
+async def test_list_recipes_cursor_pagination(client: AsyncClient, db: AsyncSession):
+    from datetime import datetime, timedelta
+    uid = uuid.uuid4()
+    db.add(User(id=uid, email=f"cursor_test_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+    tag = f"page{uid.hex[:6]}"
+    base = datetime(2024, 1, 1)
+    recipes = [
+        Recipe(id=uuid.uuid4(), user_id=uid, title=f"Page {i}", ingredients=["A"], instructions=["B"], dietary_tags=[tag], description="", created_at=base + timedelta(minutes=i))
+        for i in range(4)
+    ]
+    db.add_all(recipes)
+    await db.commit()
+    newest_first = [str(r.id) for r in reversed(recipes)]
+
+    page1 = (await client.get(f"/recipes?dietary_tags={tag}&limit=2")).json()
+    assert [r["id"] for r in page1["data"]] == newest_first[:2]
+    assert page1["hasMore"] is True and page1["nextCursor"]
+
+    page2 = (await client.get("/recipes", params={"dietary_tags": tag, "limit": 2, "cursor": page1["nextCursor"]})).json()
+    assert [r["id"] for r in page2["data"]] == newest_first[2:]
+    # Exact multiple of the page size: no phantom extra page
+    assert page2["hasMore"] is False
+    assert page2["nextCursor"] is None
+
+    bad = await client.get("/recipes?cursor=not-a-cursor")
+    assert bad.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_recipes_include_total(client: AsyncClient, db: AsyncSession, engine):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from app.services.recipe_count_service import recipe_counter
+    uid = uuid.uuid4()
+    db.add(User(id=uid, email=f"total_test_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+    tag = f"total{uid.hex[:6]}"
+    db.add_all([Recipe(id=uuid.uuid4(), user_id=uid, title=f"T{i}", ingredients=["A"], instructions=["B"], dietary_tags=[tag], description="") for i in range(3)])
+    await db.commit()
+
+    body = (await client.get(f"/recipes?dietary_tags={tag}&limit=1&includeTotal=true")).json()
+    assert body["total"] == 3
+    assert body["totalEstimated"] is False
+    assert "total" not in (await client.get(f"/recipes?dietary_tags={tag}")).json()
+
+    # Within the TTL the cached count is served, even though a new row exists
+    db.add(Recipe(id=uuid.uuid4(), user_id=uid, title="T3", ingredients=["A"], instructions=["B"], dietary_tags=[tag], description=""))
+    await db.commit()
+    assert (await client.get(f"/recipes?dietary_tags={tag}&includeTotal=true")).json()["total"] == 3
+
+    # Once expired, the stale value is returned and a background recount replaces it
+    with patch.object(recipe_counter, "ttl_seconds", -1), \
+         patch.object(recipe_counter, "session_factory", async_sessionmaker(bind=engine, expire_on_commit=False)):
+        assert (await client.get(f"/recipes?dietary_tags={tag}&includeTotal=true")).json()["total"] == 3
+        await asyncio.gather(*recipe_counter._tasks)
+    assert (await client.get(f"/recipes?dietary_tags={tag}&includeTotal=true")).json()["total"] == 4
+
+@pytest.mark.asyncio
+async def test_read_recipe_etag_revalidation(client_with_auth: AsyncClient):
+    create_res = await client_with_auth.post("/recipes", json={"title": "ETag", "ingredients": ["a"], "instruction_text": "Go.", "dietary_tags": []})
+    recipe_id = create_res.json()["id"]
+
+    first = await client_with_auth.get(f"/recipes/{recipe_id}")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, no-cache"
+
+    not_modified = await client_with_auth.get(f"/recipes/{recipe_id}", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    await client_with_auth.patch(f"/recipes/{recipe_id}", json={"title": "ETag v2"})
+    modified = await client_with_auth.get(f"/recipes/{recipe_id}", headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.json()["title"] == "ETag v2"
+    assert modified.headers["etag"] != etag
+
+    missing = await client_with_auth.get(f"/recipes/{uuid.uuid4()}", headers={"If-None-Match": etag})
+    assert missing.status_code == 404
+
+@pytest.mark.asyncio
+async def test_list_cards_match_detail_response(client: AsyncClient, db: AsyncSession):
+    from app.db.models.upload import Upload
+    from app.core import serialization
+
+    uid = uuid.uuid4()
+    db.add(User(id=uid, email=f"cards_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+    upload = Upload(id=uuid.uuid4(), user_id=uid, object_key=f"cards/{uid.hex}.png", content_type="image/png", is_completed=True)
+    db.add(upload)
+    await db.commit()
+    tag = f"cards-{uid.hex[:6]}"
+    recipe = Recipe(id=uuid.uuid4(), user_id=uid, title="Card", description="Card", ingredients=["a"], instructions=["b"], dietary_tags=[tag], servings=2, upload_id=upload.id)
+    db.add(recipe)
+    await db.commit()
+
+    # The list path encodes row tuples directly; it must produce the detail model's JSON
+    card = (await client.get(f"/recipes?dietary_tags={tag}")).json()["data"][0]
+    assert card == (await client.get(f"/recipes/{recipe.id}")).json()
+    assert card["imageUrl"].endswith(upload.object_key)
+
+    # The stdlib fallback encodes the same payload identically
+    payload = {"id": recipe.id, "created_at": recipe.created_at, "tags": [tag], "n": None}
+    with patch.object(serialization, "orjson", None):
+        fallback = serialization.dumps(payload)
+    assert serialization.loads(fallback) == serialization.loads(serialization.dumps(payload))
+
+@pytest.mark.asyncio
+async def test_list_summary_view(client: AsyncClient, db: AsyncSession):
+    from app.api.routes.recipes import RecipeSummaryResponse
+
+    uid = uuid.uuid4()
+    db.add(User(id=uid, email=f"summary_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+    tag = f"summary-{uid.hex[:6]}"
+    db.add(Recipe(id=uuid.uuid4(), user_id=uid, title="Slim", description="Card", ingredients=["a"], instructions=["b" * 500], dietary_tags=[tag], prep_time_minutes=5))
+    await db.commit()
+
+    card = (await client.get(f"/recipes?dietary_tags={tag}&view=summary")).json()["data"][0]
+    assert set(card) == set(RecipeSummaryResponse.model_fields)
+    assert card["title"] == "Slim" and card["prepTimeMinutes"] == 5
+
+    full = (await client.get(f"/recipes?dietary_tags={tag}")).json()["data"][0]
+    assert full["instructions"] == ["b" * 500]
+    assert {k: v for k, v in full.items() if k in card} == card
+
+    assert (await client.get("/recipes?view=everything")).status_code == 422
+
+@pytest.mark.asyncio
+async def test_explain_estimate_binds_the_search_terms():
+    from unittest.mock import AsyncMock, MagicMock
+    from app.db.models.recipe import recipe_search_vector
+    from app.services.recipe_count_service import RecipeCounter
+    from sqlalchemy import func, text
+
+    db = AsyncMock()
+    result = MagicMock()
+    result.scalar.return_value = [{"Plan": {"Plan Rows": 42}}]
+    db.execute.return_value = result
+    term = "x'); DROP TABLE recipes; --:y"
+    query = select(Recipe.id).where(recipe_search_vector.op("@@")(func.websearch_to_tsquery(text("'english'"), term)))
+
+    assert await RecipeCounter._explain_rows(db, query) == 42
+    statement, params = db.execute.await_args.args
+    assert str(statement).startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert term not in str(statement)
+    assert list(params.values()) == [term]
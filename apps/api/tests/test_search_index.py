@@ -0,0 +1,110 @@
+import pytest
+import uuid
+from unittest.mock import patch
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.search import InvertedIndex, build_search_text, prefix_tsquery, tokenize
+from app.db.models.user import User
+from app.db.models.recipe import Recipe
+from app.services.search_service import search_service
+
+def test_tokenize_and_search_text():
+    assert tokenize("Low-carb, Gluten-free!") == ["low", "carb", "gluten", "free"]
+    assert tokenize(None) == []
+    text = build_search_text("Pad Thai", None, ["Rice Noodles", "Tofu"], ["Vegan"])
+    assert text == "pad thai rice noodles tofu vegan"
+
+def test_inverted_index_and_semantics_and_prefix():
+    index = InvertedIndex()
+    a, b = uuid.uuid4(), uuid.uuid4()
+    index.add(a, [("Chicken Curry", 3.0), ("chicken, rice", 1.0)])
+    index.add(b, [("Rice Pudding", 3.0), ("milk, rice, sugar", 1.0)])
+
+    assert set(index.search("rice")) == {a, b}
+    assert set(index.search("chicken rice")) == {a}
+    assert set(index.search("chick")) == {a}  # Prefix match
+    assert index.search("tofu") == {}
+    assert index.search("!!!") == {}
+
+    # Title hits outrank body hits
+    scores = index.search("pudding")
+    assert scores[b] > 0
+    scores = index.search("rice")
+    assert scores[b] > scores[a]
+
+def test_prefix_tsquery_matches_the_index_semantics():
+    assert prefix_tsquery("Chick peas") == "chick:* & peas:*"
+    assert prefix_tsquery("x'); DROP TABLE recipes; --:y") == "x:* & drop:* & table:* & recipes:* & y:*"
+    assert prefix_tsquery("!!!") is None
+
+@pytest.mark.asyncio
+async def test_postgres_search_uses_prefix_terms():
+    with patch.object(settings, "DATABASE_URL", "postgresql+asyncpg://db/cookbook"):
+        query = await search_service.apply(None, select(Recipe.id), "chick")
+        empty = await search_service.apply(None, select(Recipe.id), "!!!")
+    compiled = query.compile(dialect=postgresql.dialect())
+    assert "to_tsquery('english', %(to_tsquery_1)s)" in str(compiled)
+    assert "chick:*" in compiled.params.values()
+    assert "false" in str(empty.compile(dialect=postgresql.dialect())).lower()
+
+def test_inverted_index_update_and_remove():
+    index = InvertedIndex()
+    doc = uuid.uuid4()
+    index.add(doc, [("Beef Stew", 3.0)])
+    index.add(doc, [("Lentil Stew", 3.0)])
+    assert index.search("beef") == {}
+    assert set(index.search("lentil")) == {doc}
+
+    index.remove(doc)
+    assert index.search("stew") == {}
+    assert len(index) == 0
+
+@pytest.mark.asyncio
+async def test_search_ranks_title_matches_first(client: AsyncClient, db: AsyncSession):
+    uid = uuid.uuid4()
+    db.add(User(id=uid, email=f"rank_test_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+    marker = f"zaatar{uid.hex[:6]}"
+    body_hit = Recipe(id=uuid.uuid4(), user_id=uid, title="Flatbread", ingredients=["flour", marker], instructions=["Bake"], dietary_tags=[], description="Simple")
+    title_hit = Recipe(id=uuid.uuid4(), user_id=uid, title=f"{marker} Chicken", ingredients=["chicken"], instructions=["Roast"], dietary_tags=[], description="Herby")
+    db.add_all([body_hit, title_hit])
+    await db.commit()
+
+    response = await client.get(f"/recipes?q={marker}")
+    assert response.status_code == 200
+    ids = [r["id"] for r in response.json()["data"]]
+    assert ids == [str(title_hit.id), str(body_hit.id)]
+
+    # Edits are re-indexed through the ORM hooks
+    title_hit.title = "Roast Chicken"
+    title_hit.ingredients = ["chicken"]
+    await db.commit()
+    response = await client.get(f"/recipes?q={marker}")
+    assert [r["id"] for r in response.json()["data"]] == [str(body_hit.id)]
+
+@pytest.mark.asyncio
+async def test_index_follows_commits_not_flushes(client: AsyncClient, db: AsyncSession):
+    uid = uuid.uuid4()
+    db.add(User(id=uid, email=f"commit_test_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+    await db.commit()
+    await client.get("/recipes?q=anything") # Builds the index before the writes below
+    marker = f"sumac{uid.hex[:6]}"
+    recipe_id = uuid.uuid4()
+    recipe = Recipe(id=recipe_id, user_id=uid, title=f"{marker} Salad", ingredients=["onion"], instructions=["Toss"], dietary_tags=[], description="Bright")
+
+    db.add(recipe)
+    await db.flush()
+    assert search_service.index.search(marker) == {} # Not visible before the commit
+    await db.rollback()
+    assert search_service.index.search(marker) == {}
+
+    db.add(recipe)
+    await db.commit()
+    assert set(search_service.index.search(marker)) == {recipe_id}
+
+    await db.delete(recipe)
+    await db.flush()
+    await db.rollback()
+    assert set(search_service.index.search(marker)) == {recipe_id} # Delete rolled back
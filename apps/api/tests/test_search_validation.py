@@ -57,3 +57,34 @@ async def test_ai_validation_endpoint(client_with_auth: AsyncClient):
         assert "issues" in data
         assert len(data["issues"]) > 0
         assert data["issues"][0]["ingredient"] == "Milk"
+
+@pytest.mark.asyncio
+async def test_filter_by_dietary_tags_exact_all_any(client: AsyncClient, db: AsyncSession):
+    uid = uuid.uuid4()
+    user = User(id=uid, email=f"tagset_test_{uid.hex[:6]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True)
+    db.add(user)
+
+    marker = f"tag{uid.hex[:6]}"
+    both = Recipe(id=uuid.uuid4(), user_id=uid, title="Both", ingredients=["x"], instructions=["y"], dietary_tags=["Low-carb", marker.upper()], description="")
+    low_carb = Recipe(id=uuid.uuid4(), user_id=uid, title="Low carb", ingredients=["x"], instructions=["y"], dietary_tags=["Low-carb"], description="")
+    only_marker = Recipe(id=uuid.uuid4(), user_id=uid, title="Marker", ingredients=["x"], instructions=["y"], dietary_tags=[marker], description="")
+    db.add_all([both, low_carb, only_marker])
+    await db.commit()
+
+    # No substring matches: "carb" is not "Low-carb"
+    response = await client.get("/recipes?dietary_tags=carb")
+    assert not any(r["id"] in {str(both.id), str(low_carb.id)} for r in response.json()["data"])
+
+    # AND (default), case-insensitive
+    response = await client.get(f"/recipes?dietary_tags=low-carb,{marker}")
+    assert {r["id"] for r in response.json()["data"]} == {str(both.id)}
+
+    # OR
+    response = await client.get(f"/recipes?dietary_tags={marker}&tag_match=any")
+    assert {r["id"] for r in response.json()["data"]} == {str(both.id), str(only_marker.id)}
+
+    # Tag rows follow edits to the JSON column
+    only_marker.dietary_tags = ["Vegan"]
+    await db.commit()
+    response = await client.get(f"/recipes?dietary_tags={marker}&tag_match=any")
+    assert {r["id"] for r in response.json()["data"]} == {str(both.id)}
@@ -36,3 +36,31 @@ async def test_auth_rate_limiting(monkeypatch):
         response = await ac.post("/auth/login", json={"username": "test@example.com", "password": "wrong"})
         assert response.status_code == 429
         assert "Too many login/register attempts" in response.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_verify_token_cache(client: AsyncClient):
+    import time
+    from datetime import timedelta
+    from unittest.mock import patch
+    from app.core import security
+
+    token = security.create_session_token({"sub": "user-1"})
+    with patch.object(security.jwt, "decode", wraps=security.jwt.decode) as decode:
+        assert security.verify_token(token) == "user-1"
+        assert security.verify_token(token) == "user-1"
+        assert decode.call_count == 1
+
+        # Cached entries stop verifying at exp, like jwt.decode
+        expired = security.create_session_token({"sub": "user-2"}, expires_delta=timedelta(seconds=-1))
+        security.token_cache.set(expired, "user-2", time.time() - 1)
+        assert security.verify_token(expired) is None
+
+        # Logout evicts the caller's token
+        client.cookies.set(settings.SESSION_COOKIE_NAME, token)
+        await client.post("/auth/logout")
+        assert security.token_cache.get(token) is None
+
+    cache = security.VerifiedTokenCache(max_entries=1)
+    cache.set("a", "1", time.time() + 60)
+    cache.set("b", "2", time.time() + 60)
+    assert cache.get("a") is None and cache.get("b") == "2"
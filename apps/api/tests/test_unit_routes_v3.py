@@ -71,11 +71,10 @@ async def test_ai_generate_recipe_service_unavailable():
 
 @pytest.mark.asyncio
 async def test_ai_validate_ingredients_error():
-    current_user = User(id=uuid.uuid4())
     payload = IngredientValidationRequest(ingredients=["apple"], restrictions=[])
     with patch("app.api.routes.ai.ai_service.validate_ingredients", side_effect=Exception("AI error")):
         with pytest.raises(HTTPException) as exc:
-            await validate_ingredients_route(payload, current_user)
+            await validate_ingredients_route(payload, uuid.uuid4())
     assert exc.value.status_code == 500
 
 @pytest.mark.asyncio
@@ -108,7 +107,7 @@ async def test_recipes_read_not_found():
     mock_result.scalars.return_value.first.return_value = None
     db.execute.return_value = mock_result
     with pytest.raises(HTTPException) as exc:
-        await read_recipe(uuid.uuid4(), db)
+        await read_recipe(uuid.uuid4(), Request({"type": "http", "headers": []}), Response(), db)
     assert exc.value.status_code == 404
 
 @pytest.mark.asyncio
@@ -12,6 +12,24 @@ def test_security_utils():
     token = create_session_token(data={"sub": "test@example.com"})
     assert isinstance(token, str)
 
+@pytest.mark.asyncio
+async def test_password_hasher_pool():
+    import asyncio
+    from app.services.password_hasher import PasswordHasher, PasswordHasherBusy
+
+    hasher = PasswordHasher(max_workers=1, max_queue=1, executor="process")
+    try:
+        hashed = await hasher.hash("test_password")
+        assert await hasher.verify("test_password", hashed)
+        assert not await hasher.verify("wrong", hashed)
+
+        # One running + one queued; the third concurrent call is shed
+        results = await asyncio.gather(*(hasher.verify("test_password", hashed) for _ in range(3)), return_exceptions=True)
+        assert sum(isinstance(r, PasswordHasherBusy) for r in results) == 1
+        assert hasher.stats()["rejected"] == 1 and hasher.stats()["pending"] == 0
+    finally:
+        hasher.shutdown()
+
 @pytest.mark.asyncio
 async def test_cost_guard_unit():
     # Test a fresh instance to avoid global state interference
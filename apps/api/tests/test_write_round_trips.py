@@ -0,0 +1,113 @@
+import pytest
+import pytest_asyncio
+import uuid
+from contextlib import contextmanager
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.main import app
+from app.api.deps import get_db
+from app.db.models.user import User
+from app.db.models.upload import Upload
+from app.db.models.recipe import Recipe
+
+@pytest_asyncio.fixture
+async def per_request_sessions(engine):
+    # One session per request, as in production, so the identity map can't hide queries
+    factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+    app.dependency_overrides[get_db] = override_get_db
+    yield
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 1)[0].upper())
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+async def _login(client: AsyncClient) -> None:
+    creds = {"username": f"round_trips_{uuid.uuid4().hex[:8]}@example.com", "password": "password123"}
+    await client.post("/auth/register", json=creds)
+    res = await client.post("/auth/login", json=creds)
+    client.cookies.set("session_id", res.cookies.get("session_id"))
+
+@pytest.mark.asyncio
+async def test_write_endpoint_round_trips(client: AsyncClient, engine, per_request_sessions):
+    with count_statements(engine) as statements:
+        res = await client.post("/auth/register", json={"username": f"rt_{uuid.uuid4().hex[:8]}@example.com", "password": "password123"})
+        assert res.status_code == 201
+    # Duplicate-email check + INSERT; the response is built from the new object
+    assert statements == ["SELECT", "INSERT"]
+
+    await _login(client)
+
+    with count_statements(engine) as statements:
+        res = await client.post("/recipes", json={"title": "RT", "ingredients": ["a"], "instruction_text": "Go.", "dietary_tags": ["Vegan"]})
+        assert res.status_code == 201
+    # Session user, recipe INSERT, tag rows INSERT
+    assert statements == ["SELECT", "INSERT", "INSERT"]
+    recipe_id = res.json()["id"]
+
+    with count_statements(engine) as statements:
+        res = await client.patch(f"/recipes/{recipe_id}", json={"title": "RT 2"})
+        assert res.status_code == 200
+    # Session user, recipe with its upload joined, UPDATE; no refresh or re-select
+    assert statements == ["SELECT", "SELECT", "UPDATE"]
+
+    with count_statements(engine) as statements:
+        res = await client.patch("/auth/me", json={"bio": "hi"})
+        assert res.status_code == 200
+    # Session user with its profile image joined, UPDATE
+    assert statements == ["SELECT", "UPDATE"]
+
+@pytest.mark.asyncio
+async def test_read_endpoints_are_single_query(client: AsyncClient, engine, per_request_sessions):
+    uid = uuid.uuid4()
+    upload = Upload(id=uuid.uuid4(), user_id=uid, object_key=f"rt/{uid.hex}.png", content_type="image/png", is_completed=True)
+    recipe = Recipe(id=uuid.uuid4(), user_id=uid, title="RT image", description="", ingredients=["a"], instructions=["b"], dietary_tags=[], upload_id=upload.id)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        session.add(User(id=uid, email=f"rt_read_{uid.hex[:8]}@example.com", hashed_password="X", full_name="X", role="user", is_active=True))
+        session.add(upload)
+        await session.flush()
+        session.add(recipe)
+        await session.commit()
+
+    # The upload's object_key comes from a join, not a second SELECT ... IN (...)
+    with count_statements(engine) as statements:
+        res = await client.get(f"/recipes/{recipe.id}")
+        assert res.json()["imageUrl"].endswith(upload.object_key)
+    assert statements == ["SELECT"]
+
+    with count_statements(engine) as statements:
+        res = await client.get("/recipes?limit=5")
+        assert any(r["imageUrl"] for r in res.json()["data"])
+    assert statements == ["SELECT"]
+
+@pytest.mark.asyncio
+async def test_session_user_cache_round_trips(client: AsyncClient, engine, per_request_sessions):
+    from unittest.mock import patch
+    from app.services.cache_service import MemoryCacheBackend
+    from app.services.session_user_cache import session_user_cache
+
+    with patch.object(session_user_cache, "enabled", True), patch.object(session_user_cache, "backend", MemoryCacheBackend()):
+        await _login(client)
+        await client.get("/auth/me")  # Populates the snapshot
+
+        with count_statements(engine) as statements:
+            res = await client.post("/recipes", json={"title": "RT", "ingredients": ["a"], "instruction_text": "Go.", "dietary_tags": []})
+            assert res.status_code == 201
+        # No session-user SELECT
+        assert statements == ["INSERT"]
+
+        with count_statements(engine) as statements:
+            res = await client.patch("/auth/me", json={"bio": "cached"})
+            assert res.json()["bio"] == "cached"
+        # The merged snapshot is updated in place
+        assert statements == ["UPDATE"]
@@ -195,6 +195,10 @@ export interface paths {
           q?: string;
           limit?: number;
           restrictions?: components["schemas"]["DietaryRestriction"][];
+          /** @description Add an approximate total (and totalEstimated) to the response */
+          includeTotal?: boolean;
+          /** @description summary drops ingredients and instructions from each item */
+          view?: "full" | "summary";
         };
       };
       responses: {
@@ -380,6 +384,27 @@ export interface paths {
     /** Generate Recipe with AI */
     post: operations["generateRecipe"];
   };
+  "/ai/recipe/stream": {
+    /**
+     * Generate Recipe with AI (Server-Sent Events)
+     * @description Same as POST /ai/recipe, streamed as the model writes. Events: `field`
+     * ({name, value}), one `ingredient` and one `step` per list entry, then
+     * `recipe` with the saved Recipe. Failures after the stream has started
+     * arrive as an `error` event ({status, detail}).
+     */
+    post: operations["streamRecipe"];
+  };
+  "/ai/jobs": {
+    /**
+     * Queue Recipe Generation
+     * @description Queues POST /ai/recipe and answers at once. Poll GET /ai/jobs/{jobId} for the result.
+     */
+    post: operations["submitRecipeJob"];
+  };
+  "/ai/jobs/{jobId}": {
+    /** Recipe Generation Status */
+    get: operations["getRecipeJob"];
+  };
 }
 
 export type webhooks = Record<string, never>;
@@ -476,11 +501,33 @@ export interface components {
       imageUrl?: string | null;
       userId?: components["schemas"]["Uuid"];
     };
+    /** @description List card returned with view=summary: a Recipe without ingredients and instructions */
+    RecipeSummary: {
+      id: components["schemas"]["Uuid"];
+      title: string;
+      description?: string;
+      dietaryTags: components["schemas"]["DietaryRestriction"][];
+      prepTimeMinutes?: number;
+      cookTimeMinutes?: number;
+      servings?: number;
+      /** @enum {string} */
+      difficulty?: "Easy" | "Medium" | "Hard";
+      calories?: number;
+      created_at: components["schemas"]["Timestamp"];
+      updatedAt?: components["schemas"]["Timestamp"];
+      /** Format: uri */
+      imageUrl?: string | null;
+      userId?: components["schemas"]["Uuid"];
+    };
     RecipeList: {
-      data: components["schemas"]["Recipe"][];
+      data: (components["schemas"]["Recipe"] | components["schemas"]["RecipeSummary"])[];
       /** @description Base64 encoded cursor for next page */
       nextCursor?: string | null;
       hasMore: boolean;
+      /** @description Matching recipes; only present with includeTotal=true */
+      total?: number | null;
+      /** @description True when total is a planner estimate rather than an exact count */
+      totalEstimated?: boolean;
     };
     RecipeCreate: {
       title: string;
@@ -494,6 +541,27 @@ export interface components {
       name: string;
       amount: string;
     };
+    RecipeGenerationRequest: {
+      ingredients?: string[];
+      restrictions?: string[];
+      uploadId?: components["schemas"]["Uuid"];
+    };
+    /** @enum {string} */
+    AIJobStatus: "queued" | "running" | "succeeded" | "failed";
+    AIJob: {
+      jobId: components["schemas"]["Uuid"];
+      status: components["schemas"]["AIJobStatus"];
+      /** @description Set once the job has succeeded */
+      recipeId?: components["schemas"]["Uuid"] | null;
+      /** @description Set once the job has failed */
+      error?: {
+        /** @example 429 */
+        status: number;
+        detail: string;
+      } | null;
+      createdAt?: components["schemas"]["Timestamp"];
+      finishedAt?: components["schemas"]["Timestamp"] | null;
+    };
     /** @enum {string} */
     HealthStatus: "ok" | "degraded" | "down";
     HealthResponse: {
@@ -544,11 +612,7 @@ export interface operations {
   generateRecipe: {
     requestBody: {
       content: {
-        "application/json": {
-          ingredients?: string[];
-          restrictions?: string[];
-          uploadId?: components["schemas"]["Uuid"];
-        };
+        "application/json": components["schemas"]["RecipeGenerationRequest"];
       };
     };
     responses: {
@@ -568,4 +632,115 @@ export interface operations {
       };
     };
   };
+  /**
+   * Generate Recipe with AI (Server-Sent Events)
+   * @description Same as POST /ai/recipe, streamed as the model writes. Events: `field`
+   * ({name, value}), one `ingredient` and one `step` per list entry, then
+   * `recipe` with the saved Recipe. Failures after the stream has started
+   * arrive as an `error` event ({status, detail}).
+   */
+  streamRecipe: {
+    requestBody: {
+      content: {
+        "application/json": components["schemas"]["RecipeGenerationRequest"];
+      };
+    };
+    responses: {
+      /** @description Event stream */
+      200: {
+        content: {
+          "text/event-stream": string;
+        };
+      };
+      /** @description Neither ingredients nor an upload given */
+      400: {
+        content: never;
+      };
+      /** @description Unauthorized */
+      401: {
+        content: never;
+      };
+      /** @description Upload not found */
+      404: {
+        content: never;
+      };
+      /** @description Daily AI limit reached */
+      429: {
+        content: never;
+      };
+      /** @description AI service temporarily unavailable */
+      503: {
+        content: never;
+      };
+    };
+  };
+  /**
+   * Queue Recipe Generation
+   * @description Queues POST /ai/recipe and answers at once. Poll GET /ai/jobs/{jobId} for the result.
+   */
+  submitRecipeJob: {
+    requestBody: {
+      content: {
+        "application/json": components["schemas"]["RecipeGenerationRequest"];
+      };
+    };
+    responses: {
+      /** @description Job queued */
+      202: {
+        content: {
+          "application/json": {
+            jobId: components["schemas"]["Uuid"];
+            status: components["schemas"]["AIJobStatus"];
+          };
+        };
+      };
+      /** @description Neither ingredients nor an upload given */
+      400: {
+        content: never;
+      };
+      /** @description Unauthorized */
+      401: {
+        content: never;
+      };
+      /** @description Upload not found */
+      404: {
+        content: never;
+      };
+      /** @description Too many generations in progress for this user */
+      429: {
+        headers: {
+          "Retry-After"?: number;
+        };
+        content: never;
+      };
+    };
+  };
+  /** Recipe Generation Status */
+  getRecipeJob: {
+    parameters: {
+      query?: {
+        /** @description Seconds to wait for the job to finish */
+        wait?: number;
+      };
+      path: {
+        jobId: components["schemas"]["Uuid"];
+      };
+    };
+    responses: {
+      /** @description Job status */
+      200: {
+        content: {
+          "application/json": components["schemas"]["AIJob"];
+        };
+      };
+      /** @description Unauthorized */
+      401: {
+        content: never;
+      };
+      /** @description Job not found */
+      404: {
+        content: never;
+      };
+    };
+  };
 }